@@ -40,6 +40,11 @@ CSRF_TRUSTED_ORIGINS = [u.strip() for u in csrf_raw.split(",") if u.strip()]
 
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
 
+# Reverse proxies in front of the app that append to X-Forwarded-For
+# (posts.typeahead throttles anonymous clients by that address).
+# 0 = use REMOTE_ADDR.
+TRUSTED_PROXY_COUNT = int(os.getenv("TRUSTED_PROXY_COUNT", "1"))
+
 # ==========================================================
 # APPLICATIONS
 # ==========================================================
@@ -64,9 +69,12 @@ INSTALLED_APPS = [
 # ==========================================================
 # MIDDLEWARE
 # ==========================================================
+# All async-capable except WhiteNoise, which is sync-only: under ASGI
+# every request crosses one sync/async thread hop there.
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "posts.instrumentation.RequestMetricsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -96,6 +104,12 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "crow.wsgi.application"
+ASGI_APPLICATION = "crow.asgi.application"
+
+# SERVER=asgi: the Procfile runs uvicorn workers on crow.asgi, so the
+# async views (post_detail, vote_post, typeahead) wait on the DB
+# without holding a worker. Default: sync gunicorn workers on WSGI.
+SERVER = os.getenv("SERVER", "wsgi").lower()
 
 # ==========================================================
 # DATABASE
@@ -107,7 +121,9 @@ if DATABASE_URL:
     DATABASES = {
         "default": dj_database_url.parse(
             DATABASE_URL,
-            conn_max_age=600,
+            # Async requests don't reuse persistent connections: under
+            # ASGI close them per request (pool with e.g. PgBouncer).
+            conn_max_age=0 if SERVER == "asgi" else 600,
             ssl_require=True,
         )
     }
@@ -176,6 +192,176 @@ STORAGES = {
     },
 }
 
+# ==========================================================
+# CACHES
+# ==========================================================
+# Process-local LRU caches (LocMemCache culls least recently used
+# entries past MAX_ENTRIES). Point these at a shared backend when
+# running more than one process.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "crow-default",
+    },
+    # {% cache %} fragments (post cards), keyed by Post.version
+    "template_fragments": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "crow-fragments",
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+    # Anonymous full-page cache (posts.pagecache)
+    "pages": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "crow-pages",
+        "OPTIONS": {"MAX_ENTRIES": 2000},
+    },
+    "typeahead": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "crow-typeahead",
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+
+# Whole-page cache for logged-out visitors (home, post_detail, profile).
+# Dry-run renders every page anyway and only counts would-be hits.
+PAGE_CACHE = "pages"
+PAGE_CACHE_ENABLED = (
+    os.getenv("PAGE_CACHE_ENABLED", "True").lower() == "true"
+)
+PAGE_CACHE_DRY_RUN = (
+    os.getenv("PAGE_CACHE_DRY_RUN", "False").lower() == "true"
+)
+PAGE_CACHE_TTL = 300  # seconds; also bounds naturaltime staleness
+
+# ==========================================================
+# FEED
+# ==========================================================
+FEED_PAGE_SIZE = int(os.getenv("FEED_PAGE_SIZE", "20"))
+PROFILE_PAGE_SIZE = int(os.getenv("PROFILE_PAGE_SIZE", "24"))  # grid
+
+# Comment threads on post_detail: top-level comments per page, then
+# levels shown and replies per parent before "Load more replies".
+COMMENT_PAGE_SIZE = int(os.getenv("COMMENT_PAGE_SIZE", "20"))
+COMMENT_TREE_MAX_DEPTH = 6
+COMMENT_TREE_MAX_REPLIES = 10
+
+# Home timelines (?sort=following, posts.timeline): sources with more
+# followers than this are merged in at read time instead of being
+# fanned out to every follower on write.
+TIMELINE_FANOUT_LIMIT = int(os.getenv("TIMELINE_FANOUT_LIMIT", "5000"))
+TIMELINE_BACKFILL = 50  # recent posts copied in on follow
+TIMELINE_MAX_LENGTH = 1000  # entries kept by `manage.py rebuild_timelines`
+
+# ==========================================================
+# CATEGORIES
+# ==========================================================
+# In-process directory of category names and post counts
+# (posts.categories): dropped on local changes, rebuilt at least this
+# often (seconds).
+CATEGORY_DIRECTORY_TTL = 300
+CATEGORY_SEARCH_LIMIT = 6  # category_search typeahead suggestions
+
+# ==========================================================
+# SEARCH
+# ==========================================================
+# Dotted path to a posts.search backend class; empty = pick by DB
+# vendor (Postgres full-text, SQLite FTS5, icontains otherwise).
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "")
+SEARCH_MAX_RESULTS = 200
+SEARCH_TYPEAHEAD_LIMIT = 8
+
+# Typeahead endpoints: both throttled, ajax_search results cached
+# (category_search reads the category directory)
+TYPEAHEAD_CACHE = "typeahead"
+TYPEAHEAD_CACHE_TTL = 60  # seconds
+TYPEAHEAD_THROTTLE = (  # (burst size, tokens per second)
+    int(os.getenv("TYPEAHEAD_THROTTLE_BURST", "10")),
+    float(os.getenv("TYPEAHEAD_THROTTLE_RATE", "4.0")),
+)
+
+# ==========================================================
+# VOTES
+# ==========================================================
+# vote_post buffers clicks in process memory and writes them in batches
+# (posts.votebuffer). Votes not yet flushed are lost if the process
+# dies. On by default under ASGI only; VOTE_WRITE_BEHIND=False writes
+# every click directly.
+VOTE_WRITE_BEHIND = (
+    os.getenv("VOTE_WRITE_BEHIND", str(SERVER == "asgi")).lower() == "true"
+)
+VOTE_FLUSH_INTERVAL = 1.0  # seconds; 0 = no background flusher
+VOTE_FLUSH_BATCH = 500  # buffered (user, post) pairs forcing a flush
+
+# ==========================================================
+# LIVE UPDATES
+# ==========================================================
+# Pages follow score / comment changes over Server-Sent Events
+# (posts.live). Each stream holds its connection open, so this is on
+# by default only under SERVER=asgi. Changes are coalesced into one
+# message per post per LIVE_TICK. LocalBroker reaches this process's
+# streams only; multi-process setups need a shared LIVE_BACKEND.
+LIVE_UPDATES = (
+    os.getenv("LIVE_UPDATES", str(SERVER == "asgi")).lower() == "true"
+)
+LIVE_BACKEND = os.getenv("LIVE_BACKEND", "posts.live.LocalBroker")
+LIVE_TICK = 0.5  # seconds
+LIVE_KEEPALIVE = 15  # seconds between keepalive comments
+LIVE_QUEUE_SIZE = 20  # messages buffered per slow client
+LIVE_MAX_POSTS = 100  # posts one stream may follow (a feed page)
+
+# ==========================================================
+# INSTRUMENTATION
+# ==========================================================
+# Share of requests timed by posts.instrumentation (0 = middleware off).
+# Sampled responses carry Server-Timing; /metrics/ serves Prometheus
+# histograms to staff or to "Authorization: Bearer <METRICS_TOKEN>".
+INSTRUMENTATION_SAMPLE_RATE = float(
+    os.getenv("INSTRUMENTATION_SAMPLE_RATE", "0")
+)
+INSTRUMENTATION_DUPLICATE_QUERIES = 3  # same SQL this often = N+1 suspect
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# ==========================================================
+# MEDIA UPLOADS
+# ==========================================================
+# create_post stages files on local disk and a thread pool uploads them
+# after the response (posts.uploads). Workers 0 = upload inline.
+# MEDIA_BACKEND (posts.storage) stores the files and builds their URLs;
+# LocalBackend uses default_storage and Pillow instead of Cloudinary.
+MEDIA_BACKEND = os.getenv(
+    "MEDIA_BACKEND", "posts.storage.CloudinaryBackend"
+)
+MEDIA_UPLOAD_WORKERS = int(os.getenv("MEDIA_UPLOAD_WORKERS", "4"))
+MEDIA_UPLOAD_ATTEMPTS = 3
+MEDIA_UPLOAD_RETRY_DELAY = 1.0  # seconds, doubled per retry
+MEDIA_STAGING_DIR = os.getenv(
+    "MEDIA_STAGING_DIR", str(BASE_DIR / "media_staging")
+)
+
+# Image widths (px) served through srcset: search thumbnails, feed
+# cards, post detail / lightbox.
+MEDIA_RENDITIONS = {"thumb": 320, "card": 720, "full": 1440}
+
+# ==========================================================
+# MAINTENANCE COMMANDS
+# ==========================================================
+# purge_posts and archive_posts save their progress here after each
+# chunk, so `--resume` continues an interrupted run.
+MAINTENANCE_STATE_DIR = os.getenv(
+    "MAINTENANCE_STATE_DIR", str(BASE_DIR / "maintenance_state")
+)
+MAINTENANCE_CHUNK_SIZE = 1000
+
+# ==========================================================
+# COLD POST ARCHIVE
+# ==========================================================
+# `manage.py archive_cold_posts` moves posts older than
+# ARCHIVE_AFTER_DAYS, without comments in the last ARCHIVE_INACTIVE_DAYS,
+# to the ArchivedPost table (posts.archive). post_detail still shows
+# them; `manage.py restore_posts` moves them back.
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+ARCHIVE_INACTIVE_DAYS = int(os.getenv("ARCHIVE_INACTIVE_DAYS", "90"))
+
 # ==========================================================
 # DEFAULT PRIMARY KEY
 # ==========================================================
@@ -1,6 +1,13 @@
 # posts/admin.py
 from django.contrib import admin
-from .models import Post, Category, Vote
+from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+
+from .models import ArchivedPost, Post, Category, Vote
 
 
 # ----------------------------------------------
@@ -8,14 +15,73 @@ from .models import Post, Category, Vote
 # ----------------------------------------------
 class CategoryAdmin(admin.ModelAdmin):
 
-    list_display = ('name', 'post_count')
+    list_display = ('name', 'post_count', 'follower_count')
     search_fields = ('name',)
     ordering = ('name',)
 
+    def get_queryset(self, request):
+        # One grouped query for the page instead of a COUNT per row
+        return super().get_queryset(request).annotate(
+            post_total=Count('posts')
+        )
+
     def post_count(self, obj):
-        return obj.posts.count()
+        return obj.post_total
 
     post_count.short_description = 'Number of Posts'
+    post_count.admin_order_field = 'post_total'
+
+
+# ----------------------------------------------
+# LARGE-TABLE HELPERS
+# ----------------------------------------------
+class EstimatedCountPaginator(Paginator):
+    """
+    On Postgres, an unfiltered changelist of a big table takes its
+    count from the planner's estimate (pg_class.reltuples, refreshed
+    by ANALYZE) instead of a COUNT(*) scan. Filtered lists, small
+    tables and other databases count exactly.
+    """
+
+    ESTIMATE_FROM = 100_000  # rows
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == "postgresql" and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples FROM pg_class "
+                    "WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= self.ESTIMATE_FROM:
+                return int(row[0])
+        return super().count
+
+
+class AuthorFilter(admin.SimpleListFilter):
+    """
+    Filter by author without listing every user in the sidebar: pick
+    an author from the Author column; only that choice is shown.
+    """
+
+    title = 'author'
+    parameter_name = 'author'
+
+    def lookups(self, request, model_admin):
+        value = self.value()
+        if not value or not value.isdigit():
+            return []
+        return User.objects.filter(pk=value).values_list('pk', 'username')
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value and value.isdigit():
+            return queryset.filter(author_id=value)
+        return queryset
 
 
 # ----------------------------------------------
@@ -23,16 +89,57 @@ class CategoryAdmin(admin.ModelAdmin):
 # ----------------------------------------------
 class PostAdmin(admin.ModelAdmin):
 
-    list_display = ('title', 'author', 'category',
-                    'score_display', 'created_at')
+    # Score and counts are stored counters (sortable columns, score
+    # on post_top_idx); author / category joined into the page query
+    list_display = ('title', 'author_link', 'category', 'score',
+                    'upvotes', 'downvotes', 'comment_count', 'created_at')
+    list_select_related = ('author', 'category')
     search_fields = ('title', 'content')
-    list_filter = ('category', 'author')
+    list_filter = (AuthorFilter, 'category')
+    autocomplete_fields = ('author', 'category')
     ordering = ('-created_at',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # no second COUNT(*) when filtered
+
+    def author_link(self, obj):
+        return format_html(
+            '<a href="?author={}">{}</a>', obj.author_id, obj.author
+        )
+
+    author_link.short_description = 'Author'
+    author_link.admin_order_field = 'author__username'
+
+
+# ----------------------------------------------
+# VOTE ADMIN
+# ----------------------------------------------
+class VoteAdmin(admin.ModelAdmin):
+
+    list_display = ('user', 'post', 'value')
+    list_select_related = ('user', 'post__author')
+    list_filter = ('value',)
+    raw_id_fields = ('user', 'post')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+# ----------------------------------------------
+# ARCHIVED POST ADMIN
+# ----------------------------------------------
+class ArchivedPostAdmin(admin.ModelAdmin):
+    # Read-only: `manage.py restore_posts` moves posts back
+
+    list_display = ('id', 'title', 'author', 'created_at', 'archived_at')
+    list_select_related = ('author',)
+    exclude = ('data',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
-    def score_display(self, obj):
-        return obj.get_score()
+    def has_add_permission(self, request):
+        return False
 
-    score_display.short_description = "Score"
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 # ----------------------------------------------
@@ -40,4 +147,5 @@ class PostAdmin(admin.ModelAdmin):
 # ----------------------------------------------
 admin.site.register(Category, CategoryAdmin)
 admin.site.register(Post, PostAdmin)
-admin.site.register(Vote)
+admin.site.register(Vote, VoteAdmin)
+admin.site.register(ArchivedPost, ArchivedPostAdmin)
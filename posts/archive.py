@@ -0,0 +1,296 @@
+"""
+Cold post archive: posts older than ARCHIVE_AFTER_DAYS without a
+comment or vote in the last ARCHIVE_INACTIVE_DAYS move out of the hot
+tables, so the Post / Comment / Vote indexes every feed reads stay
+small.
+
+Each archived post is one ArchivedPost row: the record of
+maintenance.archive_records() (post, comments, votes, media
+references) as zlib-compressed JSON. Archived posts leave the feeds,
+search, timelines and the authors' UserStats. post_detail still shows
+them, read-only and paged like live threads, from the archive;
+restore() puts them back.
+
+`manage.py archive_cold_posts` archives, `manage.py restore_posts`
+restores.
+"""
+
+import json
+import zlib
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import categories, maintenance, ranking, timeline
+from .comments import _assemble
+from .feed import InvalidCursor
+from .models import (
+    ArchivedPost,
+    Category,
+    Comment,
+    Post,
+    PostMedia,
+    UserStats,
+    Vote,
+)
+from .search import get_search_backend
+
+
+def pack(record: dict) -> bytes:
+    return zlib.compress(json.dumps(record).encode())
+
+
+def unpack(data) -> dict:
+    return json.loads(zlib.decompress(bytes(data)))  # memoryview on PG
+
+
+# -----------------------------
+# Archiving
+# -----------------------------
+def cold_posts(now=None):
+    """Posts due for the archive (see the module docstring)."""
+    now = now or timezone.now()
+    active_since = now - timedelta(days=settings.ARCHIVE_INACTIVE_DAYS)
+    recent_comments = Comment.objects.filter(
+        post=OuterRef("pk"), created_at__gte=active_since
+    )
+    # Uploads still pending: their staged files would go with the post
+    pending_media = PostMedia.objects.filter(
+        post=OuterRef("pk"),
+        status__in=[PostMedia.PENDING, PostMedia.PROCESSING],
+    )
+    return (
+        Post.objects.filter(
+            created_at__lt=now - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+        )
+        .exclude(last_vote_at__gte=active_since)
+        .exclude(Exists(recent_comments) | Exists(pending_media))
+    )
+
+
+def archive(post_ids, now=None) -> int:
+    """
+    Move posts to the archive: those of `post_ids` still cold at `now`.
+    Returns the number archived; call maintenance.expire_caches() once
+    done.
+    """
+    with transaction.atomic():
+        # Lock first, then check: votes and comments on locked posts
+        # wait for the commit, so none is deleted without being
+        # archived, and a post that got a comment since it was picked
+        # stays.
+        list(
+            Post.objects.select_for_update()
+            .filter(pk__in=post_ids)
+            .values_list("pk", flat=True)
+        )
+        post_ids = list(
+            cold_posts(now)
+            .filter(pk__in=post_ids)
+            .values_list("pk", flat=True)
+        )
+        if not post_ids:
+            return 0
+
+        ArchivedPost.objects.bulk_create(
+            ArchivedPost(
+                id=record["id"],
+                author_id=record["author_id"],
+                title=record["title"],
+                created_at=parse_datetime(record["created_at"]),
+                data=pack(record),
+            )
+            for record in maintenance.archive_records(
+                post_ids, settings.MAINTENANCE_CHUNK_SIZE
+            )
+        )
+        # The media files stay: the archived record points at them
+        return maintenance.delete_posts(post_ids, keep_files=True)
+
+
+# -----------------------------
+# Reading
+# -----------------------------
+def _instances(record):
+    """Unsaved Post, Comments (thread order) and PostMedia of a record."""
+    post = Post(
+        **{
+            field: record[field]
+            for field in maintenance.POST_FIELDS
+            if field != "created_at"
+        },
+        created_at=parse_datetime(record["created_at"]),
+    )
+    comments = [
+        Comment(
+            post_id=post.pk,
+            **{**row, "created_at": parse_datetime(row["created_at"])},
+        )
+        for row in record["comments"]
+    ]
+    file_field = PostMedia._meta.get_field("file")
+    media = [
+        PostMedia(
+            post_id=post.pk,
+            **{**row, "file": file_field.to_python(row["file"])},
+        )
+        for row in record["media"]
+    ]
+    return post, comments, media
+
+
+def load(archived):
+    """
+    (post, comments) of an ArchivedPost for post_detail: unsaved
+    instances shaped like feed_queryset() posts, and the whole thread
+    in path order for comment_page().
+    """
+    record = unpack(archived.data)
+    post, comments, media = _instances(record)
+
+    post.author = archived.author
+    if post.category_id:
+        post.category = Category(id=post.category_id, name=record["category"])
+    post._prefetched_objects_cache = {"media": media}
+    post.user_vote_value = 0
+
+    authors = User.objects.in_bulk({c.author_id for c in comments})
+    kept = {}
+    for comment in comments:
+        # Deleted users' comments went with them, and so did the
+        # replies below those
+        if comment.author_id in authors and (
+            comment.parent_id is None or comment.parent_id in kept
+        ):
+            comment.author = authors[comment.author_id]
+            kept[comment.pk] = comment
+    return post, list(kept.values())
+
+
+def comment_page(comments, parent=None, cursor=None):
+    """
+    posts.comments.comment_page() over load()'s comments, in memory:
+    (nodes, next_cursor) with the same page size and cut-offs.
+    """
+    if cursor and not cursor.isdigit():
+        raise InvalidCursor(cursor)
+    page_size = settings.COMMENT_PAGE_SIZE
+    max_depth = settings.COMMENT_TREE_MAX_DEPTH
+    max_replies = settings.COMMENT_TREE_MAX_REPLIES
+
+    base_depth = 0
+    if parent is not None:
+        comments = [c for c in comments if c.path.startswith(parent.path)]
+        base_depth = parent.depth + 1
+    comments = [c for c in comments if c.depth <= base_depth + max_depth]
+
+    heads = [
+        c.path
+        for c in comments
+        if c.depth == base_depth and (not cursor or c.path > cursor)
+    ]
+    if not heads:
+        return [], None
+    next_cursor = stop = None
+    if page_size and len(heads) > page_size:
+        stop = heads[page_size]
+        next_cursor = heads[page_size - 1]
+    rows = [
+        c
+        for c in comments
+        if c.path >= heads[0] and (stop is None or c.path < stop)
+    ]
+
+    siblings = Counter(c.parent_id for c in rows)
+    for comment in rows:
+        comment.sibling_count = siblings[comment.parent_id]
+    return _assemble(rows, base_depth, max_depth, max_replies), next_cursor
+
+
+# -----------------------------
+# Restoring
+# -----------------------------
+def restore(post_ids) -> int:
+    """
+    Move archived posts back to the hot tables and their readers'
+    timelines. Comments and votes of since-deleted users are dropped
+    and the counters recomputed. Returns the number restored; call
+    maintenance.expire_caches() once done.
+    """
+    with transaction.atomic():
+        archived = list(
+            ArchivedPost.objects.select_for_update().filter(pk__in=post_ids)
+        )
+        records = [unpack(row.data) for row in archived]
+
+        user_ids = set()
+        for record in records:
+            user_ids.add(record["author_id"])
+            user_ids.update(row["author_id"] for row in record["comments"])
+            user_ids.update(user_id for user_id, _ in record["votes"])
+        users = User.objects.in_bulk(user_ids)
+
+        posts, comments, media, votes = [], [], [], []
+        for record in records:
+            post, post_comments, post_media = _instances(record)
+            post.author = users[post.author_id]
+            if record["category"]:
+                post.category_id = categories.resolve(record["category"])
+
+            kept = set()
+            for comment in post_comments:
+                if comment.author_id in users and (
+                    comment.parent_id is None or comment.parent_id in kept
+                ):
+                    kept.add(comment.pk)
+                    comments.append(comment)
+            post.comment_count = len(kept)
+
+            post_votes = [
+                Vote(user_id=user_id, post_id=post.pk, value=value)
+                for user_id, value in record["votes"]
+                if user_id in users
+            ]
+            values = [vote.value for vote in post_votes]
+            post.upvotes = values.count(Vote.UPVOTE)
+            post.downvotes = values.count(Vote.DOWNVOTE)
+            post.score = post.upvotes - post.downvotes
+            post.hot_rank = ranking.hot(post.score, post.created_at)
+            post.version += 1  # cards cached before archiving are stale
+
+            posts.append(post)
+            votes.extend(post_votes)
+            media.extend(post_media)
+
+        Post.objects.bulk_create(posts)
+        Comment.objects.bulk_create(comments, batch_size=1000)
+        Vote.objects.bulk_create(votes, batch_size=1000)
+        PostMedia.objects.bulk_create(media, batch_size=1000)
+
+        deltas = defaultdict(Counter)
+        for post in posts:
+            deltas[post.author_id].update(post_count=1, karma=post.score)
+        for comment in comments:
+            deltas[comment.author_id].update(comment_count=1)
+        for user_id, counts in deltas.items():
+            UserStats.adjust(user_id, **counts)
+        for category_id, total in Counter(
+            post.category_id for post in posts if post.category_id
+        ).items():
+            categories.adjust_count(category_id, total)
+
+        search = get_search_backend()
+        for post in posts:
+            search.index_post(post)
+            timeline.fan_out(post)  # archiving dropped its entries
+
+        ArchivedPost.objects.filter(
+            pk__in=[row.pk for row in archived]
+        ).delete()
+    return len(posts)
@@ -0,0 +1,116 @@
+"""
+In-process category directory: every category's id, name and post
+count, so category pages and the category typeahead don't query the
+Category table.
+
+Built with one read of the Category table (post counts are stored in
+Category.post_count) on first use. posts.signals drops it when a
+category is added, renamed or deleted, and adjust_count() moves the
+post counts as posts come and go. Other processes only see those
+changes when their own copy is rebuilt, at most
+CATEGORY_DIRECTORY_TTL seconds later.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import Category
+
+_lock = threading.Lock()  # guards post counts and rebuilds
+_directory = None
+
+
+class Directory:
+    """Snapshot of the Category table, with names sorted for prefixes."""
+
+    def __init__(self, rows):
+        self.ids = {}  # name -> id
+        self.counts = {}  # id -> post count
+        for pk, name, post_count in rows:
+            self.ids[name] = pk
+            self.counts[pk] = post_count
+        # (casefolded name, name), searched with bisect
+        self.keys = sorted((name.casefold(), name) for name in self.ids)
+        self.built_at = time.monotonic()
+
+    def expired(self) -> bool:
+        age = time.monotonic() - self.built_at
+        return age > settings.CATEGORY_DIRECTORY_TTL
+
+    def search(self, prefix: str, limit: int) -> list:
+        """Up to `limit` names starting with `prefix` (any case)."""
+        prefix = prefix.casefold()
+        start = bisect_left(self.keys, (prefix,))
+        names = []
+        for key, name in self.keys[start : start + limit]:
+            if not key.startswith(prefix):
+                break
+            names.append(name)
+        return names
+
+
+def current():
+    """The directory if it is built and fresh, else None (no query)."""
+    directory = _directory
+    if directory is None or directory.expired():
+        return None
+    return directory
+
+
+def get_directory() -> Directory:
+    """The directory, (re)built if needed."""
+    global _directory
+
+    directory = current()
+    if directory is None:
+        with _lock:
+            directory = current()
+            if directory is None:
+                rows = Category.objects.values_list(
+                    "pk", "name", "post_count"
+                )
+                directory = _directory = Directory(rows)
+    return directory
+
+
+def invalidate() -> None:
+    global _directory
+    _directory = None
+
+
+def adjust_count(category_id: int, delta: int) -> None:
+    """
+    Move a category's stored post count, and the built directory's
+    once the transaction commits.
+    """
+    if not delta:
+        return
+    Category.objects.filter(pk=category_id).update(
+        post_count=F("post_count") + delta
+    )
+    transaction.on_commit(lambda: _adjust_directory(category_id, delta))
+
+
+def _adjust_directory(category_id: int, delta: int) -> None:
+    directory = _directory
+    if directory is not None:
+        with _lock:
+            count = directory.counts.get(category_id)
+            if count is not None:
+                directory.counts[category_id] = max(count + delta, 0)
+
+
+def resolve(name: str) -> int:
+    """
+    Id of the category called `name`, created if it doesn't exist.
+    Always asks the database (one lookup by the unique name): the
+    directory may still hold a category another process renamed or
+    deleted, and confirming its id would cost the same query.
+    """
+    category, _ = Category.objects.get_or_create(name=name)
+    return category.pk
@@ -0,0 +1,177 @@
+from django.conf import settings
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from .feed import InvalidCursor
+from .models import Comment
+
+
+# -----------------------------
+# Comment Tree Builder
+# -----------------------------
+def build_comment_tree(post, root=None, max_depth=None, max_replies=None):
+    """
+    Return the top-level nodes of a post's whole comment thread (or of
+    the sub-thread below `root`), unpaginated. See comment_page().
+    """
+    nodes, _ = comment_page(
+        post,
+        parent=root,
+        page_size=0,
+        max_depth=max_depth,
+        max_replies=max_replies,
+    )
+    return nodes
+
+
+def comment_page(
+    post,
+    parent=None,
+    cursor=None,
+    page_size=None,
+    max_depth=None,
+    max_replies=None,
+):
+    """
+    Return (nodes, next_cursor) for one page of comments: top-level
+    comments of `post`, or direct replies to `parent`, oldest first,
+    each with its visible sub-thread attached.
+
+    Every returned comment gets:
+    - children:     visible replies, oldest first
+    - more_replies: direct replies cut off by `max_depth` levels or
+                    by the `max_replies`-per-parent limit
+
+    The cursor is the path of the last node on the previous page.
+    page_size=0 returns every node on a single page.
+    """
+    page = _PageQuery(post, parent, cursor, page_size, max_depth, max_replies)
+    heads = None
+    if page.heads is not None:
+        heads = list(page.heads)
+        if not heads:
+            return [], None
+    rows, next_cursor = page.rows(heads)
+    return page.assemble(rows), next_cursor
+
+
+async def acomment_page(
+    post,
+    parent=None,
+    cursor=None,
+    page_size=None,
+    max_depth=None,
+    max_replies=None,
+):
+    """comment_page() for async views, on the async ORM."""
+    page = _PageQuery(post, parent, cursor, page_size, max_depth, max_replies)
+    heads = None
+    if page.heads is not None:
+        heads = [path async for path in page.heads]
+        if not heads:
+            return [], None
+    rows, next_cursor = page.rows(heads)
+    return page.assemble([comment async for comment in rows]), next_cursor
+
+
+class _PageQuery:
+    """The two queries of one comment page, for either ORM API."""
+
+    def __init__(
+        self, post, parent, cursor, page_size, max_depth, max_replies
+    ):
+        if page_size is None:
+            page_size = settings.COMMENT_PAGE_SIZE
+        if max_depth is None:
+            max_depth = settings.COMMENT_TREE_MAX_DEPTH
+        if max_replies is None:
+            max_replies = settings.COMMENT_TREE_MAX_REPLIES
+        if cursor and not cursor.isdigit():
+            raise InvalidCursor(cursor)
+
+        comments = Comment.objects.filter(post=post)
+        base_depth = 0
+        if parent is not None:
+            comments = comments.filter(path__startswith=parent.path)
+            base_depth = parent.depth + 1
+
+        self.comments = comments.filter(depth__lte=base_depth + max_depth)
+        self.base_depth = base_depth
+        self.page_size = page_size
+        self.max_depth = max_depth
+        self.max_replies = max_replies
+
+        # 1) Page heads: just the paths bounding this page (None when
+        #    the whole thread is one page).
+        self.heads = None
+        if page_size or cursor:
+            heads = self.comments.filter(depth=base_depth).order_by("path")
+            if cursor:
+                heads = heads.filter(path__gt=cursor)
+            if page_size:
+                heads = heads[: page_size + 1]
+            self.heads = heads.values_list("path", flat=True)
+
+    def rows(self, heads):
+        """
+        (rows, next_cursor): every visible row of those sub-threads in
+        one ordered query. On a page, replies past max_replies per
+        parent are only counted (sibling_count), never fetched.
+        """
+        comments = self.comments
+        next_cursor = None
+        rank_limit = None
+        if heads is not None:
+            if self.page_size and len(heads) > self.page_size:
+                comments = comments.filter(path__lt=heads[self.page_size])
+                heads = heads[: self.page_size]
+                next_cursor = heads[-1]
+            comments = comments.filter(path__gte=heads[0])
+            rank_limit = max(self.max_replies, len(heads))
+
+        rows = comments.select_related("author").annotate(
+            sibling_count=Window(Count("id"), partition_by=[F("parent_id")]),
+        )
+        if rank_limit:
+            rows = rows.annotate(
+                sibling_rank=Window(
+                    RowNumber(),
+                    partition_by=[F("parent_id")],
+                    order_by=F("path").asc(),
+                ),
+            ).filter(sibling_rank__lte=rank_limit)
+        return rows.order_by("path"), next_cursor
+
+    def assemble(self, rows):
+        return _assemble(
+            rows, self.base_depth, self.max_depth, self.max_replies
+        )
+
+
+def _assemble(rows, base_depth, max_depth, max_replies):
+    """Link path-ordered rows into nodes, applying the cut-offs."""
+    top_level = []
+    visible = {}
+    for comment in rows:
+        comment.children = []
+        comment.more_replies = 0
+
+        if comment.depth == base_depth:
+            top_level.append(comment)
+            visible[comment.pk] = comment
+            continue
+
+        parent = visible.get(comment.parent_id)
+        if parent is None:
+            continue  # below a reply that was already cut off
+
+        if comment.depth >= base_depth + max_depth:
+            parent.more_replies = comment.sibling_count
+            continue
+
+        if len(parent.children) < max_replies:
+            parent.children.append(comment)
+            visible[comment.pk] = comment
+        parent.more_replies = comment.sibling_count - len(parent.children)
+
+    return top_level
@@ -0,0 +1,130 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import (
+    IntegerField,
+    OuterRef,
+    Prefetch,
+    Q,
+    Subquery,
+    Value,
+)
+from django.db.models.functions import Coalesce
+
+from .models import Post, PostMedia, Vote
+
+
+# -----------------------------
+# Feed QuerySet Builder
+# -----------------------------
+def feed_queryset(user=None, queryset=None, media="all"):
+    """
+    Return posts ready to render as feed cards in a constant number
+    of queries:
+    - author / category joined (select_related)
+    - media fetched in one extra query (prefetch_related); with
+      media="cover" only each post's first READY item, as `covers`
+    - user_vote_value annotated
+
+    Score and comment count are read from the stored Post counters.
+    """
+    if queryset is None:
+        queryset = Post.objects.all()
+
+    if user is not None and user.is_authenticated:
+        own_vote = Vote.objects.filter(
+            post=OuterRef("pk"), user=user
+        ).values("value")[:1]
+        user_vote = Coalesce(
+            Subquery(own_vote, output_field=IntegerField()), Value(0)
+        )
+    else:
+        user_vote = Value(0, output_field=IntegerField())
+
+    if media == "cover":
+        # Sliced prefetch: ROW_NUMBER() per post, in Meta.ordering
+        media_lookup = Prefetch(
+            "media",
+            queryset=PostMedia.objects.filter(status=PostMedia.READY)[:1],
+            to_attr="covers",
+        )
+    else:
+        media_lookup = "media"
+
+    return (
+        queryset.select_related("author", "category")
+        .prefetch_related(media_lookup)
+        .annotate(user_vote_value=user_vote)
+    )
+
+
+# -----------------------------
+# Keyset (Cursor) Pagination
+# -----------------------------
+# ?sort= value -> Post column the feed is ordered by (then by id).
+# Rank columns are precomputed by `manage.py recompute_ranks`.
+FEED_SORTS = {
+    "new": "created_at",
+    "hot": "hot_rank",
+    "top": "score",
+    "controversial": "controversy",
+}
+
+
+class InvalidCursor(ValueError):
+    """Raised when a feed cursor cannot be decoded."""
+
+
+def encode_cursor(post, field="created_at") -> str:
+    """Encode the (`field`, id) position of `post` as an opaque token."""
+    value = getattr(post, field)
+    value = value.isoformat() if isinstance(value, datetime) else repr(value)
+    raw = f"{value}|{post.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, field="created_at") -> tuple:
+    """Inverse of encode_cursor(). Raises InvalidCursor on bad input."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        value, pk = raw.rsplit("|", 1)
+        value = Post._meta.get_field(field).to_python(value)
+        if value is None:
+            raise ValueError(cursor)
+        return value, int(pk)
+    except (
+        binascii.Error, UnicodeDecodeError, ValueError, ValidationError
+    ) as exc:
+        raise InvalidCursor(cursor) from exc
+
+
+def paginate_feed(queryset, cursor=None, page_size=None, sort="new"):
+    """
+    Return (posts, next_cursor) for one feed page, ordered by the
+    FEED_SORTS column for `sort`, highest / newest first.
+
+    Seeks past the cursor with WHERE (column, id) < (...) instead of
+    OFFSET, so every page costs the same however deep it is, and each
+    ordering is a scan of its index. next_cursor is None on the last
+    page.
+    """
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    field = FEED_SORTS[sort]
+    queryset = queryset.order_by(f"-{field}", "-id")
+
+    if cursor:
+        value, pk = decode_cursor(cursor, field)
+        queryset = queryset.filter(
+            Q(**{f"{field}__lt": value}) | Q(**{field: value, "id__lt": pk})
+        )
+
+    posts = list(queryset[: page_size + 1])
+    if len(posts) <= page_size:
+        return posts, None
+
+    posts = posts[:page_size]
+    return posts, encode_cursor(posts[-1], field)
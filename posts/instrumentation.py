@@ -0,0 +1,328 @@
+"""
+Per-request instrumentation: wall time, DB queries and time, repeated
+queries (likely N+1), template render time and cache hits / misses,
+per resolved URL name.
+
+Sampled requests (settings.INSTRUMENTATION_SAMPLE_RATE) get a
+Server-Timing header and feed the histograms served at /metrics/.
+Metrics live in process memory: Prometheus scrapes each worker.
+With a sample rate of 0 the middleware removes itself at startup.
+"""
+
+import logging
+import random
+import threading
+from bisect import bisect_left
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Template
+
+logger = logging.getLogger(__name__)
+
+_sample = ContextVar("request_sample", default=None)
+
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+QUERIES = (1, 2, 5, 10, 20, 50, 100)
+
+
+# -----------------------------
+# Per-Request Sample
+# -----------------------------
+class Sample:
+    """What one sampled request spent its time on."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.sql = Counter()
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache = Counter()  # (cache alias, "hit" / "miss")
+
+    def execute(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook: time and count each query."""
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += perf_counter() - start
+            self.queries += 1
+            self.sql[sql] += 1
+
+    def repeated_queries(self):
+        """{sql: times} for statements run often enough to be an N+1."""
+        threshold = settings.INSTRUMENTATION_DUPLICATE_QUERIES
+        return {sql: n for sql, n in self.sql.items() if n >= threshold}
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count a cache lookup against the current sampled request."""
+    sample = _sample.get()
+    if sample is not None:
+        sample.cache[(cache, "hit" if hit else "miss")] += 1
+
+
+def _instrument_templates() -> None:
+    """
+    Time template rendering by wrapping Template._render once (as
+    Django's test runner does). Outside sampled requests the wrapper
+    only reads a ContextVar.
+    """
+    render = Template._render
+    if getattr(render, "instrumented", False):
+        return
+
+    def _render(self, context):
+        sample = _sample.get()
+        if sample is None:
+            return render(self, context)
+
+        # {% include %} renders nested templates: time the outermost.
+        sample.template_depth += 1
+        start = perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            sample.template_depth -= 1
+            if not sample.template_depth:
+                sample.template_time += perf_counter() - start
+
+    _render.instrumented = True
+    Template._render = _render
+
+
+# -----------------------------
+# Prometheus Registry
+# -----------------------------
+def _labels(labels: dict) -> str:
+    return ",".join(
+        '{}="{}"'.format(
+            key,
+            str(value)
+            .replace("\\", "\\\\")
+            .replace('"', '\\"')
+            .replace("\n", "\\n"),
+        )
+        for key, value in labels.items()
+    )
+
+
+class Registry:
+    """Thread-safe counters and histograms, rendered as Prometheus text."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.help = {}
+        self.histograms = {}  # name -> (buckets, {labels: [counts, sum]})
+        self.counters = {}  # name -> {labels: value}
+
+    def histogram(self, name, help_text, buckets):
+        self.help[name] = help_text
+        self.histograms[name] = (buckets, {})
+
+    def counter(self, name, help_text):
+        self.help[name] = help_text
+        self.counters[name] = {}
+
+    def observe(self, name, value, **labels):
+        buckets, series = self.histograms[name]
+        key = tuple(labels.items())
+        with self.lock:
+            if key not in series:
+                series[key] = [[0] * (len(buckets) + 1), 0.0]
+            counts = series[key]
+            counts[0][bisect_left(buckets, value)] += 1
+            counts[1] += value
+
+    def inc(self, name, amount=1, **labels):
+        series = self.counters[name]
+        key = tuple(labels.items())
+        with self.lock:
+            series[key] = series.get(key, 0) + amount
+
+    def reset(self):
+        with self.lock:
+            for _, series in self.histograms.values():
+                series.clear()
+            for series in self.counters.values():
+                series.clear()
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            for name, (buckets, series) in self.histograms.items():
+                lines += [
+                    f"# HELP {name} {self.help[name]}",
+                    f"# TYPE {name} histogram",
+                ]
+                for key, (counts, total) in sorted(series.items()):
+                    labels = _labels(dict(key))
+                    seen = 0
+                    for bound, count in zip((*buckets, "+Inf"), counts):
+                        seen += count
+                        lines.append(
+                            f'{name}_bucket{{{labels},le="{bound}"}} {seen}'
+                        )
+                    lines.append(f"{name}_sum{{{labels}}} {total}")
+                    lines.append(f"{name}_count{{{labels}}} {seen}")
+
+            for name, series in self.counters.items():
+                lines += [
+                    f"# HELP {name} {self.help[name]}",
+                    f"# TYPE {name} counter",
+                ]
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{{{_labels(dict(key))}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+REGISTRY.histogram(
+    "crow_request_duration_seconds", "Request wall time", SECONDS
+)
+REGISTRY.histogram("crow_db_duration_seconds", "DB time per request", SECONDS)
+REGISTRY.histogram("crow_db_queries", "DB queries per request", QUERIES)
+REGISTRY.histogram(
+    "crow_template_duration_seconds", "Template render time", SECONDS
+)
+REGISTRY.counter("crow_requests_total", "Sampled requests")
+REGISTRY.counter(
+    "crow_repeated_queries_total",
+    "Requests running one statement INSTRUMENTATION_DUPLICATE_QUERIES+ "
+    "times (N+1 suspects)",
+)
+REGISTRY.counter("crow_cache_requests_total", "Cache lookups")
+
+
+# -----------------------------
+# Middleware
+# -----------------------------
+class RequestMetricsMiddleware:
+    """
+    Instrument a sample of requests (see module docstring). Runs sync
+    under WSGI and async under ASGI, like Django's own middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.rate = settings.INSTRUMENTATION_SAMPLE_RATE
+        if self.rate <= 0:
+            raise MiddlewareNotUsed
+        _instrument_templates()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        sample = Sample()
+        token = _sample.set(sample)
+        start = perf_counter()
+        try:
+            with ExitStack() as stack:
+                self.wrap_connections(stack, sample)
+                response = self.get_response(request)
+        finally:
+            _sample.reset(token)
+        return self.finish(request, response, sample, start)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        sample = Sample()
+        token = _sample.set(sample)
+        start = perf_counter()
+        try:
+            # Async views query from sync_to_async's thread: wrap the
+            # connections there, not on the event loop's thread.
+            stack = ExitStack()
+            try:
+                await sync_to_async(self.wrap_connections)(stack, sample)
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            _sample.reset(token)
+        return self.finish(request, response, sample, start)
+
+    def sampled(self) -> bool:
+        return self.rate >= 1 or random.random() < self.rate
+
+    def wrap_connections(self, stack, sample) -> None:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(sample.execute))
+
+    def finish(self, request, response, sample, start):
+        elapsed = perf_counter() - start
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else "unresolved"
+        self.record(view, response, sample, elapsed)
+        response.headers["Server-Timing"] = self.server_timing(
+            sample, elapsed
+        )
+        return response
+
+    def record(self, view, response, sample, elapsed):
+        REGISTRY.observe("crow_request_duration_seconds", elapsed, view=view)
+        REGISTRY.observe("crow_db_duration_seconds", sample.db_time, view=view)
+        REGISTRY.observe("crow_db_queries", sample.queries, view=view)
+        REGISTRY.observe(
+            "crow_template_duration_seconds", sample.template_time, view=view
+        )
+        REGISTRY.inc(
+            "crow_requests_total",
+            view=view,
+            status=f"{response.status_code // 100}xx",
+        )
+        for (cache, result), count in sample.cache.items():
+            REGISTRY.inc(
+                "crow_cache_requests_total", count, cache=cache, result=result
+            )
+
+        repeated = sample.repeated_queries()
+        if repeated:
+            REGISTRY.inc("crow_repeated_queries_total", view=view)
+            sql, times = max(repeated.items(), key=lambda item: item[1])
+            logger.warning(
+                "%s ran the same query %d times (N+1?): %s",
+                view,
+                times,
+                sql[:300],
+            )
+
+    def server_timing(self, sample, elapsed) -> str:
+        parts = [
+            f"total;dur={elapsed * 1000:.1f}",
+            f'db;dur={sample.db_time * 1000:.1f};desc="{sample.queries} '
+            f'queries"',
+            f"tpl;dur={sample.template_time * 1000:.1f}",
+        ]
+        repeated = sample.repeated_queries()
+        if repeated:
+            parts.append(f'dupes;desc="{len(repeated)} repeated queries"')
+        caches = sorted({cache for cache, _ in sample.cache})
+        for cache in caches:
+            hits = sample.cache[(cache, "hit")]
+            misses = sample.cache[(cache, "miss")]
+            parts.append(
+                f'cache-{cache};desc="{hits} hit, {misses} miss"'
+            )
+        return ", ".join(parts)
@@ -0,0 +1,220 @@
+"""
+Live post updates, pushed to pages over Server-Sent Events
+(views.post_events, on the ASGI server).
+
+Votes and comments only mark their post as changed. Once per LIVE_TICK
+seconds a background thread reads the changed posts' counters, renders
+their new comments and publishes one message per post:
+
+    {"post": 1, "score": 12, "comment_count": 3,
+     "comments": [{"id": 7, "parent": null, "html": "..."}]}
+
+so a busy post costs one message per tick, not one per vote.
+
+LIVE_BACKEND delivers messages to the subscribed streams. LocalBroker
+only reaches streams in this process; for several processes or nodes,
+point it at a class with the same two methods over a shared channel
+(e.g. Redis pub/sub): publish(post_id, message), called from the
+ticker thread, and subscribe(*post_ids), an async context manager
+yielding an asyncio.Queue of messages.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections, transaction
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()  # guards _changed and _ticker
+_changed = {}  # post id -> ids of comments added since the last tick
+_ticker = None
+
+
+# -----------------------------
+# Brokers
+# -----------------------------
+class LocalBroker:
+    """Delivers messages to the streams of this process only."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._queues = defaultdict(set)  # post id -> {(loop, queue)}
+
+    def publish(self, post_id: int, message: dict) -> None:
+        with self._lock:
+            queues = list(self._queues.get(post_id, ()))
+        for loop, queue in queues:
+            try:
+                loop.call_soon_threadsafe(_deliver, queue, message)
+            except RuntimeError:
+                pass  # event loop closed: the stream is going away
+
+    @asynccontextmanager
+    async def subscribe(self, *post_ids):
+        entry = (
+            asyncio.get_running_loop(),
+            asyncio.Queue(settings.LIVE_QUEUE_SIZE),
+        )
+        with self._lock:
+            for post_id in post_ids:
+                self._queues[post_id].add(entry)
+        try:
+            yield entry[1]
+        finally:
+            with self._lock:
+                for post_id in post_ids:
+                    self._queues[post_id].discard(entry)
+                    if not self._queues[post_id]:
+                        del self._queues[post_id]
+
+
+def _deliver(queue, message):
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        pass  # a stalled client skips ticks; the next one catches up
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    """Return the configured broker (settings.LIVE_BACKEND)."""
+    return import_string(settings.LIVE_BACKEND)()
+
+
+@receiver(setting_changed)
+def _reset(setting, **kwargs):
+    if setting == "LIVE_BACKEND":
+        get_broker.cache_clear()
+
+
+# -----------------------------
+# Recording Changes
+# -----------------------------
+def post_changed(*post_ids: int) -> None:
+    """Push the posts' counters with the next tick (after commit)."""
+    if settings.LIVE_UPDATES and post_ids:
+        transaction.on_commit(lambda: _mark(post_ids, ()))
+
+
+def comment_added(comment) -> None:
+    """Push a new comment (and its post's counters) with the next tick."""
+    if settings.LIVE_UPDATES:
+        transaction.on_commit(
+            lambda: _mark((comment.post_id,), (comment.pk,))
+        )
+
+
+def _mark(post_ids, comment_ids) -> None:
+    with _lock:
+        for post_id in post_ids:
+            _changed.setdefault(post_id, []).extend(comment_ids)
+    _start_ticker()
+
+
+# -----------------------------
+# Publishing
+# -----------------------------
+def tick() -> int:
+    """Publish one message per changed post. Returns the count."""
+    global _changed
+
+    from .models import Comment, Post
+
+    with _lock:
+        changed, _changed = _changed, {}
+    if not changed:
+        return 0
+
+    messages = {
+        post_id: {
+            "post": post_id,
+            "score": score,
+            "comment_count": comment_count,
+            "comments": [],
+        }
+        for post_id, score, comment_count in Post.objects.filter(
+            pk__in=changed
+        ).values_list("pk", "score", "comment_count")
+    }
+
+    comment_ids = [pk for ids in changed.values() for pk in ids]
+    comments = (
+        Comment.objects.filter(pk__in=comment_ids)
+        .select_related("author")
+        .order_by("path")
+    )
+    for comment in comments:
+        message = messages.get(comment.post_id)
+        if message is None:
+            continue
+        # Rendered without a user: no reply / edit controls
+        comment.children, comment.more_replies = [], 0
+        html = render_to_string(
+            "posts/comment_node.html",
+            {
+                "comment": comment,
+                "kind": "reply" if comment.parent_id else "comment",
+            },
+        )
+        message["comments"].append(
+            {"id": comment.pk, "parent": comment.parent_id, "html": html}
+        )
+
+    broker = get_broker()
+    for post_id, message in messages.items():
+        broker.publish(post_id, message)
+    return len(messages)
+
+
+def _start_ticker() -> None:
+    global _ticker
+
+    if _ticker is not None:
+        return
+    with _lock:
+        if _ticker is None:
+            _ticker = threading.Thread(
+                target=_run, name="live-ticker", daemon=True
+            )
+            _ticker.start()
+
+
+def _run() -> None:
+    while True:
+        time.sleep(settings.LIVE_TICK)
+        try:
+            tick()
+        except Exception:
+            logger.exception("Live update tick failed")
+        finally:
+            close_old_connections()
+
+
+# -----------------------------
+# Event Streams
+# -----------------------------
+async def stream(post_ids):
+    """SSE body: one event per published message, plus keepalives."""
+    yield "retry: 5000\n\n"
+    async with get_broker().subscribe(*post_ids) as queue:
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    queue.get(), settings.LIVE_KEEPALIVE
+                )
+            except TimeoutError:
+                yield ": keepalive\n\n"  # keeps proxies from timing out
+                continue
+            yield f"data: {json.dumps(message)}\n\n"
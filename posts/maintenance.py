@@ -0,0 +1,350 @@
+"""
+Helpers for the streaming maintenance commands (purge_posts,
+archive_posts, purge_orphan_media, clear_media).
+
+- pk_chunks() walks a queryset in primary-key ranges, so every chunk
+  is an index range read however far the run has got.
+- Checkpoint stores the last finished pk after each chunk; --resume
+  continues from it after an interruption.
+- Progress prints running totals and throughput.
+- archive_records() streams posts with their comments, media and
+  votes as plain dicts, one per post, for archive_posts' JSONL and
+  the ArchivedPost table (posts.archive).
+- delete_posts() / delete_media() issue one raw DELETE per table per
+  chunk instead of loading rows for Django's per-row cascade and
+  signals. Whatever those signals maintain (counters, search index,
+  caches, card versions) is adjusted here in aggregate, and the media
+  files are deleted through the media backend (posts.storage).
+"""
+
+import json
+import logging
+import os
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from . import categories, typeahead
+from .models import (
+    Comment,
+    Post,
+    PostMedia,
+    TimelineEntry,
+    UserStats,
+    Vote,
+)
+from .pagecache import GLOBAL_TAG, invalidate_tags
+from .search import get_search_backend
+from .storage import get_media_backend
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------------
+# Chunks, Checkpoints, Progress
+# -----------------------------
+def pk_chunks(queryset, chunk_size: int, after: int = 0):
+    """Yield ascending lists of up to `chunk_size` pks above `after`."""
+    while True:
+        pks = list(
+            queryset.filter(pk__gt=after)
+            .order_by("pk")
+            .values_list("pk", flat=True)[:chunk_size]
+        )
+        if not pks:
+            return
+        yield pks
+        after = pks[-1]
+
+
+class Checkpoint:
+    """
+    Progress of one command run, saved as JSON under
+    MAINTENANCE_STATE_DIR. Resuming requires the same options.
+    """
+
+    def __init__(self, name: str, options: dict):
+        self.path = Path(settings.MAINTENANCE_STATE_DIR) / f"{name}.json"
+        self.options = options
+        self.state = {}
+
+    def start(self, resume: bool) -> int:
+        """Return the pk to continue after (0 for a fresh run)."""
+        if not resume or not self.path.exists():
+            self.state = {}
+            return 0
+        state = json.loads(self.path.read_text())
+        if state["options"] != self.options:
+            raise CommandError(
+                f"{self.path} was saved by a run with other options: "
+                f"{state['options']}"
+            )
+        self.state = state.get("extra", {})
+        return state["last_pk"]
+
+    def save(self, last_pk: int, **extra) -> None:
+        self.state.update(extra)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps(
+                {
+                    "options": self.options,
+                    "last_pk": last_pk,
+                    "extra": self.state,
+                }
+            )
+        )
+        os.replace(tmp, self.path)  # never leave a half-written file
+
+    def finish(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+class Progress:
+    """Running totals and rows/second, one line per chunk."""
+
+    def __init__(self, stdout, noun: str):
+        self.stdout = stdout
+        self.noun = noun
+        self.done = 0
+        self.started = time.monotonic()
+
+    def rate(self) -> float:
+        return self.done / max(time.monotonic() - self.started, 1e-6)
+
+    def add(self, count: int, last_pk=None) -> None:
+        self.done += count
+        through = f" (through id {last_pk})" if last_pk else ""
+        self.stdout.write(
+            f"  {self.done} {self.noun}{through}, {self.rate():.0f}/s"
+        )
+
+    def summary(self, verb: str) -> str:
+        elapsed = time.monotonic() - self.started
+        return (
+            f"{verb} {self.done} {self.noun} in {elapsed:.1f}s "
+            f"({self.rate():.0f}/s)"
+        )
+
+
+# -----------------------------
+# Archive Records
+# -----------------------------
+POST_FIELDS = [
+    "id",
+    "author_id",
+    "category_id",
+    "title",
+    "content",
+    "created_at",
+    "score",
+    "upvotes",
+    "downvotes",
+    "comment_count",
+    "version",
+]
+COMMENT_FIELDS = [
+    "id",
+    "author_id",
+    "parent_id",
+    "content",
+    "created_at",
+    "path",
+    "depth",
+]
+MEDIA_FIELDS = [
+    "id",
+    "file",
+    "status",
+    "original_name",
+    "position",
+    *PostMedia.METADATA_FIELDS,
+]
+
+
+def _plain(row: dict) -> dict:
+    """JSON-ready copy of a values() row."""
+    file_field = PostMedia._meta.get_field("file")
+    for key, value in row.items():
+        if hasattr(value, "isoformat"):
+            row[key] = value.isoformat()
+        elif key == "file":
+            row[key] = file_field.get_prep_value(value)
+    return row
+
+
+def _grouped(queryset, fields, chunk_size):
+    """{post id: [rows]} for the queryset, in its order."""
+    rows = queryset.values("post_id", *fields).iterator(
+        chunk_size=chunk_size
+    )
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row.pop("post_id"), []).append(_plain(row))
+    return grouped
+
+
+def archive_records(post_ids, chunk_size: int):
+    """
+    Yield one dict per post: its columns (author username and category
+    name included, for reading without the database), its comments in
+    thread order, its media and its votes as [user id, value] pairs.
+    """
+    comments = _grouped(
+        Comment.objects.filter(post__in=post_ids).order_by("post", "path"),
+        COMMENT_FIELDS,
+        chunk_size,
+    )
+    media = _grouped(
+        PostMedia.objects.filter(post__in=post_ids).order_by(
+            "post", "position", "id"
+        ),
+        MEDIA_FIELDS,
+        chunk_size,
+    )
+    votes = {}
+    for post_id, user_id, value in (
+        Vote.objects.filter(post__in=post_ids)
+        .values_list("post_id", "user_id", "value")
+        .iterator(chunk_size=chunk_size)
+    ):
+        votes.setdefault(post_id, []).append([user_id, value])
+    posts = (
+        Post.objects.filter(pk__in=post_ids)
+        .order_by("pk")
+        .values(*POST_FIELDS, "author__username", "category__name")
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in posts:
+        record = _plain(row)
+        record["author"] = record.pop("author__username")
+        record["category"] = record.pop("category__name")
+        record["comments"] = comments.get(record["id"], [])
+        record["media"] = media.get(record["id"], [])
+        record["votes"] = votes.get(record["id"], [])
+        yield record
+
+
+# -----------------------------
+# Bulk Deletes
+# -----------------------------
+def _raw_delete(queryset) -> int:
+    """One DELETE statement: no row loading, cascades or signals."""
+    return queryset._raw_delete(queryset.db)
+
+
+def delete_posts(post_ids, keep_files: bool = False) -> int:
+    """
+    Delete posts with their votes, comments, media and timeline
+    entries. Keeps UserStats and the search index in step; call
+    expire_caches() once the run is done.
+
+    Staged and stored media files are deleted after commit, unless
+    `keep_files` (an archive still points at them).
+    """
+    posts = Post.objects.filter(pk__in=post_ids)
+    comments = Comment.objects.filter(post__in=post_ids)
+    media = PostMedia.objects.filter(post__in=post_ids)
+
+    with transaction.atomic():
+        authors = posts.values("author").annotate(
+            total=Count("id"), karma=Sum("score")
+        )
+        post_stats = {
+            row["author"]: (row["total"], row["karma"]) for row in authors
+        }
+        category_counts = Counter(
+            dict(
+                posts.filter(category__isnull=False)
+                .values("category")
+                .annotate(total=Count("id"))
+                .values_list("category", "total")
+            )
+        )
+        comment_stats = Counter(
+            dict(
+                comments.values("author")
+                .annotate(total=Count("id"))
+                .values_list("author", "total")
+            )
+        )
+        files = ([], []) if keep_files else _media_files(media)
+
+        _raw_delete(Vote.objects.filter(post__in=post_ids))
+        _raw_delete(comments)
+        _raw_delete(media)
+        _raw_delete(TimelineEntry.objects.filter(post__in=post_ids))
+        deleted = _raw_delete(posts)
+
+        for user_id in post_stats.keys() | comment_stats.keys():
+            post_count, karma = post_stats.get(user_id, (0, 0))
+            UserStats.adjust(
+                user_id,
+                post_count=-post_count,
+                karma=-(karma or 0),
+                comment_count=-comment_stats[user_id],
+            )
+        for category_id, total in category_counts.items():
+            categories.adjust_count(category_id, -total)
+        get_search_backend().remove_posts(post_ids)
+        transaction.on_commit(lambda: _remove_files(*files))
+    return deleted
+
+
+def delete_media(media_ids, keep_files: bool = False) -> int:
+    """
+    Delete PostMedia rows and (after commit, unless `keep_files`) their
+    staged and stored files; bump card versions.
+    """
+    media = PostMedia.objects.filter(pk__in=media_ids)
+    with transaction.atomic():
+        post_ids = set(media.values_list("post", flat=True))
+        files = ([], []) if keep_files else _media_files(media)
+        deleted = _raw_delete(media)
+        Post.objects.filter(pk__in=post_ids).update(
+            version=F("version") + 1
+        )
+        transaction.on_commit(lambda: _remove_files(*files))
+    return deleted
+
+
+def _media_files(media):
+    """(staged paths, stored files) of a PostMedia queryset."""
+    staged, stored = [], []
+    for path, resource in media.values_list("staged_path", "file"):
+        if path:
+            staged.append(path)
+        if resource is not None and resource.public_id:
+            stored.append(resource)
+    return staged, stored
+
+
+def _remove_files(staged, stored) -> None:
+    for path in staged:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    backend = get_media_backend()
+    for resource in stored:
+        try:
+            backend.delete(resource)
+        except Exception:
+            # Left behind, not fatal: the rows are already gone
+            logger.warning(
+                "Could not delete media file %s", resource, exc_info=True
+            )
+
+
+def expire_caches() -> None:
+    """Drop what per-row signals would have expired row by row."""
+    invalidate_tags(GLOBAL_TAG)
+    typeahead.invalidate()
+    categories.invalidate()
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import archive, maintenance
+
+
+class Command(BaseCommand):
+    help = (
+        "Move posts older than ARCHIVE_AFTER_DAYS, without recent "
+        "comments, to the ArchivedPost table (posts.archive); resumable"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.MAINTENANCE_CHUNK_SIZE,
+            help="Posts archived per transaction (default "
+            "MAINTENANCE_CHUNK_SIZE)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count cold posts without archiving them",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continue an interrupted run",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        checkpoint = maintenance.Checkpoint(
+            "archive_cold_posts",
+            {
+                "after_days": settings.ARCHIVE_AFTER_DAYS,
+                "inactive_days": settings.ARCHIVE_INACTIVE_DAYS,
+            },
+        )
+        last_pk = checkpoint.start(options["resume"])
+        if last_pk:
+            self.stdout.write(f"Resuming after post {last_pk}")
+            now = parse_datetime(checkpoint.state["now"])
+        else:
+            now = timezone.now()
+            checkpoint.state["now"] = now.isoformat()
+
+        progress = maintenance.Progress(self.stdout, "posts")
+        for pks in maintenance.pk_chunks(
+            archive.cold_posts(now), options["chunk_size"], after=last_pk
+        ):
+            if dry_run:
+                count = len(pks)
+            else:
+                count = archive.archive(pks, now)
+                checkpoint.save(pks[-1])
+            progress.add(count, pks[-1])
+
+        if not dry_run:
+            checkpoint.finish()
+            maintenance.expire_caches()
+        verb = "Found" if dry_run else "Archived"
+        self.stdout.write(self.style.SUCCESS(progress.summary(verb)))
@@ -0,0 +1,152 @@
+import gzip
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import maintenance
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Write posts older than --older-than days, with their comments "
+        "and media, to gzipped JSON Lines (one post per line); optionally "
+        "delete them afterwards. Resumable"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            required=True,
+            metavar="DAYS",
+            help="Archive posts created more than DAYS days ago",
+        )
+        parser.add_argument(
+            "--output",
+            required=True,
+            help="Archive file (.jsonl.gz); appended to with --resume",
+        )
+        parser.add_argument(
+            "--overwrite",
+            action="store_true",
+            help="Replace an existing --output file on a fresh run",
+        )
+        parser.add_argument(
+            "--delete",
+            action="store_true",
+            help="Delete each chunk of posts once it is written (media "
+            "files are kept: the archive points at them)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.MAINTENANCE_CHUNK_SIZE,
+            help="Posts per chunk (default MAINTENANCE_CHUNK_SIZE)",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continue an interrupted run with the same options",
+        )
+
+    def handle(self, *args, **options):
+        output = os.path.abspath(options["output"])
+        chunk_size = options["chunk_size"]
+        delete = options["delete"]
+
+        checkpoint = maintenance.Checkpoint(
+            "archive_posts",
+            {
+                "older_than": options["older_than"],
+                "output": output,
+                "delete": delete,
+            },
+        )
+        last_pk = checkpoint.start(options["resume"])
+        state = checkpoint.state
+
+        if last_pk:
+            undo = state.get("undo")
+            if undo and Post.objects.filter(pk__in=undo["pks"]).exists():
+                # The last chunk's delete never committed: redo it
+                last_pk, state["offset"] = undo["after"], undo["offset"]
+            self.stdout.write(f"Resuming after post {last_pk}")
+            # Drop whatever a crashed chunk wrote past the checkpoint
+            with open(output, "r+b") as archive:
+                archive.truncate(state["offset"])
+        else:
+            if os.path.exists(output) and not options["overwrite"]:
+                raise CommandError(
+                    f"{output} already exists: pass --resume to continue "
+                    "the run that wrote it, or --overwrite to replace it"
+                )
+            state["cutoff"] = (
+                timezone.now() - timedelta(days=options["older_than"])
+            ).isoformat()
+            open(output, "wb").close()
+
+        posts = Post.objects.filter(
+            created_at__lt=parse_datetime(state["cutoff"])
+        )
+        progress = maintenance.Progress(self.stdout, "posts")
+
+        with open(output, "ab") as archive:
+            for chunk in maintenance.pk_chunks(
+                posts, chunk_size, after=last_pk
+            ):
+                pks, offset = chunk, archive.tell()
+                with transaction.atomic():
+                    if delete:
+                        # Votes and comments on locked posts wait for the
+                        # commit, so nothing is deleted without being
+                        # archived first
+                        pks = list(
+                            posts.select_for_update()
+                            .filter(pk__in=chunk)
+                            .values_list("pk", flat=True)
+                        )
+                    lines = [
+                        json.dumps(record) + "\n"
+                        for record in maintenance.archive_records(
+                            pks, chunk_size
+                        )
+                    ]
+                    # One gzip member per chunk: the file stays a valid
+                    # .gz after every chunk (readers concatenate members)
+                    archive.write(gzip.compress("".join(lines).encode()))
+                    archive.flush()
+                    os.fsync(archive.fileno())
+
+                    if delete and pks:
+                        maintenance.delete_posts(pks, keep_files=True)
+                        # If the commit doesn't happen, --resume finds
+                        # the posts still there and redoes the chunk
+                        checkpoint.save(
+                            chunk[-1],
+                            offset=archive.tell(),
+                            undo={
+                                "after": last_pk,
+                                "offset": offset,
+                                "pks": pks,
+                            },
+                        )
+
+                last_pk = chunk[-1]
+                checkpoint.save(last_pk, offset=archive.tell(), undo=None)
+                progress.add(len(lines), last_pk)
+
+        checkpoint.finish()
+        if delete:
+            maintenance.expire_caches()
+        self.stdout.write(
+            self.style.SUCCESS(
+                progress.summary("Archived") + f" to {output}"
+            )
+        )
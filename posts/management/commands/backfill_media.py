@@ -0,0 +1,80 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts.models import PostMedia
+from posts.storage import get_media_backend
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the PostMedia metadata columns (type, MIME type, size, "
+        "dimensions, duration) of media uploaded before they existed"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Rows per bulk update (default 500)",
+        )
+        parser.add_argument(
+            "--fetch",
+            action="store_true",
+            help=(
+                "Ask the media backend for size / dimensions / duration "
+                "(one API call per file); otherwise only the type and "
+                "MIME type, read from the stored value"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        missing = Q(resource_type="")
+        if options["fetch"]:
+            missing |= Q(file_size__isnull=True)
+        queryset = (
+            PostMedia.objects.filter(missing, status=PostMedia.READY)
+            .exclude(file__isnull=True)
+            .exclude(file="")
+        )
+        backend = get_media_backend()
+
+        done = failed = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                queryset.filter(pk__gt=last_pk).order_by("pk")[
+                    : options["batch_size"]
+                ]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            for media in batch:
+                metadata = {}
+                if options["fetch"]:
+                    try:
+                        metadata = backend.describe(media.file)
+                    except Exception:
+                        logger.warning(
+                            "Can't describe PostMedia %s",
+                            media.pk,
+                            exc_info=True,
+                        )
+                        failed += 1
+                media.set_metadata(metadata)
+
+            PostMedia.objects.bulk_update(batch, PostMedia.METADATA_FIELDS)
+            done += len(batch)
+            self.stdout.write(f"Backfilled {done} media")
+
+        if failed:
+            self.stdout.write(
+                self.style.WARNING(f"{failed} files could not be described")
+            )
+        self.stdout.write(self.style.SUCCESS(f"Done: {done} media updated"))
@@ -0,0 +1,75 @@
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from posts.feed import feed_queryset
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark rendering a page of post cards with a cold and a "
+        "warm fragment cache"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--cards",
+            type=int,
+            default=50,
+            help="Number of newest posts rendered per page (default 50)",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="Renders timed per scenario (default 20)",
+        )
+
+    def handle(self, *args, **options):
+        request = RequestFactory().get("/")
+        request.user = AnonymousUser()
+
+        # Fetch once: only template rendering is timed.
+        posts = list(
+            feed_queryset(request.user).order_by("-created_at", "-id")[
+                : options["cards"]
+            ]
+        )
+        if len(posts) < options["cards"]:
+            self.stdout.write(
+                self.style.WARNING(f"Only {len(posts)} posts found")
+            )
+
+        fragments = caches["template_fragments"]
+
+        def render():
+            start = time.perf_counter()
+            render_to_string(
+                "posts/post_cards.html", {"posts": posts}, request=request
+            )
+            return (time.perf_counter() - start) * 1000
+
+        cold = []
+        for _ in range(options["repeat"]):
+            fragments.clear()
+            cold.append(render())
+
+        render()  # warm up
+        warm = [render() for _ in range(options["repeat"])]
+
+        for label, timings in (("cold", cold), ("warm", warm)):
+            self.stdout.write(
+                f"{label}: {len(posts)} cards, "
+                f"median {statistics.median(timings):.2f} ms, "
+                f"min {min(timings):.2f} ms, max {max(timings):.2f} ms"
+            )
+
+        speedup = statistics.median(cold) / statistics.median(warm)
+        self.stdout.write(
+            self.style.SUCCESS(f"warm/cold speedup: {speedup:.1f}x")
+        )
@@ -0,0 +1,254 @@
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.management.commands.seed import WORDS
+from posts.models import Comment, Post, Vote
+
+PERCENTILES = (50, 95, 99)
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the main views through the test client and write p50 / "
+        "p95 / p99 latency, query counts and peak memory to a JSON report "
+        "(run on a seeded, disposable database: votes are written)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Timed requests per scenario (default 200)",
+        )
+        parser.add_argument(
+            "--output",
+            default="benchmark.json",
+            help="Report path (default benchmark.json)",
+        )
+        parser.add_argument(
+            "--compare",
+            metavar="REPORT",
+            help="Earlier report to print changes against",
+        )
+        parser.add_argument(
+            "--no-page-cache",
+            action="store_true",
+            help="Disable the anonymous page cache (PAGE_CACHE_ENABLED)",
+        )
+        parser.add_argument(
+            "--random-seed",
+            type=int,
+            default=0,
+            help="Seed for the URLs requested (default 0)",
+        )
+
+    def handle(self, *args, **options):
+        if options["requests"] < 2:
+            raise CommandError("--requests must be at least 2")
+
+        self.rng = random.Random(options["random_seed"])
+        self.post_ids = list(
+            Post.objects.order_by("-id").values_list("id", flat=True)[:5000]
+        )
+        self.user = User.objects.order_by("id").first()
+        if not self.post_ids or self.user is None:
+            raise CommandError("No data: run `manage.py seed` first")
+        self.usernames = list(
+            Post.objects.filter(pk__in=self.post_ids[:500])
+            .values_list("author__username", flat=True)
+            .distinct()
+        )
+
+        with override_settings(
+            # The test client's host, no throttling, and plain static
+            # URLs (no collectstatic manifest needed).
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            TYPEAHEAD_THROTTLE=(10**9, 10**9),
+            PAGE_CACHE_ENABLED=(
+                settings.PAGE_CACHE_ENABLED and not options["no_page_cache"]
+            ),
+            STORAGES={
+                **settings.STORAGES,
+                "staticfiles": {
+                    "BACKEND": (
+                        "django.contrib.staticfiles.storage."
+                        "StaticFilesStorage"
+                    ),
+                },
+            },
+        ):
+            scenarios = {
+                name: self.run_scenario(make_request, options)
+                for name, make_request in self.scenarios()
+            }
+
+        report = {
+            "commit": self.git_commit(),
+            "created_at": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "database": connection.vendor,
+            "page_cache": not options["no_page_cache"],
+            "dataset": {
+                "users": User.objects.count(),
+                "posts": Post.objects.count(),
+                "comments": Comment.objects.count(),
+                "votes": Vote.objects.count(),
+            },
+            "requests": options["requests"],
+            "scenarios": scenarios,
+        }
+        with open(options["output"], "w") as fh:
+            json.dump(report, fh, indent=2)
+
+        self.print_report(report)
+        if options["compare"]:
+            with open(options["compare"]) as fh:
+                self.print_comparison(json.load(fh), report)
+        self.stdout.write(
+            self.style.SUCCESS(f"Report written to {options['output']}")
+        )
+
+    # -----------------------------
+    # Scenarios
+    # -----------------------------
+    def scenarios(self):
+        """(name, request maker) per benchmarked view."""
+        anonymous = Client()
+        member = Client()
+        member.force_login(self.user)
+
+        def post_url():
+            return reverse(
+                "post_detail", args=[self.rng.choice(self.post_ids)]
+            )
+
+        def profile_url():
+            return reverse(
+                "profile_page", args=[self.rng.choice(self.usernames)]
+            )
+
+        def vote():
+            return member.post(
+                reverse("vote_post", args=[self.rng.choice(self.post_ids)]),
+                {"action": self.rng.choice(["upvote", "downvote"])},
+                content_type="application/json",
+            )
+
+        def search():
+            word = self.rng.choice(WORDS)
+            prefix = word[: self.rng.randint(2, len(word))]
+            return anonymous.get(reverse("ajax_search"), {"q": prefix})
+
+        return [
+            ("home", lambda: anonymous.get(reverse("home"))),
+            ("home_member", lambda: member.get(reverse("home"))),
+            (
+                "home_hot",
+                lambda: anonymous.get(reverse("home"), {"sort": "hot"}),
+            ),
+            ("post_detail", lambda: anonymous.get(post_url())),
+            ("post_detail_member", lambda: member.get(post_url())),
+            ("vote_post", vote),
+            ("ajax_search", search),
+            ("profile_page", lambda: anonymous.get(profile_url())),
+        ]
+
+    def run_scenario(self, make_request, options):
+        queries = []
+
+        def count_queries(execute, sql, params, many, context):
+            queries[-1] += 1
+            return execute(sql, params, many, context)
+
+        make_request()  # warm up (imports, template loading)
+        timings, statuses = [], {}
+        with connection.execute_wrapper(count_queries):
+            for _ in range(options["requests"]):
+                queries.append(0)
+                start = time.perf_counter()
+                response = make_request()
+                timings.append((time.perf_counter() - start) * 1000)
+                status = str(response.status_code)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        # Separate pass: tracemalloc slows every allocation down
+        tracemalloc.start()
+        peak = 0
+        for _ in range(min(10, options["requests"])):
+            tracemalloc.reset_peak()
+            make_request()
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+        cuts = statistics.quantiles(timings, n=100, method="inclusive")
+        result = {
+            f"p{p}_ms": round(cuts[p - 1], 3) for p in PERCENTILES
+        }
+        result.update(
+            mean_ms=round(statistics.fmean(timings), 3),
+            queries_mean=round(statistics.fmean(queries), 2),
+            queries_max=max(queries),
+            peak_memory_kib=round(peak / 1024, 1),
+            statuses=statuses,
+        )
+        return result
+
+    # -----------------------------
+    # Output
+    # -----------------------------
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"{'scenario':<20} {'p50':>8} {'p95':>8} {'p99':>8} "
+            f"{'queries':>8} {'peak KiB':>9}"
+        )
+        for name, row in report["scenarios"].items():
+            self.stdout.write(
+                f"{name:<20} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} "
+                f"{row['p99_ms']:>8.2f} {row['queries_mean']:>8.1f} "
+                f"{row['peak_memory_kib']:>9.1f}"
+            )
+
+    def print_comparison(self, baseline, report):
+        self.stdout.write(
+            f"\nAgainst {baseline.get('commit') or 'baseline'} "
+            "(p95 ms, mean queries):"
+        )
+        for name, row in report["scenarios"].items():
+            old = baseline["scenarios"].get(name)
+            if old is None:
+                self.stdout.write(f"{name:<20} (new)")
+                continue
+            change = (row["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+            line = (
+                f"{name:<20} {old['p95_ms']:>8.2f} -> {row['p95_ms']:>8.2f} "
+                f"({change:+.0f}%)  queries {old['queries_mean']:.1f} -> "
+                f"{row['queries_mean']:.1f}"
+            )
+            worse = change > 10 or row["queries_mean"] > old["queries_mean"]
+            self.stdout.write(self.style.WARNING(line) if worse else line)
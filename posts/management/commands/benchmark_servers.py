@@ -0,0 +1,237 @@
+import json
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.management.commands.seed import WORDS
+from posts.models import Category, Post
+
+# How the Procfile serves each mode (SERVER=wsgi / SERVER=asgi)
+SERVERS = {
+    "wsgi": ["crow.wsgi:application"],
+    "asgi": [
+        "crow.asgi:application",
+        "--worker-class",
+        "uvicorn_worker.UvicornWorker",
+    ],
+}
+PERCENTILES = (50, 95, 99)
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve the app with gunicorn sync workers (WSGI) and then with "
+        "uvicorn workers (ASGI) on this machine, and compare throughput "
+        "and latency under concurrent reads"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--servers",
+            nargs="+",
+            choices=sorted(SERVERS),
+            default=["wsgi", "asgi"],
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=2,
+            help="Server processes, the same for each mode (default 2)",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=32,
+            help="Requests in flight at once (default 32)",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=2000,
+            help="Requests per server (default 2000)",
+        )
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument(
+            "--page-cache",
+            action="store_true",
+            help="Keep the anonymous page cache on (off by default: it "
+            "would measure cache hits, not the views)",
+        )
+        parser.add_argument(
+            "--output",
+            default="benchmark_servers.json",
+            help="Report path (default benchmark_servers.json)",
+        )
+        parser.add_argument("--random-seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options["requests"] < 2:
+            raise CommandError("--requests must be at least 2")
+        rng = random.Random(options["random_seed"])
+        paths = self.paths(rng, options["requests"])
+
+        results = {}
+        for server in options["servers"]:
+            self.stdout.write(f"Serving with {server}...")
+            with self.serve(server, options):
+                results[server] = self.load(
+                    options["port"], paths, options["concurrency"]
+                )
+
+        report = {
+            "created_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "cpus": os.cpu_count(),
+            "workers": options["workers"],
+            "concurrency": options["concurrency"],
+            "requests": options["requests"],
+            "page_cache": options["page_cache"],
+            "servers": results,
+        }
+        with open(options["output"], "w") as fh:
+            json.dump(report, fh, indent=2)
+
+        self.stdout.write(
+            f"{'server':<8} {'req/s':>9} {'p50':>8} {'p95':>8} "
+            f"{'p99':>8} {'errors':>7}"
+        )
+        for server, row in results.items():
+            self.stdout.write(
+                f"{server:<8} {row['requests_per_s']:>9.1f} "
+                f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} "
+                f"{row['p99_ms']:>8.1f} {row['errors']:>7}"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Report written to {options['output']}")
+        )
+
+    # -----------------------------
+    # Workload
+    # -----------------------------
+    def paths(self, rng, total):
+        """A shuffled mix of the read endpoints that went async."""
+        post_ids = list(
+            Post.objects.order_by("-id").values_list("id", flat=True)[:5000]
+        )
+        categories = list(
+            Category.objects.values_list("name", flat=True)[:100]
+        )
+        if not post_ids:
+            raise CommandError("No data: run `manage.py seed` first")
+
+        def prefix(words):
+            word = rng.choice(words)
+            return word[: rng.randint(2, max(2, len(word)))]
+
+        makers = [
+            lambda: reverse("post_detail", args=[rng.choice(post_ids)]),
+            lambda: reverse("ajax_search")
+            + "?"
+            + urlencode({"q": prefix(WORDS)}),
+            lambda: reverse("category_search")
+            + "?"
+            + urlencode({"q": prefix(categories or WORDS)}),
+            lambda: reverse("home"),
+        ]
+        return [rng.choice(makers)() for _ in range(total)]
+
+    def load(self, port, paths, concurrency):
+        base = f"http://127.0.0.1:{port}"
+
+        def fetch(path):
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(base + path, timeout=30) as res:
+                    res.read()
+                    ok = res.status == 200
+            except OSError:  # URLError / HTTPError included
+                ok = False
+            return (time.perf_counter() - start) * 1000, ok
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(fetch, paths))
+        elapsed = time.perf_counter() - start
+
+        timings = [ms for ms, _ in samples]
+        cuts = statistics.quantiles(timings, n=100, method="inclusive")
+        result = {f"p{p}_ms": round(cuts[p - 1], 2) for p in PERCENTILES}
+        result.update(
+            requests_per_s=round(len(paths) / elapsed, 1),
+            mean_ms=round(statistics.fmean(timings), 2),
+            errors=sum(not ok for _, ok in samples),
+        )
+        return result
+
+    # -----------------------------
+    # Servers
+    # -----------------------------
+    def serve(self, server, options):
+        command = self
+
+        class Server:
+            def __enter__(self):
+                env = {
+                    **os.environ,
+                    "SERVER": server,
+                    "ALLOWED_HOSTS": "127.0.0.1",
+                    "PAGE_CACHE_ENABLED": str(options["page_cache"]),
+                    "INSTRUMENTATION_SAMPLE_RATE": "0",
+                    # one client IP sends everything: don't throttle it
+                    "TYPEAHEAD_THROTTLE_BURST": str(10**9),
+                    "TYPEAHEAD_THROTTLE_RATE": str(10**9),
+                }
+                self.process = subprocess.Popen(
+                    [
+                        sys.executable,
+                        "-m",
+                        "gunicorn",
+                        *SERVERS[server],
+                        "--bind",
+                        f"127.0.0.1:{options['port']}",
+                        "--workers",
+                        str(options["workers"]),
+                        "--log-level",
+                        "warning",
+                    ],
+                    cwd=settings.BASE_DIR,
+                    env=env,
+                )
+                command.wait_until_up(options["port"], self.process)
+                return self
+
+            def __exit__(self, *exc):
+                self.process.send_signal(signal.SIGTERM)
+                self.process.wait(timeout=30)
+
+        return Server()
+
+    def wait_until_up(self, port, process, timeout=30):
+        deadline = time.monotonic() + timeout
+        url = f"http://127.0.0.1:{port}{reverse('home')}"
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError("The server exited on startup")
+            try:
+                urllib.request.urlopen(url, timeout=2).close()
+                return
+            except urllib.error.HTTPError:
+                return  # answering; errors are counted by load()
+            except OSError:
+                time.sleep(0.2)
+        process.terminate()
+        raise CommandError(f"The server didn't answer within {timeout}s")
@@ -1,13 +1,41 @@
+from django.conf import settings
 from django.core.management.base import BaseCommand
+
+from posts import maintenance
 from posts.models import PostMedia
 
 
 class Command(BaseCommand):
-    help = "Delete all PostMedia records (one-time cleanup for Cloudinary)"
+    help = (
+        "Delete all PostMedia records (one-time cleanup for Cloudinary). "
+        "The stored files are kept unless --delete-files"
+    )
 
-    def handle(self, *args, **kwargs):
-        count = PostMedia.objects.count()
-        PostMedia.objects.all().delete()
-        self.stdout.write(
-            self.style.SUCCESS(f"Deleted {count} PostMedia records")
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.MAINTENANCE_CHUNK_SIZE,
+            help="Rows deleted per transaction (default "
+            "MAINTENANCE_CHUNK_SIZE)",
+        )
+        parser.add_argument(
+            "--delete-files",
+            action="store_true",
+            help="Also delete each record's staged file and its file in "
+            "the media store (e.g. Cloudinary)",
         )
+
+    def handle(self, *args, **options):
+        # Chunked raw deletes (posts.maintenance): no row loading or
+        # per-row signals, and reruns continue where a stop left off.
+        progress = maintenance.Progress(self.stdout, "PostMedia records")
+        for pks in maintenance.pk_chunks(
+            PostMedia.objects.all(), options["chunk_size"]
+        ):
+            deleted = maintenance.delete_media(
+                pks, keep_files=not options["delete_files"]
+            )
+            progress.add(deleted, pks[-1])
+        maintenance.expire_caches()
+        self.stdout.write(self.style.SUCCESS(progress.summary("Deleted")))
@@ -0,0 +1,183 @@
+import re
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from posts import ranking
+from posts.feed import FEED_SORTS, feed_queryset
+from posts.models import Comment, Post, Vote
+
+# A full pass over a table (subqueries and constant rows don't count)
+SEQ_SCANS = {
+    "sqlite": re.compile(r"\bSCAN (?!\()(\w+)(?!.*\bUSING\b)"),
+    "postgresql": re.compile(r"\bSeq Scan on (\w+)"),
+}
+# Named intermediate results (SQLite CTEs), not tables
+SUBQUERY = re.compile(r"\b(?:CO-ROUTINE|MATERIALIZE) (\w+)")
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the feed / profile / comment / vote queries and fail if "
+        "any reads a whole table (run against a large seeded database)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-posts",
+            type=int,
+            default=10000,
+            help=(
+                "Warn below this many posts: planners rightly scan small "
+                "tables (default 10000)"
+            ),
+        )
+        parser.add_argument(
+            "--no-analyze",
+            action="store_true",
+            help=(
+                "Don't refresh planner statistics (ANALYZE) first; on a "
+                "small SQLite database this plans as for a large one"
+            ),
+        )
+        parser.add_argument(
+            "--verbose-plans",
+            action="store_true",
+            help="Print every plan, not only failing ones",
+        )
+
+    def handle(self, *args, **options):
+        pattern = SEQ_SCANS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(
+                f"Unsupported database vendor: {connection.vendor}"
+            )
+
+        post = Post.objects.order_by("-comment_count").first()
+        user = User.objects.order_by("pk").first()
+        if post is None or user is None:
+            raise CommandError("No data: seed the database first")
+
+        total = Post.objects.count()
+        if total < options["min_posts"]:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Only {total} posts: plans may differ from production"
+                )
+            )
+        if not options["no_analyze"]:
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+        failures = 0
+        for name, queryset in self.canonical_queries(post, user):
+            plan = self.explain(queryset)
+            scans = sorted(
+                set(pattern.findall(plan)) - set(SUBQUERY.findall(plan))
+            )
+            if scans:
+                failures += 1
+                self.stdout.write(
+                    self.style.ERROR(f"FAIL {name}: scans {', '.join(scans)}")
+                )
+            else:
+                self.stdout.write(f"ok   {name}")
+            if scans or options["verbose_plans"]:
+                self.stdout.write(plan + "\n")
+
+        if failures:
+            raise CommandError(f"{failures} queries scan a whole table")
+        self.stdout.write(self.style.SUCCESS("No sequential scans"))
+
+    def explain(self, queryset) -> str:
+        # QuerySet.explain() misplaces the prefix on SQLite when the
+        # query is wrapped for a window filter; prefix the SQL directly.
+        sql, params = queryset.query.sql_with_params()
+        prefix = connection.ops.explain_query_prefix()
+        with connection.cursor() as cursor:
+            cursor.execute(f"{prefix} {sql}", params)
+            return "\n".join(
+                " ".join(str(col) for col in row) for row in cursor.fetchall()
+            )
+
+    def canonical_queries(self, post, user):
+        """(name, queryset) pairs built like the views build them."""
+        limit = settings.FEED_PAGE_SIZE + 1
+
+        for sort, field in FEED_SORTS.items():
+            posts = feed_queryset(user)
+            if sort == "top":
+                since = timezone.now() - ranking.TOP_WINDOWS["week"]
+                posts = posts.filter(created_at__gte=since)
+            yield (
+                f"home feed ({sort})",
+                posts.order_by(f"-{field}", "-id")[:limit],
+            )
+
+        yield (
+            "home feed (new, next page)",
+            feed_queryset()
+            .filter(
+                Q(created_at__lt=post.created_at)
+                | Q(created_at=post.created_at, id__lt=post.pk)
+            )
+            .order_by("-created_at", "-id")[:limit],
+        )
+        yield (
+            "profile feed",
+            feed_queryset(user, Post.objects.filter(author_id=post.author_id))
+            .order_by("-created_at", "-id")[: settings.PROFILE_PAGE_SIZE + 1],
+        )
+        yield (
+            "category feed",
+            feed_queryset(
+                user, Post.objects.filter(category_id=post.category_id)
+            ).order_by("-created_at", "-id")[:limit],
+        )
+
+        # comments.comment_page(): page heads, then the rows below them
+        comments = Comment.objects.filter(post=post)
+        yield (
+            "comment page heads",
+            comments.filter(depth=0)
+            .order_by("path")
+            .values_list("path", flat=True)[: settings.COMMENT_PAGE_SIZE + 1],
+        )
+        yield (
+            "comment page rows",
+            comments.filter(
+                depth__lte=settings.COMMENT_TREE_MAX_DEPTH, path__gte="0"
+            )
+            .select_related("author")
+            .annotate(
+                sibling_count=Window(
+                    Count("id"), partition_by=[F("parent_id")]
+                ),
+                sibling_rank=Window(
+                    RowNumber(),
+                    partition_by=[F("parent_id")],
+                    order_by=F("path").asc(),
+                ),
+            )
+            .filter(sibling_rank__lte=settings.COMMENT_TREE_MAX_REPLIES)
+            .order_by("path"),
+        )
+
+        yield (
+            "vote tallies",
+            Vote.objects.filter(post_id__in=[post.pk])
+            .values("post_id")
+            .annotate(
+                up=Count("id", filter=Q(value=Vote.UPVOTE)),
+                down=Count("id", filter=Q(value=Vote.DOWNVOTE)),
+            ),
+        )
+        yield (
+            "rank dirty set",
+            Post.objects.filter(rank_dirty=True).order_by("id")[:500],
+        )
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from posts import pagecache
+
+
+class Command(BaseCommand):
+    help = "Report the anonymous page cache hit ratio (works in dry-run)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Zero the counters after reporting",
+        )
+
+    def handle(self, *args, **options):
+        if isinstance(pagecache.get_cache(), LocMemCache):
+            self.stdout.write(
+                self.style.WARNING(
+                    f"CACHES['{settings.PAGE_CACHE}'] is process-local "
+                    "(LocMemCache): counters from the web workers are not "
+                    "visible here. Use a shared cache backend, or read the "
+                    "X-Page-Cache response header."
+                )
+            )
+
+        stats = pagecache.stats(reset=options["reset"])
+        mode = "dry-run" if settings.PAGE_CACHE_DRY_RUN else "live"
+
+        self.stdout.write(
+            f"Page cache ({mode}): {stats['hits']} hits, "
+            f"{stats['misses']} misses, "
+            f"hit ratio {stats['hit_ratio']:.1%}"
+        )
+        if stats["stale"]:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{stats['stale']} hits served content that differed "
+                    "from a fresh render"
+                )
+            )
@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts import uploads
+from posts.models import PostMedia
+
+
+class Command(BaseCommand):
+    help = (
+        "Upload staged media left PENDING or PROCESSING by a restarted "
+        "worker (and, with --retry-failed, media whose upload failed)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=10,
+            help=(
+                "Minutes since the upload or claim; younger rows may still "
+                "be in a worker's queue or hands (default 10)"
+            ),
+        )
+        parser.add_argument(
+            "--retry-failed",
+            action="store_true",
+            help="Requeue FAILED media whose staged file still exists",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options["older_than"])
+        if options["retry_failed"]:
+            requeued = (
+                PostMedia.objects.filter(
+                    status=PostMedia.FAILED, uploaded_at__lt=cutoff
+                )
+                .exclude(staged_path="")
+                .update(status=PostMedia.PENDING)
+            )
+            self.stdout.write(f"Requeued {requeued} failed uploads")
+
+        # Claimed by a worker that died before saving the outcome
+        stale = PostMedia.objects.filter(
+            status=PostMedia.PROCESSING, claimed_at__lt=cutoff
+        ).update(status=PostMedia.PENDING)
+        if stale:
+            self.stdout.write(f"Requeued {stale} interrupted uploads")
+
+        ids = list(
+            PostMedia.objects.filter(
+                status=PostMedia.PENDING, uploaded_at__lt=cutoff
+            )
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        results = {}
+        for media_id in ids:
+            status = uploads.process(media_id)
+            if status:
+                results[status] = results.get(status, 0) + 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Uploaded {results.get(PostMedia.READY, 0)}, failed "
+                f"{results.get(PostMedia.FAILED, 0)}"
+            )
+        )
@@ -0,0 +1,89 @@
+import os
+import time
+from datetime import timedelta
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from posts import maintenance
+from posts.models import PostMedia
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete media that can't be shown: FAILED uploads, READY rows "
+        "without a file, and staged files no PostMedia row points to. "
+        "Safe to rerun: deleted rows no longer match"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=7,
+            metavar="DAYS",
+            help="Only media uploaded / staged DAYS days ago (default 7)",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.MAINTENANCE_CHUNK_SIZE,
+            help="Rows / files per chunk (default MAINTENANCE_CHUNK_SIZE)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count orphans without deleting them",
+        )
+
+    def handle(self, *args, **options):
+        days = options["older_than"]
+        chunk_size = options["chunk_size"]
+        dry_run = options["dry_run"]
+
+        orphans = PostMedia.objects.filter(
+            Q(status=PostMedia.FAILED)
+            | Q(status=PostMedia.READY, file__isnull=True),
+            uploaded_at__lt=timezone.now() - timedelta(days=days),
+        )
+        progress = maintenance.Progress(self.stdout, "media rows")
+        for pks in maintenance.pk_chunks(orphans, chunk_size):
+            count = len(pks) if dry_run else maintenance.delete_media(pks)
+            progress.add(count, pks[-1])
+        if progress.done and not dry_run:
+            maintenance.expire_caches()
+        verb = "Found" if dry_run else "Deleted"
+        self.stdout.write(self.style.SUCCESS(progress.summary(verb)))
+
+        files = maintenance.Progress(self.stdout, "staged files")
+        cutoff = time.time() - days * 86400
+        for paths in self.stale_files(cutoff, chunk_size):
+            referenced = set(
+                PostMedia.objects.filter(staged_path__in=paths).values_list(
+                    "staged_path", flat=True
+                )
+            )
+            unreferenced = [p for p in paths if p not in referenced]
+            if not dry_run:
+                for path in unreferenced:
+                    os.remove(path)
+            files.add(len(unreferenced))
+        self.stdout.write(self.style.SUCCESS(files.summary(verb)))
+
+    def stale_files(self, cutoff, chunk_size):
+        """Lists of staged file paths last modified before `cutoff`."""
+        staging = Path(settings.MEDIA_STAGING_DIR)
+        if not staging.is_dir():
+            return
+        with os.scandir(staging) as entries:
+            stale = (
+                entry.path
+                for entry in entries
+                if entry.is_file() and entry.stat().st_mtime < cutoff
+            )
+            while chunk := list(islice(stale, chunk_size)):
+                yield chunk
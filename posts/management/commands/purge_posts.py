@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import maintenance
+from posts.models import Category, Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete posts by author, category and / or age, in primary-key "
+        "chunks with raw bulk deletes (posts.maintenance); resumable"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--author", help="Username whose posts to purge")
+        parser.add_argument("--category", help="Category name to purge")
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            metavar="DAYS",
+            help="Only posts created more than DAYS days ago",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.MAINTENANCE_CHUNK_SIZE,
+            help="Posts deleted per transaction (default "
+            "MAINTENANCE_CHUNK_SIZE)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count matching posts without deleting them",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Continue an interrupted run with the same filters",
+        )
+
+    def handle(self, *args, **options):
+        author, category = options["author"], options["category"]
+        days = options["older_than"]
+        if author is None and category is None and days is None:
+            raise CommandError(
+                "Give at least one of --author, --category, --older-than"
+            )
+
+        checkpoint = maintenance.Checkpoint(
+            "purge_posts",
+            {"author": author, "category": category, "older_than": days},
+        )
+        last_pk = checkpoint.start(options["resume"])
+
+        posts = Post.objects.all()
+        if author is not None:
+            user = User.objects.filter(username=author).first()
+            if user is None:
+                raise CommandError(f"No user named {author!r}")
+            posts = posts.filter(author=user)
+        if category is not None:
+            category_id = (
+                Category.objects.filter(name=category)
+                .values_list("pk", flat=True)
+                .first()
+            )
+            if category_id is None:
+                raise CommandError(f"No category named {category!r}")
+            posts = posts.filter(category_id=category_id)
+        if days is not None:
+            # Resumed runs keep the first run's cutoff
+            cutoff = checkpoint.state.get("cutoff")
+            cutoff = (
+                parse_datetime(cutoff)
+                if cutoff
+                else timezone.now() - timedelta(days=days)
+            )
+            checkpoint.state["cutoff"] = cutoff.isoformat()
+            posts = posts.filter(created_at__lt=cutoff)
+
+        if last_pk:
+            self.stdout.write(f"Resuming after post {last_pk}")
+        dry_run = options["dry_run"]
+        progress = maintenance.Progress(self.stdout, "posts")
+
+        for pks in maintenance.pk_chunks(
+            posts, options["chunk_size"], after=last_pk
+        ):
+            if dry_run:
+                count = len(pks)
+            else:
+                count = maintenance.delete_posts(pks)
+                checkpoint.save(pks[-1])
+            progress.add(count, pks[-1])
+
+        if not dry_run:
+            checkpoint.finish()
+            maintenance.expire_caches()
+        self.stdout.write(
+            self.style.SUCCESS(
+                progress.summary("Matched" if dry_run else "Deleted")
+            )
+        )
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the post full-text search index from the Post table"
+
+    def handle(self, *args, **kwargs):
+        backend = get_search_backend()
+        count = backend.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {count} posts with {type(backend).__name__}"
+            )
+        )
@@ -0,0 +1,100 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from posts.models import Follow, Post, TimelineEntry
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild home timelines (posts.timeline) from the follows: each "
+        "user's newest TIMELINE_MAX_LENGTH own / followed posts, minus "
+        "sources read at read time"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "usernames",
+            nargs="*",
+            help="Only rebuild these users' timelines (default: all)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of users rebuilt per transaction (default 500)",
+        )
+        parser.add_argument(
+            "--length",
+            type=int,
+            default=settings.TIMELINE_MAX_LENGTH,
+            help="Entries kept per timeline (default TIMELINE_MAX_LENGTH)",
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by("pk")
+        if options["usernames"]:
+            users = users.filter(username__in=options["usernames"])
+
+        last_pk = 0
+        rebuilt = written = 0
+
+        while True:
+            user_ids = list(
+                users.filter(pk__gt=last_pk).values_list("pk", flat=True)[
+                    : options["batch_size"]
+                ]
+            )
+            if not user_ids:
+                break
+            last_pk = user_ids[-1]
+
+            with transaction.atomic():
+                TimelineEntry.objects.filter(user__in=user_ids).delete()
+                entries = self.entries(user_ids, options["length"])
+                TimelineEntry.objects.bulk_create(entries, batch_size=1000)
+
+            rebuilt += len(user_ids)
+            written += len(entries)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {rebuilt} timelines ({written} entries)"
+            )
+        )
+
+    def entries(self, user_ids, length):
+        limit = settings.TIMELINE_FANOUT_LIMIT
+        authors, categories = defaultdict(list), defaultdict(list)
+        for follower_id, user_id, category_id in Follow.objects.filter(
+            Q(user__stats__follower_count__lte=limit)
+            # No UserStats row: fanned out as 0 followers (posts.timeline)
+            | Q(user__isnull=False, user__stats__isnull=True)
+            | Q(category__follower_count__lte=limit),
+            follower__in=user_ids,
+        ).values_list("follower", "user", "category"):
+            if user_id:
+                authors[follower_id].append(user_id)
+            else:
+                categories[follower_id].append(category_id)
+
+        entries = []
+        for user_id in user_ids:
+            posts = Post.objects.filter(
+                Q(author_id=user_id)
+                | Q(author__in=authors[user_id])
+                | Q(category__in=categories[user_id])
+            ).order_by("-created_at", "-id")
+            entries.extend(
+                TimelineEntry(
+                    user_id=user_id, post_id=pk, created_at=created_at
+                )
+                for pk, created_at in posts.values_list(
+                    "pk", "created_at"
+                )[:length]
+            )
+        return entries
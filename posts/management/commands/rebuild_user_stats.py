@@ -0,0 +1,112 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from posts.models import Comment, Follow, Post, UserStats
+
+FIELDS = ["post_count", "comment_count", "karma", "follower_count"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild UserStats (post / comment / follower counts, karma) "
+        "from the Post, Comment and Follow tables (use --check to only "
+        "report drift)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of users reconciled per batch (default 1000)",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Report users with drifted stats without fixing them",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        check_only = options["check"]
+
+        last_pk = 0
+        scanned = drifted = 0
+
+        while True:
+            user_ids = list(
+                User.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not user_ids:
+                break
+            last_pk = user_ids[-1]
+
+            posts = {
+                row["author"]: row
+                for row in Post.objects.filter(author__in=user_ids)
+                .values("author")
+                .annotate(total=Count("id"), karma=Sum("score"))
+            }
+            comments = dict(
+                Comment.objects.filter(author__in=user_ids)
+                .values("author")
+                .annotate(total=Count("id"))
+                .values_list("author", "total")
+            )
+            followers = dict(
+                Follow.objects.filter(user__in=user_ids)
+                .values("user")
+                .annotate(total=Count("id"))
+                .values_list("user", "total")
+            )
+            stored = UserStats.objects.in_bulk(user_ids)
+
+            missing, changed = [], []
+            for user_id in user_ids:
+                row = posts.get(user_id, {"total": 0, "karma": 0})
+                actual = (
+                    row["total"],
+                    comments.get(user_id, 0),
+                    row["karma"],
+                    followers.get(user_id, 0),
+                )
+                stats = stored.get(user_id)
+                if stats is None:
+                    stats = UserStats(user_id=user_id)
+                    missing.append(stats)
+                elif tuple(getattr(stats, f) for f in FIELDS) == actual:
+                    continue
+                else:
+                    changed.append(stats)
+
+                if check_only:
+                    self.stdout.write(
+                        f"User {user_id}: stored "
+                        f"{tuple(getattr(stats, f) for f in FIELDS)}, "
+                        f"actual {actual} (posts, comments, karma, followers)"
+                    )
+                for field, value in zip(FIELDS, actual):
+                    setattr(stats, field, value)
+
+            scanned += len(user_ids)
+            drifted += len(missing) + len(changed)
+
+            if (missing or changed) and not check_only:
+                with transaction.atomic():
+                    UserStats.objects.bulk_create(missing)
+                    UserStats.objects.bulk_update(changed, FIELDS)
+
+        if check_only:
+            self.stdout.write(
+                f"Checked {scanned} users, {drifted} out of sync"
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Checked {scanned} users, fixed {drifted}"
+                )
+            )
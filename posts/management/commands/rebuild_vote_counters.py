@@ -0,0 +1,95 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+
+from posts.models import Post, Vote
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild Post.score / upvotes / downvotes from the Vote table "
+        "(use --check to only report drift)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of posts reconciled per batch (default 1000)",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Report posts with drifted counters without fixing them",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        check_only = options["check"]
+
+        last_pk = 0
+        scanned = drifted = 0
+
+        while True:
+            posts = list(
+                Post.objects.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .only("id", "score", "upvotes", "downvotes")[:batch_size]
+            )
+            if not posts:
+                break
+            last_pk = posts[-1].pk
+
+            counts = {
+                row["post_id"]: row
+                for row in Vote.objects.filter(
+                    post_id__in=[p.pk for p in posts]
+                )
+                .values("post_id")
+                .annotate(
+                    up=Count("id", filter=Q(value=Vote.UPVOTE)),
+                    down=Count("id", filter=Q(value=Vote.DOWNVOTE)),
+                )
+            }
+
+            changed = []
+            for post in posts:
+                row = counts.get(post.pk, {"up": 0, "down": 0})
+                up, down = row["up"], row["down"]
+                if (post.upvotes, post.downvotes, post.score) == (
+                    up, down, up - down
+                ):
+                    continue
+
+                if check_only:
+                    self.stdout.write(
+                        f"Post {post.pk}: stored score {post.score} "
+                        f"(+{post.upvotes}/-{post.downvotes}), "
+                        f"actual {up - down} (+{up}/-{down})"
+                    )
+                post.upvotes, post.downvotes = up, down
+                post.score = up - down
+                post.rank_dirty = True
+                changed.append(post)
+
+            scanned += len(posts)
+            drifted += len(changed)
+
+            if changed and not check_only:
+                with transaction.atomic():
+                    Post.objects.bulk_update(
+                        changed,
+                        ["score", "upvotes", "downvotes", "rank_dirty"],
+                    )
+
+        if check_only:
+            self.stdout.write(
+                f"Checked {scanned} posts, {drifted} out of sync"
+            )
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Checked {scanned} posts, fixed {drifted}"
+                )
+            )
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import ranking
+from posts.models import Post
+from posts.pagecache import invalidate_tags
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute hot / controversial ranks of posts whose votes "
+        "changed since the last run (run periodically, e.g. every minute)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of posts recomputed per transaction (default 500)",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Mark every post dirty first (after changing the formulas)",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if options["all"]:
+            Post.objects.update(rank_dirty=True)
+
+        recomputed = 0
+        while True:
+            # Locking the batch makes votes on these posts wait, so no
+            # vote can land between reading the counters and clearing
+            # the dirty flag.
+            with transaction.atomic():
+                posts = list(
+                    Post.objects.select_for_update()
+                    .filter(rank_dirty=True)
+                    .order_by("id")
+                    .only("created_at", "score", "upvotes", "downvotes")[
+                        :batch_size
+                    ]
+                )
+                if not posts:
+                    break
+
+                for post in posts:
+                    post.hot_rank = ranking.hot(post.score, post.created_at)
+                    post.controversy = ranking.controversy(
+                        post.upvotes, post.downvotes
+                    )
+                    post.rank_dirty = False
+                Post.objects.bulk_update(
+                    posts, ["hot_rank", "controversy", "rank_dirty"]
+                )
+            recomputed += len(posts)
+
+        if recomputed:
+            # Ranked feed pages may now order differently.
+            invalidate_tags("feed:ranked")
+        self.stdout.write(
+            self.style.SUCCESS(f"Recomputed ranks of {recomputed} posts")
+        )
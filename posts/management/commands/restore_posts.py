@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import archive, maintenance
+from posts.models import ArchivedPost
+
+
+class Command(BaseCommand):
+    help = "Move archived posts (posts.archive) back to the hot tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "post_ids", nargs="*", type=int, help="Ids of posts to restore"
+        )
+        parser.add_argument(
+            "--author", help="Restore every archived post of this username"
+        )
+        parser.add_argument(
+            "--all", action="store_true", help="Restore the whole archive"
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=settings.MAINTENANCE_CHUNK_SIZE,
+            help="Posts restored per transaction (default "
+            "MAINTENANCE_CHUNK_SIZE)",
+        )
+
+    def handle(self, *args, **options):
+        archived = ArchivedPost.objects.all()
+        if options["post_ids"]:
+            archived = archived.filter(pk__in=options["post_ids"])
+        elif options["author"]:
+            archived = archived.filter(author__username=options["author"])
+        elif not options["all"]:
+            raise CommandError("Give post ids, --author or --all")
+
+        # Restored rows leave the archive: reruns continue by themselves
+        progress = maintenance.Progress(self.stdout, "posts")
+        for pks in maintenance.pk_chunks(archived, options["chunk_size"]):
+            progress.add(archive.restore(pks), pks[-1])
+        maintenance.expire_caches()
+        self.stdout.write(self.style.SUCCESS(progress.summary("Restored")))
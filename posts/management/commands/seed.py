@@ -0,0 +1,358 @@
+import random
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import (
+    Count,
+    F,
+    IntegerField,
+    OuterRef,
+    Subquery,
+    Value,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from posts.models import Category, Comment, Post, Vote
+
+WORDS = (
+    "crow night river signal garden engine quiet market winter summer "
+    "city music camera ocean forest data code pixel story travel coffee "
+    "mountain street light shadow market future history science game "
+    "movie book paint photo bridge cloud storm island rocket planet "
+    "robot kitchen recipe design update launch review guide tips idea"
+).split()
+
+CATEGORIES = (
+    "News", "Tech", "Sports", "Music", "Gaming", "Science", "Movies",
+    "Books", "Travel", "Food", "Art", "Photography", "Health", "Finance",
+    "Memes", "History", "Nature", "Fashion", "DIY", "Space",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-generate users, categories, posts, threaded comments and "
+        "votes for benchmarking (e.g. --votes 1000000)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=2000)
+        parser.add_argument("--categories", type=int, default=20)
+        parser.add_argument("--posts", type=int, default=20000)
+        parser.add_argument("--comments", type=int, default=100000)
+        parser.add_argument("--votes", type=int, default=200000)
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=90,
+            help="Spread post dates over this many days (default 90)",
+        )
+        parser.add_argument(
+            "--reply-ratio",
+            type=float,
+            default=0.6,
+            help="Share of comments that reply to another (default 0.6)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="Rows per bulk_create (default 5000)",
+        )
+        parser.add_argument(
+            "--prefix",
+            default="seed",
+            help="Username prefix of generated users (default 'seed')",
+        )
+        parser.add_argument(
+            "--random-seed",
+            type=int,
+            default=None,
+            help="Seed the generator for a reproducible dataset",
+        )
+
+    def handle(self, *args, **options):
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError(
+                "The database can't return ids from bulk inserts"
+            )
+        if User.objects.filter(
+            username__startswith=options["prefix"]
+        ).exists():
+            raise CommandError(
+                f"Users named {options['prefix']}* exist: pick another "
+                "--prefix"
+            )
+
+        self.rng = random.Random(options["random_seed"])
+        self.batch_size = options["batch_size"]
+        self.now = timezone.now()
+
+        users = self.seed_users(options["users"], options["prefix"])
+        categories = self.seed_categories(options["categories"])
+        self.seed_posts(options["posts"], users, categories, options["days"])
+        self.seed_comments(
+            options["comments"], users, options["reply_ratio"]
+        )
+        self.seed_votes(options["votes"], users)
+        self.finish()
+
+    # -----------------------------
+    # Helpers
+    # -----------------------------
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield min(self.batch_size, total - start)
+
+    def text(self, low, high):
+        return " ".join(
+            self.rng.choices(WORDS, k=self.rng.randint(low, high))
+        )
+
+    def log(self, label, count):
+        self.stdout.write(f"{label}: {count}")
+
+    def update_rows(self, model, rows, fields):
+        """
+        UPDATE `fields` of saved `rows` with one executemany().
+        bulk_update() builds a CASE per row in Python, which dominates
+        seeding time at this scale.
+        """
+        qn = connection.ops.quote_name
+        columns = [model._meta.get_field(name) for name in fields]
+        sql = "UPDATE {} SET {} WHERE {} = %s".format(
+            qn(model._meta.db_table),
+            ", ".join(f"{qn(field.column)} = %s" for field in columns),
+            qn(model._meta.pk.column),
+        )
+        params = [
+            [
+                field.get_db_prep_save(getattr(row, field.attname), connection)
+                for field in columns
+            ]
+            + [row.pk]
+            for row in rows
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+
+    # -----------------------------
+    # Rows
+    # -----------------------------
+    def seed_users(self, total, prefix):
+        password = make_password(None)  # unusable: no logins, no hashing
+        ids = []
+        for size in self.batches(total):
+            start = len(ids)
+            created = User.objects.bulk_create(
+                User(username=f"{prefix}{start + i}", password=password)
+                for i in range(size)
+            )
+            ids.extend(user.pk for user in created)
+        self.log("Users", len(ids))
+        return ids
+
+    def seed_categories(self, total):
+        names = [
+            CATEGORIES[i % len(CATEGORIES)]
+            + (f" {i // len(CATEGORIES)}" if i >= len(CATEGORIES) else "")
+            for i in range(total)
+        ]
+        Category.objects.bulk_create(
+            [Category(name=name) for name in names], ignore_conflicts=True
+        )
+        ids = list(
+            Category.objects.filter(name__in=names).values_list(
+                "pk", flat=True
+            )
+        )
+        self.log("Categories", len(ids))
+        return ids
+
+    def seed_posts(self, total, users, categories, days):
+        self.posts = []  # (id, created_at)
+        for size in self.batches(total):
+            batch = [
+                Post(
+                    author_id=self.rng.choice(users),
+                    category_id=(
+                        self.rng.choice(categories)
+                        if categories and self.rng.random() < 0.8
+                        else None
+                    ),
+                    title=self.text(3, 8).capitalize(),
+                    content=self.text(10, 80),
+                )
+                for _ in range(size)
+            ]
+            with transaction.atomic():
+                Post.objects.bulk_create(batch)
+                # created_at is auto_now_add: backdate in a second pass
+                for post in batch:
+                    post.created_at = self.now - timedelta(
+                        seconds=self.rng.random() * days * 86400
+                    )
+                self.update_rows(Post, batch, ["created_at"])
+            self.posts.extend((post.pk, post.created_at) for post in batch)
+
+        # A few posts get most of the activity (long-tailed weights)
+        self.post_weights = list(
+            accumulate(self.rng.paretovariate(1.2) for _ in self.posts)
+        )
+        self.log("Posts", len(self.posts))
+
+    def pick_posts(self, count):
+        return self.rng.choices(
+            self.posts, cum_weights=self.post_weights, k=count
+        )
+
+    def seed_comments(self, total, users, reply_ratio):
+        if not self.posts:
+            return
+        threads = {}  # post id -> [(id, path, depth, created_at)]
+        created_total = 0
+
+        for size in self.batches(total):
+            batch, parents = [], []
+            for post_id, post_created in self.pick_posts(size):
+                thread = threads.get(post_id)
+                parent = None
+                if thread and self.rng.random() < reply_ratio:
+                    parent = self.rng.choice(thread)
+                    if parent[2] >= Comment.MAX_DEPTH:
+                        parent = None
+
+                since = parent[3] if parent else post_created
+                comment = Comment(
+                    post_id=post_id,
+                    author_id=self.rng.choice(users),
+                    parent_id=parent[0] if parent else None,
+                    content=self.text(3, 40),
+                    depth=parent[2] + 1 if parent else 0,
+                )
+                comment.created_at = since + (self.now - since) * (
+                    self.rng.random() ** 3  # most replies come soon
+                )
+                batch.append(comment)
+                parents.append(parent)
+
+            # Comment.save() isn't called: fill path (needs the new ids)
+            # and the auto_now_add date in a second pass.
+            with transaction.atomic():
+                dates = [comment.created_at for comment in batch]
+                Comment.objects.bulk_create(batch)
+                for comment, parent, created in zip(batch, parents, dates):
+                    prefix = parent[1] if parent else ""
+                    comment.path = prefix + str(comment.pk).zfill(
+                        Comment.PATH_STEP
+                    )
+                    comment.created_at = created
+                self.update_rows(Comment, batch, ["path", "created_at"])
+
+            for comment in batch:
+                threads.setdefault(comment.post_id, []).append(
+                    (
+                        comment.pk,
+                        comment.path,
+                        comment.depth,
+                        comment.created_at,
+                    )
+                )
+            created_total += len(batch)
+
+        self.log("Comments", created_total)
+
+    def seed_votes(self, total, users):
+        if not self.posts or not users:
+            return
+        if total > len(users) * len(self.posts):
+            total = len(users) * len(self.posts)
+            self.stdout.write(
+                self.style.WARNING(f"Capped at one vote per pair: {total}")
+            )
+        # Voters of a post: consecutive users from a random offset, so
+        # (user, post) stays unique without remembering every pair.
+        offsets, counts, leanings = {}, {}, {}
+        created_total = 0
+
+        for size in self.batches(total):
+            batch = []
+            while len(batch) < size:
+                for post_id, _ in self.pick_posts(size - len(batch)):
+                    if post_id not in offsets:
+                        offsets[post_id] = self.rng.randrange(len(users))
+                        counts[post_id] = 0
+                        # Share of upvotes; some posts split evenly
+                        leanings[post_id] = self.rng.uniform(0.4, 0.95)
+                    if counts[post_id] >= len(users):
+                        continue  # every user voted: pick again
+
+                    position = offsets[post_id] + counts[post_id]
+                    counts[post_id] += 1
+                    value = (
+                        Vote.UPVOTE
+                        if self.rng.random() < leanings[post_id]
+                        else Vote.DOWNVOTE
+                    )
+                    batch.append(
+                        Vote(
+                            user_id=users[position % len(users)],
+                            post_id=post_id,
+                            value=value,
+                        )
+                    )
+
+            with transaction.atomic():
+                Vote.objects.bulk_create(batch)
+            created_total += len(batch)
+
+        self.log("Votes", created_total)
+
+    # -----------------------------
+    # Derived Data
+    # -----------------------------
+    def finish(self):
+        """bulk_create skips save() and signals: rebuild what they keep."""
+
+        def count(model, **filters):
+            rows = (
+                model.objects.filter(post=OuterRef("pk"), **filters)
+                .order_by()
+                .values("post")
+                .annotate(total=Count("id"))
+                .values("total")
+            )
+            return Coalesce(
+                Subquery(rows, output_field=IntegerField()), Value(0)
+            )
+
+        Post.objects.update(
+            comment_count=count(Comment),
+            upvotes=count(Vote, value=Vote.UPVOTE),
+            downvotes=count(Vote, value=Vote.DOWNVOTE),
+        )
+        Post.objects.update(score=F("upvotes") - F("downvotes"))
+        posts = (
+            Post.objects.filter(category=OuterRef("pk"))
+            .order_by()
+            .values("category")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        Category.objects.update(
+            post_count=Coalesce(
+                Subquery(posts, output_field=IntegerField()), Value(0)
+            )
+        )
+
+        call_command("recompute_ranks", stdout=self.stdout)
+        call_command("rebuild_user_stats", stdout=self.stdout)
+        call_command("rebuild_timelines", stdout=self.stdout)
+        call_command("rebuild_search_index", stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS("Seeding done"))
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:59
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_vote_counters(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Vote = apps.get_model('posts', 'Vote')
+
+    def count_of(value):
+        votes = (
+            Vote.objects.filter(post=OuterRef('pk'), value=value)
+            .values('post')
+            .annotate(n=Count('id'))
+            .values('n')
+        )
+        return Coalesce(Subquery(votes), Value(0))
+
+    Post.objects.update(upvotes=count_of(1), downvotes=count_of(-1))
+    Post.objects.update(score=models.F('upvotes') - models.F('downvotes'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_alter_postmedia_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='downvotes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='score',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='upvotes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(
+            backfill_vote_counters, migrations.RunPython.noop
+        ),
+    ]
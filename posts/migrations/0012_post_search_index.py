@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:02
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """Vendor-specific search structures, backfilled from current posts."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX post_search_gin ON posts_post '
+            'USING gin (search_vector)'
+        )
+        schema_editor.execute(
+            "UPDATE posts_post AS p SET search_vector = "
+            "setweight(to_tsvector('english', p.title), 'A') || "
+            "setweight(to_tsvector('english', u.username), 'B') || "
+            "setweight(to_tsvector('english', p.content), 'C') "
+            "FROM auth_user AS u WHERE u.id = p.author_id"
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE posts_post_fts USING fts5('
+            'title, author, content, tokenize="unicode61")'
+        )
+        schema_editor.execute(
+            'INSERT INTO posts_post_fts (rowid, title, author, content) '
+            'SELECT p.id, p.title, u.username, p.content '
+            'FROM posts_post p JOIN auth_user u ON u.id = p.author_id'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS post_search_gin')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_feed_idx'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
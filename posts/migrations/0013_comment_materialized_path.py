@@ -0,0 +1,63 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+PATH_STEP = 10
+
+
+def backfill_paths(apps, schema_editor):
+    Comment = apps.get_model('posts', 'Comment')
+
+    parents = dict(Comment.objects.values_list('id', 'parent_id'))
+    paths, depths = {}, {}
+
+    def resolve(pk):
+        # Walk up to the first resolved ancestor, then fill back down.
+        chain = []
+        while pk is not None and pk not in paths:
+            chain.append(pk)
+            pk = parents.get(pk)
+        prefix = paths.get(pk, '')
+        depth = depths.get(pk, -1)
+        for node in reversed(chain):
+            depth += 1
+            prefix += str(node).zfill(PATH_STEP)
+            paths[node], depths[node] = prefix, depth
+
+    for pk in parents:
+        resolve(pk)
+
+    batch = []
+    for pk, path in paths.items():
+        batch.append(Comment(id=pk, path=path, depth=depths[pk]))
+        if len(batch) == 1000:
+            Comment.objects.bulk_update(batch, ['path', 'depth'])
+            batch = []
+    Comment.objects.bulk_update(batch, ['path', 'depth'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_thread_idx'),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
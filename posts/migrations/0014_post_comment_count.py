@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:07
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_comment_count(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+
+    counts = (
+        Comment.objects.filter(post=OuterRef('pk'))
+        .values('post')
+        .annotate(n=Count('id'))
+        .values('n')
+    )
+    Post.objects.update(comment_count=Coalesce(Subquery(counts), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_comment_materialized_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(
+            backfill_comment_count, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+from posts import ranking
+
+
+def backfill_ranks(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+
+    batch = []
+    for post in Post.objects.only(
+        'created_at', 'score', 'upvotes', 'downvotes'
+    ).iterator():
+        post.hot_rank = ranking.hot(post.score, post.created_at)
+        post.controversy = ranking.controversy(post.upvotes, post.downvotes)
+        post.rank_dirty = False
+        batch.append(post)
+        if len(batch) == 1000:
+            Post.objects.bulk_update(
+                batch, ['hot_rank', 'controversy', 'rank_dirty']
+            )
+            batch = []
+    Post.objects.bulk_update(batch, ['hot_rank', 'controversy', 'rank_dirty'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='controversy',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='hot_rank',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='rank_dirty',
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        migrations.RunPython(backfill_ranks, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-hot_rank', '-id'], name='post_hot_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-score', '-id'], name='post_top_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-controversy', '-id'], name='post_controversial_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('rank_dirty', True)), fields=['id'], name='post_rank_dirty_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postmedia',
+            name='original_name',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='postmedia',
+            name='staged_path',
+            field=models.CharField(blank=True, default='', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='postmedia',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', max_length=10),
+        ),
+    ]
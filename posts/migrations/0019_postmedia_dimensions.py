@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_postmedia_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postmedia',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='postmedia',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_postmedia_dimensions'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='postmedia',
+            options={'ordering': ['position', 'id']},
+        ),
+        migrations.AddField(
+            model_name='postmedia',
+            name='duration',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='postmedia',
+            name='file_size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='postmedia',
+            name='mime_type',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='postmedia',
+            name='position',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='postmedia',
+            name='resource_type',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='postmedia',
+            index=models.Index(fields=['post', 'position', 'id'], name='postmedia_post_order_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_stats(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    UserStats = apps.get_model('posts', 'UserStats')
+
+    posts = {
+        row['author']: row
+        for row in Post.objects.values('author').annotate(
+            total=Count('id'), karma=Sum('score')
+        )
+    }
+    comments = dict(
+        Comment.objects.values('author')
+        .annotate(total=Count('id'))
+        .values_list('author', 'total')
+    )
+    UserStats.objects.bulk_create(
+        (
+            UserStats(
+                user_id=user_id,
+                post_count=posts.get(user_id, {}).get('total', 0),
+                comment_count=comments.get(user_id, 0),
+                karma=posts.get(user_id, {}).get('karma', 0),
+            )
+            for user_id in User.objects.values_list('pk', flat=True)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('posts', '0020_postmedia_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('post_count', models.PositiveIntegerField(default=0)),
+                ('comment_count', models.PositiveIntegerField(default=0)),
+                ('karma', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'user stats',
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
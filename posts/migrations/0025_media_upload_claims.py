@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_drop_redundant_fk_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postmedia',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='postmedia',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', max_length=10),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:34
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_post_count(apps, schema_editor):
+    Category = apps.get_model('posts', 'Category')
+    Post = apps.get_model('posts', 'Post')
+
+    counts = (
+        Post.objects.filter(category=OuterRef('pk'))
+        .order_by()
+        .values('category')
+        .annotate(n=Count('id'))
+        .values('n')
+    )
+    Category.objects.update(post_count=Coalesce(Subquery(counts), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0025_media_upload_claims'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(
+            backfill_post_count, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 20:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0026_category_post_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='last_vote_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+    ]
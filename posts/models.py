@@ -1,8 +1,15 @@
+import mimetypes
+
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
-from django.db.models import Sum
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import F
+from django.utils import timezone
 from cloudinary.models import CloudinaryField
 
+from . import ranking, storage
+
 
 # -----------------------------
 # Category Model
@@ -12,6 +19,11 @@ class Category(models.Model):
 
     name = models.CharField(max_length=100, unique=True)
 
+    # Follow rows pointing here, kept in sync by posts.signals
+    follower_count = models.PositiveIntegerField(default=0)
+    # Posts filed here, kept in sync by posts.categories.adjust_count
+    post_count = models.PositiveIntegerField(default=0)
+
     def __str__(self) -> str:
         return str(self.name)
 
@@ -25,6 +37,7 @@ class Post(models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
+        db_index=False,  # post_author_feed_idx leads with author
         related_name="posts",
     )
     category = models.ForeignKey(
@@ -32,6 +45,7 @@ class Post(models.Model):
         on_delete=models.SET_NULL,
         null=True,
         blank=True,
+        db_index=False,  # post_category_feed_idx leads with category
         related_name="posts",
     )
 
@@ -39,13 +53,130 @@ class Post(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Denormalized vote counters, kept in sync by apply_vote().
+    # `manage.py rebuild_vote_counters` reconciles them from Vote.
+    score = models.IntegerField(default=0)
+    upvotes = models.PositiveIntegerField(default=0)
+    downvotes = models.PositiveIntegerField(default=0)
+    # Set with the counters; voted-on posts stay out of the archive
+    last_vote_at = models.DateTimeField(null=True, editable=False)
+
+    # Feed ranks (posts.ranking), indexed for ?sort=hot / controversial.
+    # Vote counter updates set rank_dirty; `manage.py recompute_ranks`
+    # recomputes just those posts.
+    hot_rank = models.FloatField(default=0, editable=False)
+    controversy = models.FloatField(default=0, editable=False)
+    rank_dirty = models.BooleanField(default=True, editable=False)
+
+    # Comments + replies, kept in sync by posts.signals.
+    comment_count = models.PositiveIntegerField(default=0)
+
+    # Card cache version (post_card.html): bumped on edit here and on
+    # media / category changes in posts.signals. Votes and comments
+    # don't bump it, their counters render outside the cached part.
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    # Postgres full-text index (GIN), maintained by posts.signals.
+    # Unused on SQLite, which indexes into the posts_post_fts table.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the feed: ORDER BY created_at, id
+            models.Index(
+                fields=["-created_at", "-id"], name="post_feed_idx"
+            ),
+            # Profile and category feeds: WHERE author/category = ?
+            # ORDER BY created_at, id (each also serves the FK lookup)
+            models.Index(
+                fields=["author", "-created_at", "-id"],
+                name="post_author_feed_idx",
+            ),
+            models.Index(
+                fields=["category", "-created_at", "-id"],
+                name="post_category_feed_idx",
+            ),
+            models.Index(fields=["-hot_rank", "-id"], name="post_hot_idx"),
+            models.Index(fields=["-score", "-id"], name="post_top_idx"),
+            models.Index(
+                fields=["-controversy", "-id"],
+                name="post_controversial_idx",
+            ),
+            # The dirty set: only posts awaiting a rank recompute
+            models.Index(
+                fields=["id"],
+                condition=models.Q(rank_dirty=True),
+                name="post_rank_dirty_idx",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        """Rank new posts as hot right away; bump the card cache
+        version on every edit."""
+        if self._state.adding:
+            self.hot_rank = ranking.hot(
+                self.score, self.created_at or timezone.now()
+            )
+            return super().save(*args, **kwargs)
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "version"}
+
+        self.version = F("version") + 1
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=["version"])
+
     def get_score(self) -> int:
         """
         Return total score based on Vote values (+1 / -1).
-        Uses DB aggregation for performance.
+        Reads the stored counter, no aggregate query.
         """
-        total = self.votes.aggregate(total=Sum("value")).get("total")
-        return int(total or 0)
+        return int(self.score)
+
+    def apply_vote(self, user, value: int) -> int:
+        """
+        Reddit-style vote toggle for `user`:
+        - no vote yet    => create it
+        - same vote      => remove it
+        - opposite vote  => switch it
+
+        Counters are updated with F() expressions in the same
+        transaction, then refreshed on this instance.
+        Returns the user's resulting vote (+1, -1 or 0).
+        """
+        with transaction.atomic():
+            vote = (
+                Vote.objects.select_for_update()
+                .filter(user=user, post=self)
+                .first()
+            )
+
+            if vote is None:
+                Vote.objects.create(user=user, post=self, value=value)
+                old, new = 0, value
+            elif vote.value == value:
+                vote.delete()
+                old, new = value, 0
+            else:
+                old, new = vote.value, value
+                vote.value = value
+                vote.save(update_fields=["value"])
+
+            up = (new == Vote.UPVOTE) - (old == Vote.UPVOTE)
+            down = (new == Vote.DOWNVOTE) - (old == Vote.DOWNVOTE)
+
+            Post.objects.filter(pk=self.pk).update(
+                score=F("score") + (new - old),
+                upvotes=F("upvotes") + up,
+                downvotes=F("downvotes") + down,
+                rank_dirty=True,
+                last_vote_at=timezone.now(),
+            )
+            UserStats.adjust(self.author_id, karma=new - old)
+
+        self.refresh_from_db(fields=["score", "upvotes", "downvotes"])
+        return new
 
     def user_vote(self, user) -> int:
         """
@@ -58,6 +189,27 @@ class Post(models.Model):
         vote = self.votes.filter(user=user).first()
         return int(vote.value) if vote else 0
 
+    def ready_media(self) -> list:
+        """Uploaded media only (reads the prefetched `media`)."""
+        return [m for m in self.media.all() if m.status == PostMedia.READY]
+
+    def cover_media(self):
+        """First READY media, from feed_queryset(media="cover") if used."""
+        covers = getattr(self, "covers", None)
+        if covers is None:
+            covers = self.ready_media()
+        return covers[0] if covers else None
+
+    def media_states(self) -> dict:
+        """{status: count} of this post's media, e.g. for "processing"."""
+        states = {}
+        for media in self.media.all():
+            status = media.status
+            if status == PostMedia.PROCESSING:
+                status = PostMedia.PENDING  # both shown as processing
+            states[status] = states.get(status, 0) + 1
+        return states
+
     def __str__(self) -> str:
         return f"{self.title} by {self.author.username}"
 
@@ -84,12 +236,18 @@ class Vote(models.Model):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
+        db_index=False,  # vote_post_value_idx leads with post
         related_name="votes",
     )
     value = models.SmallIntegerField(choices=VOTE_CHOICES)
 
     class Meta:
         unique_together = ("user", "post")
+        indexes = [
+            # Per-post tallies (COUNT ... GROUP BY post_id, value) read
+            # the index alone, never the table; also the FK lookup
+            models.Index(fields=["post", "value"], name="vote_post_value_idx"),
+        ]
 
     def __str__(self) -> str:
         return (
@@ -101,7 +259,16 @@ class Vote(models.Model):
 # Comment Model
 # -----------------------------
 class Comment(models.Model):
-    """Comments and replies (threaded)."""
+    """
+    Comments and replies (threaded).
+
+    `path` is a materialized path: the zero-padded ids of every
+    ancestor followed by this comment's own id. Ordering by path
+    yields the whole thread depth-first in one query.
+    """
+
+    PATH_STEP = 10  # digits per path segment
+    MAX_DEPTH = 20  # deeper replies attach to the last allowed level
 
     post = models.ForeignKey(
         Post,
@@ -124,6 +291,32 @@ class Comment(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    path = models.CharField(max_length=255, blank=True, editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Whole-thread fetch: WHERE post_id = ? ORDER BY path
+            models.Index(fields=["post", "path"], name="comment_thread_idx"),
+            # Page heads: WHERE post_id = ? AND depth = ? ORDER BY path
+            models.Index(
+                fields=["post", "depth", "path"], name="comment_heads_idx"
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        """Fill in depth and path on first save (path needs the pk)."""
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            self.depth = self.parent.depth + 1 if self.parent else 0
+            super().save(*args, **kwargs)
+
+            prefix = self.parent.path if self.parent else ""
+            self.path = prefix + str(self.pk).zfill(self.PATH_STEP)
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+
     def __str__(self) -> str:
         if self.parent:
             return f"Reply by {self.author.username}"
@@ -134,7 +327,25 @@ class Comment(models.Model):
 # Post Media Model
 # -----------------------------
 class PostMedia(models.Model):
-    """Media files for a post (image, video, document)."""
+    """
+    Media files for a post (image, video, document).
+
+    Files uploaded through create_post start PENDING, staged on local
+    disk, until posts.uploads moves them to the media store (PROCESSING
+    while a worker uploads them).
+    """
+
+    PENDING = "pending"
+    PROCESSING = "processing"
+    READY = "ready"
+    FAILED = "failed"
+
+    STATUS_CHOICES = (
+        (PENDING, "Pending"),
+        (PROCESSING, "Processing"),
+        (READY, "Ready"),
+        (FAILED, "Failed"),
+    )
 
     post = models.ForeignKey(
         Post,
@@ -151,14 +362,267 @@ class PostMedia(models.Model):
 
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=READY
+    )
+    staged_path = models.CharField(max_length=500, blank=True, default="")
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    original_name = models.CharField(max_length=255, blank=True, default="")
+
+    # Described at upload (posts.uploads) so templates read columns,
+    # not the CloudinaryField object; `manage.py backfill_media`
+    # fills rows uploaded before. width / height let <img> reserve
+    # its box.
+    resource_type = models.CharField(max_length=10, blank=True, default="")
+    mime_type = models.CharField(max_length=100, blank=True, default="")
+    file_size = models.PositiveBigIntegerField(null=True, blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    duration = models.FloatField(null=True, blank=True)  # seconds
+
+    # Order within the post; the first READY item is its cover
+    position = models.PositiveSmallIntegerField(default=0)
+
+    METADATA_FIELDS = [
+        "resource_type",
+        "mime_type",
+        "file_size",
+        "width",
+        "height",
+        "duration",
+    ]
+
+    class Meta:
+        ordering = ["position", "id"]
+        indexes = [
+            # Prefetching a page of posts' media, in order
+            models.Index(
+                fields=["post", "position", "id"],
+                name="postmedia_post_order_idx",
+            ),
+        ]
+
+    def kind(self) -> str:
+        """Resource type; rows not backfilled yet ask the file."""
+        if self.resource_type:
+            return self.resource_type
+        return self.file.resource_type if self.file else ""
+
     def is_image(self) -> bool:
-        return self.file and self.file.resource_type == "image"
+        return self.kind() == "image"
 
     def is_video(self) -> bool:
-        return self.file and self.file.resource_type == "video"
+        return self.kind() == "video"
 
     def is_document(self) -> bool:
-        return self.file and self.file.resource_type == "raw"
+        return self.kind() == "raw"
+
+    def set_metadata(self, metadata: dict) -> None:
+        """Fill METADATA_FIELDS from a media backend description."""
+        self.resource_type = (
+            metadata.get("resource_type") or self.file.resource_type
+        )
+        extension = metadata.get("format") or self.file.format
+        name = self.original_name or f"file.{extension}"
+        self.mime_type = mimetypes.guess_type(name)[0] or ""
+        for field, key in (
+            ("file_size", "bytes"),
+            ("width", "width"),
+            ("height", "height"),
+            ("duration", "duration"),
+        ):
+            if key in metadata:
+                setattr(self, field, metadata[key])
+
+    # -----------------------------
+    # URLs (memoized in posts.storage)
+    # -----------------------------
+    def url(self) -> str:
+        return storage.media_url(self.file) if self.file else ""
+
+    def thumb_url(self) -> str:
+        return storage.media_url(self.file, "thumb")
+
+    def card_url(self) -> str:
+        return storage.media_url(self.file, "card")
+
+    def full_url(self) -> str:
+        return storage.media_url(self.file, "full")
+
+    def srcset(self) -> str:
+        """Every rendition up to the original's width, for <img srcset>."""
+        candidates = {}
+        for name, width in settings.MEDIA_RENDITIONS.items():
+            if self.width:
+                width = min(width, self.width)
+            candidates.setdefault(width, storage.media_url(self.file, name))
+        return ", ".join(
+            f"{url} {width}w" for width, url in candidates.items()
+        )
+
+    def __str__(self) -> str:
+        return str(self.file or self.original_name)
+
+
+# -----------------------------
+# User Stats Model
+# -----------------------------
+class UserStats(models.Model):
+    """
+    Profile counters, kept in sync incrementally: posts, comments and
+    followers by posts.signals, karma wherever Post.score changes (apply_vote,
+    posts.votebuffer). `manage.py rebuild_user_stats` reconciles them
+    and creates missing rows.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+    )
+    post_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    karma = models.IntegerField(default=0)  # score of the user's posts
+    follower_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = "user stats"
+
+    @classmethod
+    def adjust(cls, user_id, **deltas) -> None:
+        """
+        Add `deltas` (field=amount) to a user's counters. The row is
+        created with the user (posts.signals); never here, as this
+        also runs while a user and their posts are being deleted.
+        """
+        changes = {
+            field: F(field) + amount
+            for field, amount in deltas.items()
+            if amount
+        }
+        if changes:
+            cls.objects.filter(user_id=user_id).update(**changes)
+
+    def __str__(self) -> str:
+        return f"Stats of user {self.user_id}"
+
+
+# -----------------------------
+# Follow Model
+# -----------------------------
+class Follow(models.Model):
+    """A user following another user or a category (posts.timeline)."""
+
+    follower = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="follows",
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="followers",
+    )
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="followers",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(user__isnull=False, category__isnull=True)
+                    | models.Q(user__isnull=True, category__isnull=False)
+                ),
+                name="follow_one_target",
+            ),
+            # Also the index for "who does this user follow"
+            models.UniqueConstraint(
+                fields=["follower", "user"], name="follow_user_unique"
+            ),
+            models.UniqueConstraint(
+                fields=["follower", "category"],
+                name="follow_category_unique",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        if self.user_id:
+            target = f"user {self.user_id}"
+        else:
+            target = f"category {self.category_id}"
+        return f"User {self.follower_id} follows {target}"
+
+
+# -----------------------------
+# Timeline Entry Model
+# -----------------------------
+class TimelineEntry(models.Model):
+    """
+    One post in a user's home timeline, written by fan-out on write
+    (posts.timeline). created_at copies the post's, so a timeline page
+    is one range scan of timeline_user_idx.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        db_index=False,  # timeline_user_idx leads with user
+        related_name="+",
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"], name="timeline_entry_unique"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-created_at", "-post"],
+                name="timeline_user_idx",
+            ),
+        ]
+        verbose_name_plural = "timeline entries"
+
+    def __str__(self) -> str:
+        return f"Post {self.post_id} in user {self.user_id}'s timeline"
+
+
+# -----------------------------
+# Archived Post Model
+# -----------------------------
+class ArchivedPost(models.Model):
+    """
+    An old, quiet post moved out of the hot tables (posts.archive):
+    the post with its comments, votes and media references, as one
+    compressed JSON document. post_detail still reads it.
+    """
+
+    id = models.BigIntegerField(primary_key=True)  # the post's id
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="archived_posts",
+    )
+    title = models.CharField(max_length=200)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    data = models.BinaryField()  # zlib-compressed JSON (posts.archive)
 
     def __str__(self) -> str:
-        return str(self.file)
+        return f"Archived post {self.pk}: {self.title}"
@@ -0,0 +1,220 @@
+import hashlib
+import time
+import uuid
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .instrumentation import record_cache
+
+STATS_KEYS = (
+    "pagecache:stats:hits",
+    "pagecache:stats:misses",
+    "pagecache:stats:stale",
+)
+
+# Every entry carries this tag, for site-wide invalidation.
+GLOBAL_TAG = "pages"
+
+
+def get_cache():
+    return caches[settings.PAGE_CACHE]
+
+
+# -----------------------------
+# Tags (surgical invalidation)
+# -----------------------------
+def add_cache_tags(request, *tags) -> None:
+    """Record what a page shows, so it can be invalidated by tag."""
+    request._page_cache_tags = getattr(request, "_page_cache_tags", set())
+    request._page_cache_tags.update(tags)
+
+
+def invalidate_tags(*tags) -> None:
+    """
+    Expire every cached page carrying any of `tags`.
+
+    Tag versions are random tokens, not counters: an evicted tag key
+    can't come back with an old value and revive a stale page.
+    """
+    get_cache().set_many(
+        {f"pagecache:tag:{tag}": uuid.uuid4().hex for tag in tags},
+        timeout=None,
+    )
+
+
+def _tag_versions(tags) -> dict:
+    cache = get_cache()
+    keys = {f"pagecache:tag:{tag}": tag for tag in tags}
+    found = cache.get_many(keys)
+
+    missing = {key: uuid.uuid4().hex for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def _is_fresh(entry) -> bool:
+    cache = get_cache()
+    keys = [f"pagecache:tag:{tag}" for tag in entry["tags"]]
+    current = cache.get_many(keys)
+    return all(
+        current.get(f"pagecache:tag:{tag}") == version
+        for tag, version in entry["tags"].items()
+    )
+
+
+# -----------------------------
+# Anonymous Full-Page Cache
+# -----------------------------
+def _cacheable_request(request) -> bool:
+    return (
+        settings.PAGE_CACHE_ENABLED
+        and request.method in ("GET", "HEAD")
+        and not request.user.is_authenticated
+        # Pending flash messages belong to this visitor only.
+        and not len(messages.get_messages(request))
+    )
+
+
+def _cacheable_response(request, response) -> bool:
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        # A rendered {% csrf_token %} is tied to this visitor's cookie.
+        and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+    )
+
+
+def _key(request) -> str:
+    url = request.build_absolute_uri()
+    return "pagecache:page:" + hashlib.md5(url.encode()).hexdigest()
+
+
+def _record(stat) -> None:
+    cache = get_cache()
+    key = f"pagecache:stats:{stat}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def _conditional(request, response, etag, last_modified):
+    response.headers["ETag"] = etag
+    response.headers["Last-Modified"] = http_date(last_modified)
+    return get_conditional_response(
+        request, etag=etag, last_modified=last_modified, response=response
+    )
+
+
+def cache_anonymous_page(view):
+    """
+    Serve whole responses to logged-out visitors from settings.PAGE_CACHE,
+    keyed by URL (path + query string). Views describe their content
+    with add_cache_tags(); signals expire pages through invalidate_tags().
+
+    Responses get ETag / Last-Modified, honour conditional GETs (304)
+    and say HIT / MISS in X-Page-Cache. With PAGE_CACHE_DRY_RUN the view
+    always runs; hits, misses and stale hits (cached body differs from
+    the fresh one) are only counted (see `manage.py page_cache_stats`).
+    Wraps sync and async views alike.
+    """
+
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            # request.user, the session and the cache are sync APIs
+            if not await sync_to_async(_cacheable_request)(request):
+                return await view(request, *args, **kwargs)
+            key, entry, hit = await sync_to_async(_lookup)(request)
+            if hit is not None:
+                return hit
+            add_cache_tags(request, GLOBAL_TAG)
+            response = await view(request, *args, **kwargs)
+            return await sync_to_async(_store)(request, response, key, entry)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _cacheable_request(request):
+            return view(request, *args, **kwargs)
+        key, entry, hit = _lookup(request)
+        if hit is not None:
+            return hit
+        add_cache_tags(request, GLOBAL_TAG)
+        response = view(request, *args, **kwargs)
+        return _store(request, response, key, entry)
+
+    return wrapper
+
+
+def _lookup(request):
+    """(key, fresh entry or None, response to serve or None)."""
+    cache = get_cache()
+    key = _key(request)
+    entry = cache.get(key)
+    if entry is not None and not _is_fresh(entry):
+        entry = None
+    _record("hits" if entry else "misses")
+    record_cache("pages", bool(entry))
+
+    if entry and not settings.PAGE_CACHE_DRY_RUN:
+        response = HttpResponse(
+            entry["content"], content_type=entry["content_type"]
+        )
+        response.headers["X-Page-Cache"] = "HIT"
+        return key, entry, _conditional(
+            request, response, entry["etag"], entry["last_modified"]
+        )
+    return key, entry, None
+
+
+def _store(request, response, key, entry):
+    """Cache the view's fresh `response` (if it can be shared)."""
+    response.headers["X-Page-Cache"] = "DRY-RUN-HIT" if entry else "MISS"
+    if not _cacheable_response(request, response):
+        return response
+
+    content = response.content
+    if entry and entry["content"] != content:
+        _record("stale")
+
+    etag = quote_etag(hashlib.md5(content).hexdigest())
+    last_modified = int(time.time())
+    get_cache().set(
+        key,
+        {
+            "content": content,
+            "content_type": response["Content-Type"],
+            "etag": etag,
+            "last_modified": last_modified,
+            "tags": _tag_versions(request._page_cache_tags),
+        },
+        timeout=settings.PAGE_CACHE_TTL,
+    )
+    return _conditional(request, response, etag, last_modified)
+
+
+def stats(reset=False) -> dict:
+    cache = get_cache()
+    hits, misses, stale = (cache.get(key, 0) for key in STATS_KEYS)
+    if reset:
+        cache.delete_many(STATS_KEYS)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "stale": stale,
+        "hit_ratio": hits / total if total else 0.0,
+    }
@@ -0,0 +1,41 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+# Reddit's epoch; only differences in age matter.
+EPOCH = datetime(2005, 12, 8, 7, 46, 43, tzinfo=timezone.utc)
+
+# A post this many seconds younger ranks as hot as one with 10x the
+# score (Reddit: 45000s = 12.5h).
+HOT_DECAY = 45000
+
+TOP_WINDOWS = {
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+    "month": timedelta(days=30),
+    "year": timedelta(days=365),
+    "all": None,
+}
+
+
+# -----------------------------
+# Rank Formulas
+# -----------------------------
+def hot(score: int, created_at: datetime) -> float:
+    """
+    Reddit-style hot rank: log10 of the score plus the post's age bonus.
+
+    Newer posts get a bigger bonus instead of older ones decaying, so a
+    stored rank stays correct as time passes and only changes on votes.
+    """
+    order = math.log10(max(abs(score), 1))
+    sign = (score > 0) - (score < 0)
+    seconds = (created_at - EPOCH).total_seconds()
+    return round(sign * order + seconds / HOT_DECAY, 7)
+
+
+def controversy(upvotes: int, downvotes: int) -> float:
+    """Many votes, evenly split, rank highest; one-sided posts get 0."""
+    if upvotes <= 0 or downvotes <= 0:
+        return 0.0
+    balance = min(upvotes, downvotes) / max(upvotes, downvotes)
+    return float((upvotes + downvotes) ** balance)
@@ -0,0 +1,248 @@
+import re
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector,
+)
+from django.db import connection
+from django.db.models import CharField, F, Q, Value
+from django.utils.module_loading import import_string
+
+from .feed import InvalidCursor
+from .models import Post
+
+TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def search_terms(query: str) -> list[str]:
+    """Split user input into plain word terms (drops FTS operators)."""
+    return TERM_RE.findall(query.lower())[:8]
+
+
+# -----------------------------
+# Search Backends
+# -----------------------------
+class BaseSearchBackend:
+    """
+    Interface for post search backends.
+
+    search() returns post ids, best match first. The last term is
+    prefix-matched so results work as a typeahead.
+    """
+
+    def index_post(self, post) -> None:
+        pass
+
+    def remove_post(self, post_id: int) -> None:
+        pass
+
+    def remove_posts(self, post_ids) -> None:
+        """Bulk remove_post, for deletes that send no signals."""
+        for post_id in post_ids:
+            self.remove_post(post_id)
+
+    def rebuild(self) -> int:
+        return Post.objects.count()
+
+    def search(self, query: str, offset: int, limit: int) -> list[int]:
+        raise NotImplementedError
+
+
+class BasicSearchBackend(BaseSearchBackend):
+    """Unindexed icontains fallback for databases without FTS support."""
+
+    def search(self, query, offset, limit):
+        posts = Post.objects.all()
+        for term in search_terms(query):
+            posts = posts.filter(
+                Q(title__icontains=term)
+                | Q(content__icontains=term)
+                | Q(author__username__icontains=term)
+            )
+        ids = posts.order_by("-created_at", "-id").values_list(
+            "id", flat=True
+        )
+        return list(ids[offset: offset + limit])
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Postgres full-text search over the stored Post.search_vector
+    column (GIN indexed), ranked with ts_rank.
+    Weights: title A, author B, content C.
+    """
+
+    config = "english"
+
+    def vector(self, post):
+        username = Value(post.author.username, output_field=CharField())
+        return (
+            SearchVector("title", weight="A", config=self.config)
+            + SearchVector(username, weight="B", config=self.config)
+            + SearchVector("content", weight="C", config=self.config)
+        )
+
+    def index_post(self, post):
+        Post.objects.filter(pk=post.pk).update(
+            search_vector=self.vector(post)
+        )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE posts_post AS p SET search_vector =
+                    setweight(to_tsvector(%s, p.title), 'A')
+                    || setweight(to_tsvector(%s, u.username), 'B')
+                    || setweight(to_tsvector(%s, p.content), 'C')
+                FROM auth_user AS u WHERE u.id = p.author_id
+                """,
+                [self.config] * 3,
+            )
+            return cursor.rowcount
+
+    def search(self, query, offset, limit):
+        terms = search_terms(query)
+        if not terms:
+            return []
+
+        raw = " & ".join(terms) + ":*"
+        tsquery = SearchQuery(raw, search_type="raw", config=self.config)
+        ids = (
+            Post.objects.filter(search_vector=tsquery)
+            .annotate(rank=SearchRank(F("search_vector"), tsquery))
+            .order_by("-rank", "-created_at")
+            .values_list("id", flat=True)
+        )
+        return list(ids[offset: offset + limit])
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    SQLite FTS5 fallback for local development.
+    Uses the posts_post_fts virtual table (rowid = post id),
+    ranked with bm25() weighted title > author > content.
+    """
+
+    table = "posts_post_fts"
+
+    def index_post(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE rowid = %s", [post.pk]
+            )
+            cursor.execute(
+                f"INSERT INTO {self.table} "
+                "(rowid, title, author, content) VALUES (%s, %s, %s, %s)",
+                [post.pk, post.title, post.author.username, post.content],
+            )
+
+    def remove_post(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE rowid = %s", [post_id]
+            )
+
+    def remove_posts(self, post_ids):
+        post_ids = list(post_ids)
+        if not post_ids:
+            return
+        marks = ", ".join(["%s"] * len(post_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE rowid IN ({marks})",
+                post_ids,
+            )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, title, author, content) "
+                "SELECT p.id, p.title, u.username, p.content "
+                "FROM posts_post p JOIN auth_user u ON u.id = p.author_id"
+            )
+            return cursor.rowcount
+
+    def search(self, query, offset, limit):
+        terms = search_terms(query)
+        if not terms:
+            return []
+
+        match = " ".join(f'"{term}"' for term in terms) + "*"
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {self.table} "
+                f"WHERE {self.table} MATCH %s "
+                f"ORDER BY bm25({self.table}, 10.0, 5.0, 1.0) "
+                "LIMIT %s OFFSET %s",
+                [match, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+VENDOR_BACKENDS = {
+    "postgresql": PostgresSearchBackend,
+    "sqlite": SQLiteSearchBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def get_search_backend() -> BaseSearchBackend:
+    """
+    Return the configured backend (settings.SEARCH_BACKEND dotted path),
+    or pick one from the database vendor.
+    """
+    if settings.SEARCH_BACKEND:
+        return import_string(settings.SEARCH_BACKEND)()
+    return VENDOR_BACKENDS.get(connection.vendor, BasicSearchBackend)()
+
+
+# -----------------------------
+# Ranked, Paginated Results
+# -----------------------------
+def _search_page(query, cursor, page_size):
+    """(ranked post ids of the page, next_cursor) for paginate_search."""
+    page_size = page_size or settings.FEED_PAGE_SIZE
+    try:
+        offset = int(cursor or 0)
+    except ValueError as exc:
+        raise InvalidCursor(cursor) from exc
+    if offset < 0:
+        raise InvalidCursor(cursor)
+
+    limit = min(page_size, settings.SEARCH_MAX_RESULTS - offset)
+    if limit <= 0:
+        return [], None
+
+    ids = get_search_backend().search(query, offset, limit + 1)
+    has_more = len(ids) > limit
+
+    next_offset = offset + limit
+    if not has_more or next_offset >= settings.SEARCH_MAX_RESULTS:
+        return ids[:limit], None
+    return ids[:limit], str(next_offset)
+
+
+def paginate_search(queryset, query, cursor=None, page_size=None):
+    """
+    Return (posts, next_cursor) for one page of ranked search results,
+    same contract as feed.paginate_feed().
+
+    Ranked results can't be keyset-paginated, so the cursor is a plain
+    offset, capped at settings.SEARCH_MAX_RESULTS.
+    """
+    ids, next_cursor = _search_page(query, cursor, page_size)
+    by_id = queryset.in_bulk(ids)
+    return [by_id[pk] for pk in ids if pk in by_id], next_cursor
+
+
+async def apaginate_search(queryset, query, cursor=None, page_size=None):
+    """paginate_search() for async views (backends are sync: threaded)."""
+    ids, next_cursor = await sync_to_async(_search_page)(
+        query, cursor, page_size
+    )
+    by_id = await queryset.ain_bulk(ids)
+    return [by_id[pk] for pk in ids if pk in by_id], next_cursor
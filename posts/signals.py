@@ -0,0 +1,256 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import categories, live, timeline, typeahead
+from .models import (
+    Category,
+    Comment,
+    Follow,
+    Post,
+    PostMedia,
+    UserStats,
+    Vote,
+)
+from .pagecache import GLOBAL_TAG, invalidate_tags
+from .search import get_search_backend
+
+
+# -----------------------------
+# Search Index Sync
+# -----------------------------
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    get_search_backend().index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    get_search_backend().remove_post(instance.pk)
+
+
+# -----------------------------
+# Typeahead Cache Invalidation
+# -----------------------------
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=PostMedia)
+@receiver(post_delete, sender=PostMedia)
+def invalidate_typeahead(sender, **kwargs):
+    typeahead.invalidate()
+
+
+# -----------------------------
+# Category Directory
+# -----------------------------
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_directory(sender, **kwargs):
+    categories.invalidate()
+
+
+@receiver(post_save, sender=Post)
+def count_category_post(sender, instance, created, **kwargs):
+    if created and instance.category_id:
+        categories.adjust_count(instance.category_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_category_post(sender, instance, **kwargs):
+    if instance.category_id:
+        categories.adjust_count(instance.category_id, -1)
+
+
+# -----------------------------
+# Post.comment_count Maintenance
+# -----------------------------
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comment_count=F("comment_count") + 1
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_deleted_comment(sender, instance, **kwargs):
+    # Sent once per comment, including replies removed by cascade.
+    Post.objects.filter(pk=instance.post_id, comment_count__gt=0).update(
+        comment_count=F("comment_count") - 1
+    )
+
+
+# -----------------------------
+# UserStats Maintenance
+# -----------------------------
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        UserStats.adjust(
+            instance.author_id, post_count=1, karma=instance.score
+        )
+
+
+@receiver(pre_delete, sender=Post)
+def uncount_deleted_post(sender, instance, **kwargs):
+    # The post's votes go with it (Vote signals don't touch karma).
+    # Read the stored score: votes update it with F(), so the instance
+    # being deleted may hold a stale one.
+    score = (
+        Post.objects.filter(pk=instance.pk)
+        .values_list("score", flat=True)
+        .first()
+    )
+    UserStats.adjust(
+        instance.author_id, post_count=-1, karma=-(score or 0)
+    )
+
+
+@receiver(post_save, sender=Comment)
+def count_new_user_comment(sender, instance, created, **kwargs):
+    if created:
+        UserStats.adjust(instance.author_id, comment_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_deleted_user_comment(sender, instance, **kwargs):
+    UserStats.adjust(instance.author_id, comment_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follower(sender, instance, created, **kwargs):
+    if not created:
+        return
+    if instance.user_id:
+        UserStats.adjust(instance.user_id, follower_count=1)
+    else:
+        Category.objects.filter(pk=instance.category_id).update(
+            follower_count=F("follower_count") + 1
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_deleted_follower(sender, instance, **kwargs):
+    if instance.user_id:
+        UserStats.adjust(instance.user_id, follower_count=-1)
+        source = UserStats.objects.filter(user_id=instance.user_id)
+    else:
+        source = Category.objects.filter(pk=instance.category_id)
+        source.filter(follower_count__gt=0).update(
+            follower_count=F("follower_count") - 1
+        )
+
+    # Back within the fan-out limit: its posts are no longer pulled in
+    # at read time, so write them into the followers' timelines.
+    followers = source.values_list("follower_count", flat=True).first()
+    if followers == settings.TIMELINE_FANOUT_LIMIT:
+        user_id, category_id = instance.user_id, instance.category_id
+        transaction.on_commit(
+            lambda: timeline.materialize(
+                user_id=user_id, category_id=category_id
+            )
+        )
+
+
+# -----------------------------
+# Timeline Fan-out
+# -----------------------------
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: timeline.fan_out(instance))
+
+
+# -----------------------------
+# Post Card Cache Versions
+# -----------------------------
+@receiver(post_save, sender=PostMedia)
+@receiver(post_delete, sender=PostMedia)
+def bump_card_for_media(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id).update(
+        version=F("version") + 1
+    )
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def bump_cards_for_category(sender, instance, created=False, **kwargs):
+    # pre_delete: posts still point at the category (SET_NULL follows)
+    if not created:
+        Post.objects.filter(category=instance).update(
+            version=F("version") + 1
+        )
+
+
+# -----------------------------
+# Anonymous Page Cache Invalidation
+# -----------------------------
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def expire_pages_for_post(sender, instance, **kwargs):
+    invalidate_tags(
+        f"post:{instance.pk}",
+        f"profile:{instance.author_id}",
+        "feed:head",
+        "feed:ranked",
+        "search",
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def expire_pages_for_comment(sender, instance, **kwargs):
+    # Comment counts show on the post's cards and its author's profile.
+    invalidate_tags(
+        f"post:{instance.post_id}",
+        f"profile:{instance.author_id}",
+    )
+
+
+@receiver(post_save, sender=Vote)
+@receiver(post_delete, sender=Vote)
+@receiver(post_save, sender=PostMedia)
+@receiver(post_delete, sender=PostMedia)
+def expire_pages_for_post_child(sender, instance, **kwargs):
+    invalidate_tags(f"post:{instance.post_id}")
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def expire_profile_for_follow(sender, instance, **kwargs):
+    if instance.user_id:  # follower counts show on the profile
+        invalidate_tags(f"profile:{instance.user_id}")
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def expire_all_pages(sender, **kwargs):
+    # Category names show on cards everywhere; renames are rare.
+    invalidate_tags(GLOBAL_TAG)
+
+
+# -----------------------------
+# Live Updates
+# -----------------------------
+@receiver(post_save, sender=Vote)
+@receiver(post_delete, sender=Vote)
+@receiver(post_delete, sender=Comment)
+def push_post_counters(sender, instance, **kwargs):
+    live.post_changed(instance.post_id)
+
+
+@receiver(post_save, sender=Comment)
+def push_new_comment(sender, instance, created, **kwargs):
+    if created:
+        live.comment_added(instance)
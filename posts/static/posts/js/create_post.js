@@ -202,21 +202,45 @@ function updateStatus() {
 }
 
 /* ============================================================
-   CATEGORY LIVE SEARCH  (unchanged)
+   CATEGORY LIVE SEARCH (debounced)
 ============================================================ */
 const CATEGORY_API = "/categories/search/?q=";
 
+const CATEGORY_DEBOUNCE_MS = 250;
+
 const input = document.getElementById("categoryInput");
 const bubbleBox = document.getElementById("categoryBubbleBox");
 
-input.addEventListener("input", async function () {
-  const query = this.value.trim();
+let categoryTimer = null;
+let categoryRequest = null;
+
+input.addEventListener("input", () => {
+  clearTimeout(categoryTimer);
+  categoryTimer = setTimeout(searchCategories, CATEGORY_DEBOUNCE_MS);
+});
+
+async function searchCategories() {
+  const query = input.value.trim();
   bubbleBox.innerHTML = "";
 
+  // Drop the previous lookup if it is still running
+  categoryRequest?.abort();
+  categoryRequest = null;
+
   if (!query) return;
 
-  const res = await fetch(CATEGORY_API + query);
-  const data = await res.json();
+  categoryRequest = new AbortController();
+
+  let data;
+  try {
+    const res = await fetch(CATEGORY_API + encodeURIComponent(query), {
+      signal: categoryRequest.signal,
+    });
+    if (!res.ok) return;
+    data = await res.json();
+  } catch (err) {
+    return; // aborted by a newer query, or network error
+  }
 
   data.results.slice(0, 5).forEach((cat) => {
     const b = document.createElement("div");
@@ -243,4 +267,4 @@ input.addEventListener("input", async function () {
     };
     bubbleBox.appendChild(create);
   }
-});
+}
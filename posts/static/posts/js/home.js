@@ -72,7 +72,7 @@ document.addEventListener("DOMContentLoaded", () => {
   /* ==========================================================
      REDDIT-STYLE GALLERY SLIDER (INLINE VIEW)
   ========================================================== */
-  document.querySelectorAll(".media-gallery").forEach((gallery) => {
+  function initGallery(gallery) {
     const track = gallery.querySelector(".gallery-track");
     const slides = gallery.querySelectorAll(".gallery-item");
     const dots = gallery.querySelectorAll(".gallery-dots span");
@@ -108,7 +108,108 @@ document.addEventListener("DOMContentLoaded", () => {
     });
 
     update();
-  });
+  }
+
+  document.querySelectorAll(".media-gallery").forEach(initGallery);
+
+  /* ==========================================================
+     INFINITE SCROLL (CURSOR PAGINATION)
+     - Fetches the next page of cards when the "Load more" link
+       scrolls into view; the link itself still works without JS
+  ========================================================== */
+  const feedList = document.getElementById("feed-list");
+  const feedMore = document.getElementById("feed-more");
+  let feedLoading = false;
+
+  function loadNextPage() {
+    const cursor = feedMore.dataset.nextCursor;
+    if (feedLoading || !cursor) return;
+    feedLoading = true;
+
+    const params = new URLSearchParams({ cursor });
+    if (feedMore.dataset.category) {
+      params.set("category", feedMore.dataset.category);
+    } else if (feedMore.dataset.query) {
+      params.set("q", feedMore.dataset.query);
+    } else {
+      params.set("sort", feedMore.dataset.sort);
+      params.set("t", feedMore.dataset.window);
+    }
+
+    fetch(`/feed/page/?${params}`)
+      .then((res) => res.json())
+      .then((data) => {
+        const page = document.createElement("template");
+        page.innerHTML = data.html || "";
+        page.content
+          .querySelectorAll(".media-gallery")
+          .forEach(initGallery);
+        feedList.appendChild(page.content);
+        followFeed();
+
+        if (data.next_cursor) {
+          feedMore.dataset.nextCursor = data.next_cursor;
+        } else {
+          feedObserver?.disconnect();
+          feedMore.remove();
+        }
+      })
+      .catch(() => console.warn("Feed page request failed"))
+      .finally(() => {
+        feedLoading = false;
+      });
+  }
+
+  const feedObserver =
+    feedMore && feedList && "IntersectionObserver" in window
+      ? new IntersectionObserver(
+          (entries) => {
+            if (entries.some((entry) => entry.isIntersecting)) {
+              loadNextPage();
+            }
+          },
+          { rootMargin: "600px 0px" }
+        )
+      : null;
+
+  if (feedObserver) {
+    feedObserver.observe(feedMore);
+    feedMore.addEventListener("click", (e) => {
+      e.preventDefault();
+      loadNextPage();
+    });
+  }
+
+  /* ==========================================================
+     LIVE SCORES / COMMENT COUNTS (Server-Sent Events)
+     - One stream for every card on the page, reopened as the
+       feed grows; the server sends at most one update per post
+       per tick
+  ========================================================== */
+  let liveSource = null;
+
+  function followFeed() {
+    if (!feedList?.dataset.liveUrl || !("EventSource" in window)) return;
+
+    const params = new URLSearchParams();
+    feedList
+      .querySelectorAll(".post-card[data-post-id]")
+      .forEach((card) => params.append("post", card.dataset.postId));
+    if (!params.has("post")) return;
+
+    liveSource?.close();
+    liveSource = new EventSource(`${feedList.dataset.liveUrl}?${params}`);
+    liveSource.onmessage = (e) => {
+      const data = JSON.parse(e.data);
+      const count = document.getElementById(`vote-count-${data.post}`);
+      if (count) count.textContent = data.score;
+      document
+        .querySelectorAll(`.comment-count[data-post-id="${data.post}"]`)
+        .forEach((el) => (el.textContent = data.comment_count));
+    };
+  }
+
+  followFeed();
 
   /* ==========================================================
      LIGHTBOX ELEMENTS
@@ -227,7 +328,8 @@ document.addEventListener("DOMContentLoaded", () => {
 
     mediaList = Array.from(elements).map((el) => {
       if (el.tagName === "IMG") {
-        return { type: "image", src: el.src };
+        // Lightbox shows the full rendition, not the card's srcset pick
+        return { type: "image", src: el.dataset.full || el.src };
       }
       if (el.tagName === "VIDEO") {
         return {
@@ -17,6 +17,42 @@ document.addEventListener("DOMContentLoaded", () => {
     e.target.textContent = isHidden ? "Cancel" : "Reply";
   });
 
+  /* ==========================================================
+   POST DETAIL — Load more comments / replies (HTML fragments)
+   - Links fall back to ?cursor= / ?thread= pages without JS
+========================================================== */
+  document.body.addEventListener("click", (e) => {
+    const link = e.target.closest(".more-replies[data-url]");
+    if (!link) return;
+
+    e.preventDefault();
+    if (link.dataset.loading) return;
+    link.dataset.loading = "1";
+
+    const params = new URLSearchParams();
+    if (link.dataset.cursor) params.set("cursor", link.dataset.cursor);
+
+    fetch(`${link.dataset.url}?${params}`)
+      .then((res) => res.json())
+      .then((data) => {
+        const target = document.getElementById(link.dataset.target);
+        if (target) target.insertAdjacentHTML("beforeend", data.html || "");
+
+        if (data.next_cursor) {
+          link.dataset.cursor = data.next_cursor;
+          if (!link.classList.contains("more-comments")) {
+            link.textContent = "Load more replies";
+          }
+        } else {
+          link.remove();
+        }
+      })
+      .catch((err) => console.error("Load more error:", err))
+      .finally(() => {
+        delete link.dataset.loading;
+      });
+  });
+
   /* ==========================================================
    POST DETAIL — AJAX Voting (same response as home)
 ========================================================== */
@@ -59,6 +95,44 @@ document.addEventListener("DOMContentLoaded", () => {
       .catch((err) => console.error("Vote error:", err));
   });
 
+  /* ==========================================================
+   POST DETAIL — Live score and new comments (Server-Sent Events)
+   - New top-level comments are appended only when every page of
+     comments is shown; otherwise paging brings them in order
+========================================================== */
+  const liveCard = document.querySelector(".post-card[data-live-url]");
+  if (liveCard && "EventSource" in window) {
+    const postId = liveCard.dataset.postId;
+    const source = new EventSource(
+      `${liveCard.dataset.liveUrl}?post=${postId}`
+    );
+
+    const query = new URLSearchParams(location.search);
+    const allComments = () =>
+      !query.has("thread") &&
+      !query.has("cursor") &&
+      !document.querySelector(".more-comments");
+
+    source.onmessage = (e) => {
+      const data = JSON.parse(e.data);
+
+      const countEl = document.getElementById(`vote-count-${postId}`);
+      if (countEl) countEl.textContent = data.score;
+      document
+        .querySelectorAll(".comment-count")
+        .forEach((el) => (el.textContent = data.comment_count));
+
+      data.comments.forEach((comment) => {
+        if (document.getElementById(`comment-${comment.id}`)) return;
+
+        const target = comment.parent
+          ? document.getElementById(`replies-${comment.parent}`)
+          : allComments() && document.getElementById("comment-list");
+        if (target) target.insertAdjacentHTML("beforeend", comment.html);
+      });
+    };
+  }
+
   /* ==========================================================
      REDDIT-STYLE MEDIA SLIDER (MULTI MEDIA)
   ========================================================== */
@@ -183,7 +257,10 @@ document.addEventListener("DOMContentLoaded", () => {
     .forEach((el, i, arr) => {
       // Build media array
       mediaList = Array.from(arr).map((m) => ({
-        src: m.tagName === "IMG" ? m.src : m.querySelector("source")?.src,
+        src:
+          m.tagName === "IMG"
+            ? m.dataset.full || m.src
+            : m.querySelector("source")?.src,
         type: m.tagName === "IMG" ? "image" : "video",
       }));
 
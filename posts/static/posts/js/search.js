@@ -4,17 +4,39 @@ document.addEventListener("DOMContentLoaded", () => {
 
   if (!bar) return;
 
+  // Wait for a typing pause, and cancel any request still in flight
+  // when a newer query replaces it.
+  const DEBOUNCE_MS = 250;
+  let timer = null;
+  let inflight = null;
+
   bar.addEventListener("input", () => {
+    clearTimeout(timer);
+    timer = setTimeout(runSearch, DEBOUNCE_MS);
+  });
+
+  function runSearch() {
     const q = bar.value.trim();
 
+    inflight?.abort();
+    inflight = null;
+
     if (!q) {
       box.innerHTML = "";
       box.style.display = "none";
       return;
     }
 
-    fetch(`/search/ajax/?q=${encodeURIComponent(q)}`)
-      .then((r) => r.json())
+    inflight = new AbortController();
+
+    fetch(`/search/ajax/?q=${encodeURIComponent(q)}`, {
+      signal: inflight.signal,
+    })
+      .then((r) => {
+        // Throttled (429): keep the current dropdown as it is
+        if (!r.ok) throw new Error(`Search failed (${r.status})`);
+        return r.json();
+      })
       .then((data) => {
         const results = data.results;
 
@@ -43,8 +65,11 @@ document.addEventListener("DOMContentLoaded", () => {
           .join("");
 
         box.style.display = "block";
+      })
+      .catch((err) => {
+        if (err.name !== "AbortError") console.warn(err.message);
       });
-  });
+  }
 
   // hide dropdown when clicking outside
   document.addEventListener("click", (e) => {
@@ -0,0 +1,180 @@
+"""
+Media store backends: upload staged files (posts.uploads) and build
+the URLs of image renditions (settings.MEDIA_RENDITIONS).
+
+Building a Cloudinary URL runs Python for every image on every render,
+so URLs are memoized per (stored file, rendition) for the process.
+"""
+
+import io
+import mimetypes
+import os
+from functools import lru_cache
+
+from cloudinary import CloudinaryResource, api, uploader
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow is only needed by LocalBackend
+    Image = None
+
+URL_CACHE_SIZE = 20000
+
+
+# -----------------------------
+# Backends
+# -----------------------------
+class CloudinaryBackend:
+    """Cloudinary (the production media store): resized on its CDN."""
+
+    def upload(self, path: str, name: str) -> CloudinaryResource:
+        return uploader.upload_resource(
+            path, type="upload", resource_type="auto"
+        )
+
+    def describe(self, resource) -> dict:
+        """Upload-style metadata of a stored file (Admin API call)."""
+        return api.resource(
+            resource.public_id,
+            resource_type=resource.resource_type,
+            type=resource.type,
+        )
+
+    def delete(self, resource) -> None:
+        uploader.destroy(
+            resource.public_id,
+            resource_type=resource.resource_type,
+            type=resource.type,
+            invalidate=True,  # drop the CDN's cached copies too
+        )
+
+    def url(self, resource, width=None) -> str:
+        if width is None:
+            return resource.url
+        return resource.build_url(
+            width=width, crop="limit", fetch_format="auto", quality="auto"
+        )
+
+
+class LocalBackend:
+    """
+    Files in default_storage, described like a Cloudinary upload.
+    Image renditions are made with Pillow at upload time (without
+    Pillow every rendition is the original).
+    """
+
+    def upload(self, path: str, name: str) -> CloudinaryResource:
+        with open(path, "rb") as fh:
+            stored = default_storage.save(f"uploads/{name}", File(fh))
+
+        public_id, _, extension = stored.rpartition(".")
+        mime = mimetypes.guess_type(name)[0] or ""
+        resource_type = mime.split("/")[0]
+        if resource_type not in ("image", "video"):
+            resource_type = "raw"
+
+        metadata = {
+            "resource_type": resource_type,
+            "format": extension,
+            "bytes": os.path.getsize(path),
+        }
+        if resource_type == "image" and Image is not None:
+            metadata.update(self.make_renditions(path, stored))
+        return CloudinaryResource(
+            public_id=public_id or stored,
+            format=extension if public_id else None,
+            version="1",
+            type="upload",
+            resource_type=resource_type,
+            metadata=metadata,
+        )
+
+    def make_renditions(self, path: str, stored: str) -> dict:
+        with Image.open(path) as image:
+            size = image.size
+            for width in settings.MEDIA_RENDITIONS.values():
+                if width >= size[0]:
+                    continue  # url() serves the original instead
+                copy = image.copy()
+                copy.thumbnail((width, size[1]))
+                buffer = io.BytesIO()
+                copy.save(buffer, format=image.format)
+                default_storage.save(
+                    self.rendition_name(stored, width),
+                    ContentFile(buffer.getvalue()),
+                )
+        return {"width": size[0], "height": size[1]}
+
+    def describe(self, resource) -> dict:
+        stored = self.stored_name(resource)
+        metadata = {"bytes": default_storage.size(stored)}
+        if resource.resource_type == "image" and Image is not None:
+            with default_storage.open(stored) as fh, Image.open(fh) as image:
+                metadata["width"], metadata["height"] = image.size
+        return metadata
+
+    def delete(self, resource) -> None:
+        """Delete the original and its renditions."""
+        stored = self.stored_name(resource)
+        default_storage.delete(stored)
+        for width in settings.MEDIA_RENDITIONS.values():
+            default_storage.delete(self.rendition_name(stored, width))
+
+    def stored_name(self, resource) -> str:
+        if resource.format:
+            return f"{resource.public_id}.{resource.format}"
+        return resource.public_id
+
+    def rendition_name(self, stored: str, width: int) -> str:
+        root, extension = os.path.splitext(stored)
+        return f"{root}-{width}w{extension}"
+
+    def url(self, resource, width=None) -> str:
+        stored = self.stored_name(resource)
+        if width is not None:
+            rendition = self.rendition_name(stored, width)
+            if default_storage.exists(rendition):
+                stored = rendition
+        return default_storage.url(stored)
+
+
+@lru_cache(maxsize=None)
+def get_media_backend():
+    """Return the configured media backend (settings.MEDIA_BACKEND)."""
+    return import_string(settings.MEDIA_BACKEND)()
+
+
+# -----------------------------
+# Rendition URLs
+# -----------------------------
+_urls = {}
+
+
+def media_url(resource, rendition: str = "") -> str:
+    """
+    URL of `resource` (a CloudinaryField value), resized to the named
+    rendition for images. Memoized: stored files never change.
+    """
+    key = (resource.get_prep_value(), rendition)
+    url = _urls.get(key)
+    if url is None:
+        width = settings.MEDIA_RENDITIONS[rendition] if rendition else None
+        url = get_media_backend().url(resource, width)
+        if len(_urls) >= URL_CACHE_SIZE:
+            _urls.clear()
+        _urls[key] = url
+    return url
+
+
+@receiver(setting_changed)
+def _reset(setting, **kwargs):
+    if setting in ("MEDIA_BACKEND", "MEDIA_RENDITIONS", "STORAGES"):
+        get_media_backend.cache_clear()
+        _urls.clear()
@@ -1,3 +1,1829 @@
-from django.test import TestCase
+from datetime import timedelta
+import asyncio
+import gzip
+import io
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    archive,
+    categories,
+    instrumentation,
+    live,
+    maintenance,
+    ranking,
+    storage,
+    timeline,
+    votebuffer,
+)
+from .comments import build_comment_tree, comment_page
+from .feed import (
+    decode_cursor,
+    encode_cursor,
+    feed_queryset,
+    paginate_feed,
+)
+from .models import (
+    ArchivedPost,
+    Category,
+    Comment,
+    Follow,
+    Post,
+    PostMedia,
+    TimelineEntry,
+    UserStats,
+    Vote,
+)
+from .pagecache import stats as page_cache_stats
+from .search import get_search_backend
+from .typeahead import take_token
+
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+    categories.invalidate()
+
+
+def clear_vote_buffer():
+    votebuffer._pending.clear()
+    votebuffer._deltas.clear()
+
+
+TEST_STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.InMemoryStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+
+
+@override_settings(VOTE_FLUSH_INTERVAL=0)
+class VoteCounterTests(TestCase):
+    """Post.score / upvotes / downvotes follow votes without recounting."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        cls.voter = User.objects.create_user("voter")
+        cls.other = User.objects.create_user("other")
+
+    def counters(self, post):
+        post.refresh_from_db()
+        return post.score, post.upvotes, post.downvotes
+
+    def test_apply_vote_toggles(self):
+        post = Post.objects.create(author=self.author, title="P", content="")
+
+        self.assertEqual(post.apply_vote(self.voter, Vote.UPVOTE), 1)
+        self.assertEqual(self.counters(post), (1, 1, 0))
+
+        self.assertEqual(post.apply_vote(self.voter, Vote.DOWNVOTE), -1)
+        self.assertEqual(self.counters(post), (-1, 0, 1))
+
+        post.apply_vote(self.other, Vote.DOWNVOTE)
+        self.assertEqual(self.counters(post), (-2, 0, 2))
+
+        # Same vote again: toggled off
+        self.assertEqual(post.apply_vote(self.voter, Vote.DOWNVOTE), 0)
+        self.assertEqual(self.counters(post), (-1, 0, 1))
+        self.assertEqual(post.user_vote(self.voter), 0)
+        self.assertEqual(post.user_vote(self.other), -1)
+
+    def test_rebuild_repairs_drift(self):
+        post = Post.objects.create(author=self.author, title="P", content="")
+        post.apply_vote(self.voter, Vote.UPVOTE)
+        post.apply_vote(self.other, Vote.UPVOTE)
+        Post.objects.filter(pk=post.pk).update(
+            score=7, upvotes=3, downvotes=4
+        )
+
+        out = StringIO()
+        call_command("rebuild_vote_counters", check=True, stdout=out)
+        self.assertIn("1 out of sync", out.getvalue())
+        self.assertEqual(self.counters(post), (7, 3, 4))  # only reported
+
+        call_command("rebuild_vote_counters", stdout=StringIO())
+        self.assertEqual(self.counters(post), (2, 2, 0))
+        self.assertTrue(
+            Post.objects.values_list("rank_dirty", flat=True).get(pk=post.pk)
+        )
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class FeedQueryCountTests(TestCase):
+    """Feed pages must cost the same number of queries at any size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="pw")
+        cls.viewer = User.objects.create_user("viewer", password="pw")
+        cls.category = Category.objects.create(name="News")
+
+    def setUp(self):
+        clear_caches()
+
+    def make_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(
+                author=self.author,
+                category=self.category,
+                title=f"Post {i}",
+                content="Body",
+            )
+            PostMedia.objects.create(post=post)
+            Comment.objects.create(
+                post=post, author=self.viewer, content="Nice"
+            )
+            post.apply_vote(self.viewer, 1)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx)
+
+    def assertConstantQueries(self, url):
+        self.make_posts(2)
+        small = self.count_queries(url)
+        self.make_posts(20)
+        self.assertEqual(self.count_queries(url), small)
+
+    def test_home_anonymous(self):
+        self.assertConstantQueries(reverse("home"))
+
+    def test_home_authenticated(self):
+        self.client.force_login(self.viewer)
+        self.assertConstantQueries(reverse("home"))
+
+    def test_profile_page(self):
+        self.client.force_login(self.viewer)
+        self.assertConstantQueries(
+            reverse("profile_page", args=[self.author.username])
+        )
+
+    def test_ajax_search(self):
+        self.assertConstantQueries(reverse("ajax_search") + "?q=Post")
+
+    def test_home_marks_viewer_vote(self):
+        self.make_posts(1)
+        self.client.force_login(self.viewer)
+        response = self.client.get(reverse("home"))
+        post = response.context["posts"][0]
+        self.assertEqual(post.user_vote_value, 1)
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(post.score, 1)
+
+
+@override_settings(STORAGES=TEST_STORAGES, FEED_PAGE_SIZE=3)
+class FeedPaginationTests(TestCase):
+    """Cursor pagination walks the feed newest-first without gaps."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="pw")
+        cls.posts = [
+            Post.objects.create(author=cls.author, title=f"{i}", content="x")
+            for i in range(7)
+        ]
+        # Same timestamp everywhere: order must fall back to id.
+        Post.objects.update(created_at=cls.posts[0].created_at)
+
+    def test_pages_cover_feed_in_order(self):
+        seen = []
+        response = self.client.get(reverse("home"))
+        seen += [p.id for p in response.context["posts"]]
+        cursor = response.context["next_cursor"]
+
+        while cursor:
+            response = self.client.get(
+                reverse("feed_page"), {"cursor": cursor}
+            )
+            seen += [p.id for p in response.context["posts"]]
+            cursor = response.json()["next_cursor"]
+
+        expected = sorted((p.id for p in self.posts), reverse=True)
+        self.assertEqual(seen, expected)
+
+    def test_cursor_round_trip(self):
+        post = Post.objects.get(pk=self.posts[0].pk)
+        self.assertEqual(
+            decode_cursor(encode_cursor(post)),
+            (post.created_at, post.pk),
+        )
+
+    def test_bad_cursor_rejected(self):
+        response = self.client.get(reverse("feed_page"), {"cursor": "nope"})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class SearchTests(TestCase):
+    """Search index stays in sync with posts and ranks title hits first."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("crowfan", password="pw")
+
+    def setUp(self):
+        clear_caches()
+
+    def search(self, q):
+        response = self.client.get(reverse("ajax_search"), {"q": q})
+        return [r["id"] for r in response.json()["results"]]
+
+    def test_title_outranks_content(self):
+        body = Post.objects.create(
+            author=self.author, title="Weekend", content="a django story"
+        )
+        title = Post.objects.create(
+            author=self.author, title="Django tips", content="notes"
+        )
+        self.assertEqual(self.search("djan"), [title.id, body.id])
+
+    def test_index_follows_edit_and_delete(self):
+        post = Post.objects.create(
+            author=self.author, title="Ravens", content="birds"
+        )
+        self.assertEqual(self.search("ravens"), [post.id])
+
+        post.title = "Magpies"
+        post.save()
+        self.assertEqual(self.search("ravens"), [])
+        self.assertEqual(self.search("magpies"), [post.id])
+
+        post.delete()
+        self.assertEqual(self.search("magpies"), [])
+
+    def test_matches_author_and_ignores_operators(self):
+        post = Post.objects.create(
+            author=self.author, title="Hello", content="world"
+        )
+        self.assertEqual(self.search("crowfan"), [post.id])
+        self.assertEqual(self.search('"hello" * (-'), [post.id])
+
+    def test_typeahead_is_limited(self):
+        for i in range(12):
+            Post.objects.create(
+                author=self.author, title=f"Limit {i}", content="x"
+            )
+        with self.settings(SEARCH_TYPEAHEAD_LIMIT=5):
+            self.assertEqual(len(self.search("limit")), 5)
+
+    def test_rebuild_matches_signals(self):
+        Post.objects.create(author=self.author, title="One", content="x")
+        self.assertEqual(get_search_backend().rebuild(), 1)
+        self.assertEqual(len(self.search("one")), 1)
+
+
+@override_settings(TYPEAHEAD_THROTTLE=(3, 1.0))
+class TypeaheadTests(TestCase):
+    """Typeahead results are cached until content changes; clients throttled."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="pw")
+
+    def setUp(self):
+        clear_caches()
+
+    def categories(self, q):
+        return self.client.get(reverse("category_search"), {"q": q})
+
+    def test_results_cached_until_category_changes(self):
+        Category.objects.create(name="Tech")
+        self.assertEqual(self.categories("te").json()["results"], ["Tech"])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.categories(" TE ").json()["results"], ["Tech"]
+            )
+
+        Category.objects.create(name="Tennis")
+        self.assertEqual(
+            sorted(self.categories("te").json()["results"]),
+            ["Tech", "Tennis"],
+        )
+
+    def test_throttle_returns_429(self):
+        for _ in range(3):
+            self.assertEqual(self.categories("x").status_code, 200)
+        response = self.categories("x")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1")
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_anonymous_clients_keyed_on_forwarded_address(self):
+        def search(forwarded_for):
+            return self.client.get(
+                reverse("category_search"),
+                {"q": "x"},
+                HTTP_X_FORWARDED_FOR=forwarded_for,
+            ).status_code
+
+        for _ in range(3):
+            self.assertEqual(search("203.0.113.5"), 200)
+        # A forged leading entry does not buy a fresh bucket...
+        self.assertEqual(search("10.9.9.9, 203.0.113.5"), 429)
+        # ...but another client behind the same proxy has its own
+        self.assertEqual(search("198.51.100.7"), 200)
+
+    def test_bucket_refills(self):
+        for _ in range(3):
+            self.assertEqual(take_token("t", now=100.0), 0)
+        self.assertGreater(take_token("t", now=100.0), 0)
+        self.assertEqual(take_token("t", now=101.5), 0)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class CommentTreeTests(TestCase):
+    """Threads load in one query, depth-first, with cut-offs counted."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("user", password="pw")
+        cls.post = Post.objects.create(
+            author=cls.user, title="Thread", content="x"
+        )
+
+    def reply(self, parent=None, text="c"):
+        return Comment.objects.create(
+            post=self.post, author=self.user, content=text, parent=parent
+        )
+
+    def test_paths_nest_under_parent(self):
+        top = self.reply()
+        child = self.reply(top)
+        self.assertEqual((top.depth, child.depth), (0, 1))
+        self.assertTrue(child.path.startswith(top.path))
+        self.assertEqual(len(child.path), 2 * Comment.PATH_STEP)
+
+    def test_tree_in_one_query(self):
+        first, second = self.reply(text="1"), self.reply(text="2")
+        first_child = self.reply(first, "1.1")
+        self.reply(first_child, "1.1.1")
+        self.reply(second, "2.1")
+
+        with self.assertNumQueries(1):
+            tree = build_comment_tree(self.post)
+            shape = [
+                (c.content, [(r.content, len(r.children)) for r in c.children])
+                for c in tree
+            ]
+            authors = {c.author.username for c in tree}
+        self.assertEqual(shape, [("1", [("1.1", 1)]), ("2", [("2.1", 0)])])
+        self.assertEqual(authors, {"user"})
+
+    def test_depth_and_reply_cut_offs(self):
+        top = self.reply()
+        replies = [self.reply(top) for _ in range(4)]
+        self.reply(replies[-1])
+
+        tree = build_comment_tree(self.post, max_depth=2, max_replies=2)
+        self.assertEqual(len(tree[0].children), 2)
+        self.assertEqual(tree[0].more_replies, 2)
+
+        tree = build_comment_tree(self.post, max_depth=2, max_replies=10)
+        last = tree[0].children[-1]
+        self.assertEqual(last.children, [])
+        self.assertEqual(last.more_replies, 1)
+
+    def test_thread_page_continues_below_comment(self):
+        top = self.reply(text="top")
+        child = self.reply(top, "child")
+        self.reply(child, "grandchild")
+
+        response = self.client.get(
+            reverse("post_detail", args=[self.post.id]),
+            {"thread": child.id},
+        )
+        (root,) = response.context["comments"]
+        self.assertEqual(root, child)
+        self.assertEqual(
+            [c.content for c in root.children], ["grandchild"]
+        )
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class CommentPaginationTests(TestCase):
+    """Top-level comments and replies page by cursor; counts stay stored."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("user", password="pw")
+        cls.post = Post.objects.create(
+            author=cls.user, title="Viral", content="x"
+        )
+
+    def comment(self, text, parent=None):
+        return Comment.objects.create(
+            post=self.post, author=self.user, content=text, parent=parent
+        )
+
+    def test_top_level_pages_keep_subthreads(self):
+        for i in range(5):
+            top = self.comment(f"{i}")
+            self.comment(f"{i}.r", top)
+
+        page, cursor = comment_page(self.post, page_size=2)
+        seen = [c.content for c in page]
+        self.assertEqual([c.children[0].content for c in page], ["0.r", "1.r"])
+
+        while cursor:
+            response = self.client.get(
+                reverse("comments_page", args=[self.post.id]),
+                {"cursor": cursor},
+            )
+            seen += [c.content for c in response.context["comments"]]
+            cursor = response.json()["next_cursor"]
+
+        self.assertEqual(seen, ["0", "1", "2", "3", "4"])
+
+    def test_replies_endpoint_continues_after_cut_off(self):
+        top = self.comment("top")
+        for i in range(5):
+            self.comment(f"r{i}", top)
+
+        (node,) = build_comment_tree(self.post, max_replies=2)
+        self.assertEqual(node.more_replies, 3)
+
+        response = self.client.get(
+            reverse("replies_page", args=[top.id]),
+            {"cursor": node.children[-1].path},
+        )
+        self.assertEqual(
+            [c.content for c in response.context["comments"]],
+            ["r2", "r3", "r4"],
+        )
+
+    def test_detail_page_is_bounded(self):
+        for i in range(8):
+            self.comment(f"{i}")
+        with self.settings(COMMENT_PAGE_SIZE=3):
+            response = self.client.get(
+                reverse("post_detail", args=[self.post.id])
+            )
+        self.assertEqual(len(response.context["comments"]), 3)
+        self.assertIsNotNone(response.context["next_cursor"])
+
+    def test_comment_count_follows_create_and_cascade_delete(self):
+        top = self.comment("top")
+        self.comment("reply", self.comment("child", top))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 3)
+
+        top.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class PostCardCacheTests(TestCase):
+    """Cached card parts follow Post.version; per-viewer parts never cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="pw")
+        cls.other = User.objects.create_user("other", password="pw")
+
+    def setUp(self):
+        clear_caches()
+        self.post = Post.objects.create(
+            author=self.author, title="Original", content="x"
+        )
+
+    def home(self):
+        return self.client.get(reverse("home")).content.decode()
+
+    def test_edit_and_media_change_bump_version(self):
+        self.assertIn("Original", self.home())
+        version = self.post.version
+
+        self.post.title = "Edited"
+        self.post.save()
+        self.assertEqual(self.post.version, version + 1)
+        self.assertIn("Edited", self.home())
+
+        PostMedia.objects.create(post=self.post)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.version, version + 2)
+
+    def test_stale_card_served_until_version_bumps(self):
+        self.home()
+        Post.objects.filter(pk=self.post.pk).update(title="Sneaky")
+        self.assertIn("Original", self.home())
+
+    def test_viewer_parts_not_shared(self):
+        self.client.force_login(self.author)
+        self.assertIn("edit-btn", self.home())
+
+        self.client.force_login(self.other)
+        self.post.apply_vote(self.other, 1)
+        page = self.home()
+        self.assertNotIn("edit-btn", page)
+        self.assertIn("upvote active", page)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class PageCacheTests(TestCase):
+    """Anonymous pages come from cache until something they show changes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="pw")
+        cls.voter = User.objects.create_user("voter", password="pw")
+
+    def setUp(self):
+        clear_caches()
+        self.post = Post.objects.create(
+            author=self.author, title="Cached", content="x"
+        )
+        self.other = Post.objects.create(
+            author=self.voter, title="Other", content="y"
+        )
+
+    def test_hit_runs_no_queries_and_supports_etag(self):
+        url = reverse("post_detail", args=[self.post.id])
+        first = self.client.get(url)
+        self.assertEqual(first["X-Page-Cache"], "MISS")
+
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second["X-Page-Cache"], "HIT")
+        self.assertEqual(second.content, first.content)
+
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_vote_invalidates_only_affected_pages(self):
+        url = reverse("post_detail", args=[self.post.id])
+        other_url = reverse("post_detail", args=[self.other.id])
+        self.client.get(url)
+        self.client.get(other_url)
+
+        self.post.apply_vote(self.voter, 1)
+        self.assertEqual(self.client.get(url)["X-Page-Cache"], "MISS")
+        self.assertEqual(self.client.get(other_url)["X-Page-Cache"], "HIT")
+
+    def test_new_post_expires_first_feed_page(self):
+        self.client.get(reverse("home"))
+        Post.objects.create(author=self.author, title="Fresh", content="z")
+
+        response = self.client.get(reverse("home"))
+        self.assertEqual(response["X-Page-Cache"], "MISS")
+        self.assertContains(response, "Fresh")
+
+    def test_logged_in_users_bypass_cache(self):
+        self.client.get(reverse("home"))
+        self.client.force_login(self.voter)
+        response = self.client.get(reverse("home"))
+        self.assertNotIn("X-Page-Cache", response)
+
+    def test_dry_run_counts_without_serving(self):
+        url = reverse("post_detail", args=[self.post.id])
+        with self.settings(PAGE_CACHE_DRY_RUN=True):
+            self.client.get(url)
+            Post.objects.filter(pk=self.post.pk).update(title="Changed")
+            response = self.client.get(url)
+
+        self.assertEqual(response["X-Page-Cache"], "DRY-RUN-HIT")
+        self.assertContains(response, "Changed")
+        self.assertEqual(
+            page_cache_stats(),
+            {"hits": 1, "misses": 1, "stale": 1, "hit_ratio": 0.5},
+        )
+
+
+@override_settings(VOTE_WRITE_BEHIND=True, VOTE_FLUSH_INTERVAL=0)
+class VoteBufferTests(TestCase):
+    """Buffered votes coalesce per (user, post) and flush consistently."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="pw")
+        cls.voter = User.objects.create_user("voter", password="pw")
+
+    def setUp(self):
+        clear_caches()
+        clear_vote_buffer()
+        self.post = Post.objects.create(
+            author=self.author, title="Votes", content="x"
+        )
+
+    def click(self, value, user=None):
+        return votebuffer.record_vote(
+            (user or self.voter).pk, self.post.pk, value
+        )
+
+    def counters(self):
+        self.post.refresh_from_db()
+        return self.post.score, self.post.upvotes, self.post.downvotes
+
+    def test_toggles_coalesce_into_one_write(self):
+        self.assertEqual(self.click(1), (1, 1))
+        self.assertEqual(self.click(1), (0, 0))
+        self.assertEqual(self.click(-1), (-1, -1))
+        self.assertEqual(self.click(1, self.author), (1, 0))
+        self.assertFalse(Vote.objects.exists())  # nothing written yet
+
+        self.assertEqual(votebuffer.flush(), 2)
+        self.assertEqual(self.counters(), (0, 1, 1))
+        self.assertEqual(self.post.user_vote(self.voter), -1)
+
+        # Later clicks start from the stored vote.
+        self.assertEqual(self.click(-1), (0, 1))
+        votebuffer.flush()
+        self.assertEqual(self.counters(), (1, 1, 0))
+        self.assertEqual(self.post.votes.count(), 1)
+
+    def test_flush_reconciles_with_direct_writes(self):
+        self.click(-1)
+        self.post.apply_vote(self.voter, 1)  # another process, unbuffered
+
+        votebuffer.flush()  # last write wins; counters follow the rows
+        self.assertEqual(self.counters(), (-1, 0, 1))
+        self.assertEqual(self.post.user_vote(self.voter), -1)
+
+    def test_failed_flush_keeps_votes(self):
+        self.click(1)
+        with mock.patch.object(
+            Vote.objects, "bulk_create", side_effect=DatabaseError
+        ):
+            with self.assertRaises(DatabaseError):
+                votebuffer.flush()
+        self.assertEqual(self.counters(), (0, 0, 0))
+
+        self.assertEqual(votebuffer.flush(), 1)
+        self.assertEqual(self.counters(), (1, 1, 0))
+        self.assertEqual(self.click(1, self.author), (1, 2))
+
+    def test_deleted_voter_is_dropped(self):
+        gone = User.objects.create_user("gone", password="pw")
+        self.click(1, gone)
+        self.click(1)
+        gone.delete()
+
+        self.assertEqual(votebuffer.flush(), 1)
+        self.assertEqual(self.counters(), (1, 1, 0))
+        self.assertEqual(self.click(-1, self.author), (-1, 0))
+
+    def test_endpoint_answers_optimistically(self):
+        self.client.force_login(self.voter)
+        url = reverse("vote_post", args=[self.post.id])
+        response = self.client.post(
+            url, {"action": "upvote"}, content_type="application/json"
+        )
+        self.assertEqual(
+            response.json(), {"success": True, "score": 1, "user_vote": 1}
+        )
+        self.assertEqual(self.counters(), (0, 0, 0))
+
+        votebuffer.flush()
+        self.assertEqual(self.counters(), (1, 1, 0))
+
+        missing = reverse("vote_post", args=[self.post.id + 100])
+        response = self.client.post(
+            missing, {"action": "upvote"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class AsyncViewTests(TestCase):
+    """The async views answer through the ASGI request path."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="pw")
+        cls.category = Category.objects.create(name="Tech")
+        cls.post = Post.objects.create(
+            author=cls.author,
+            category=cls.category,
+            title="Async ravens",
+            content="x",
+        )
+        Comment.objects.create(post=cls.post, author=cls.author, content="c")
+
+    def setUp(self):
+        clear_caches()
+
+    async def test_post_detail(self):
+        response = await self.async_client.get(
+            reverse("post_detail", args=[self.post.id])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Async ravens")
+        self.assertEqual(len(response.context["comments"]), 1)
+
+        response = await self.async_client.get(
+            reverse("post_detail", args=[self.post.id + 100])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_vote_post(self):
+        url = reverse("vote_post", args=[self.post.id])
+        response = await self.async_client.post(
+            url, {"action": "upvote"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 302)  # login first
+
+        await self.async_client.aforce_login(self.author)
+        response = await self.async_client.post(
+            url, {"action": "upvote"}, content_type="application/json"
+        )
+        self.assertEqual(
+            response.json(), {"success": True, "score": 1, "user_vote": 1}
+        )
+        response = await self.async_client.post(
+            url, {"action": "sideways"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(), {"success": False, "error": "Invalid action"}
+        )
+
+    async def test_ajax_search(self):
+        response = await self.async_client.get(
+            reverse("ajax_search"), {"q": "raven"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {
+                "results": [
+                    {
+                        "id": self.post.id,
+                        "title": "Async ravens",
+                        "author": "author",
+                        "thumb": None,
+                    }
+                ]
+            },
+        )
+
+    async def test_category_search(self):
+        response = await self.async_client.get(
+            reverse("category_search"), {"q": "te"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"results": ["Tech"]})
+
+        response = await self.async_client.get(reverse("category_search"))
+        self.assertEqual(response.json(), {"results": []})
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class RankingTests(TestCase):
+    """Rank columns are recomputed for dirty posts only and drive ?sort=."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="pw")
+        cls.voters = [
+            User.objects.create_user(f"voter{i}", password="pw")
+            for i in range(4)
+        ]
+
+    def setUp(self):
+        clear_caches()
+
+    def post(self, title, age=timedelta(0)):
+        post = Post.objects.create(
+            author=self.author, title=title, content="x"
+        )
+        Post.objects.filter(pk=post.pk).update(
+            created_at=timezone.now() - age
+        )
+        return post
+
+    def vote(self, post, *values):
+        for voter, value in zip(self.voters, values):
+            post.apply_vote(voter, value)
+
+    def recompute(self):
+        out = StringIO()
+        call_command("recompute_ranks", stdout=out)
+        return out.getvalue()
+
+    def test_formulas(self):
+        now = timezone.now()
+        self.assertAlmostEqual(
+            ranking.hot(10, now),
+            ranking.hot(1, now + timedelta(seconds=ranking.HOT_DECAY)),
+        )
+        self.assertLess(ranking.hot(-5, now), ranking.hot(0, now))
+        self.assertEqual(ranking.controversy(4, 0), 0)
+        self.assertGreater(
+            ranking.controversy(2, 2), ranking.controversy(3, 1)
+        )
+
+    def test_only_dirty_posts_recomputed(self):
+        quiet, voted = self.post("quiet"), self.post("voted")
+        self.assertIn("2 posts", self.recompute())
+        self.assertIn("0 posts", self.recompute())
+        quiet.refresh_from_db()
+        quiet_rank = quiet.hot_rank
+
+        self.vote(voted, 1, 1, -1)
+        self.assertIn("1 posts", self.recompute())
+        voted.refresh_from_db()
+        self.assertFalse(voted.rank_dirty)
+        self.assertEqual(voted.hot_rank, ranking.hot(1, voted.created_at))
+        self.assertEqual(voted.controversy, ranking.controversy(2, 1))
+        quiet.refresh_from_db()
+        self.assertFalse(quiet.rank_dirty)
+        self.assertEqual(quiet.hot_rank, quiet_rank)
+
+    def test_sorted_feeds(self):
+        old_hit = self.post("old hit", age=timedelta(days=3))
+        self.vote(old_hit, 1, 1, 1, 1)
+        fresh = self.post("fresh")
+        split = self.post("split", age=timedelta(hours=1))
+        self.vote(split, 1, -1, 1, -1)
+        self.recompute()
+
+        def titles(**params):
+            response = self.client.get(reverse("home"), params)
+            return [post.title for post in response.context["posts"]]
+
+        self.assertEqual(titles(sort="hot"), ["fresh", "split", "old hit"])
+        self.assertEqual(
+            titles(sort="top", t="all"), ["old hit", "split", "fresh"]
+        )
+        self.assertEqual(titles(sort="top", t="day"), ["split", "fresh"])
+        self.assertEqual(titles(sort="controversial")[0], "split")
+        self.assertEqual(titles(sort="bogus")[0], "fresh")  # newest
+
+        # Keyset pages over a rank column
+        posts = Post.objects.all()
+        page, cursor = paginate_feed(posts, page_size=2, sort="hot")
+        rest, end = paginate_feed(posts, cursor, page_size=2, sort="hot")
+        self.assertEqual(
+            [p.pk for p in page + rest], [fresh.pk, split.pk, old_hit.pk]
+        )
+        self.assertIsNone(end)
+
+
+class ExplainQueriesTests(TestCase):
+    """Canonical hot-path queries are index-backed on this database."""
+
+    def test_no_sequential_scans(self):
+        author = User.objects.create_user("author", password="pw")
+        category = Category.objects.create(name="News")
+        for i in range(30):
+            post = Post.objects.create(
+                author=author, category=category, title=f"{i}", content="x"
+            )
+            Comment.objects.create(post=post, author=author, content="c")
+            post.apply_vote(author, 1)
+
+        out = StringIO()
+        # Without statistics SQLite plans as for a large table; ANALYZE
+        # on 30 rows would rightly prefer scanning the one-row tables.
+        call_command(
+            "explain_queries", min_posts=0, no_analyze=True, stdout=out
+        )
+        self.assertIn("No sequential scans", out.getvalue())
+
+
+@override_settings(STORAGES=TEST_STORAGES, VOTE_FLUSH_INTERVAL=0)
+class SeedAndBenchmarkTests(TestCase):
+    """Seeded data is consistent; the benchmark writes a full report."""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            "seed",
+            users=20,
+            categories=3,
+            posts=40,
+            comments=150,
+            votes=300,
+            batch_size=64,
+            random_seed=1,
+            stdout=StringIO(),
+        )
+
+    def setUp(self):
+        clear_caches()
+
+    def test_seeded_data_is_consistent(self):
+        self.assertEqual(Post.objects.count(), 40)
+        self.assertEqual(Vote.objects.count(), 300)
+
+        out = StringIO()
+        call_command("rebuild_vote_counters", check=True, stdout=out)
+        self.assertIn("0 out of sync", out.getvalue())
+        self.assertFalse(Post.objects.filter(rank_dirty=True).exists())
+
+        comments = Comment.objects.select_related("parent")
+        self.assertTrue(comments.filter(parent__isnull=False).exists())
+        for comment in comments:
+            prefix = comment.parent.path if comment.parent else ""
+            self.assertEqual(
+                comment.path, prefix + str(comment.pk).zfill(Comment.PATH_STEP)
+            )
+            if comment.parent:
+                self.assertEqual(comment.depth, comment.parent.depth + 1)
+                self.assertGreaterEqual(
+                    comment.created_at, comment.parent.created_at
+                )
+
+        for post in Post.objects.all():
+            self.assertEqual(post.comment_count, post.comments.count())
+
+    def test_benchmark_report(self):
+        self.addCleanup(clear_vote_buffer)  # unflushed votes
+        with tempfile.NamedTemporaryFile(suffix=".json") as report:
+            call_command(
+                "benchmark",
+                requests=3,
+                output=report.name,
+                stdout=StringIO(),
+            )
+            data = json.load(report)
+
+        self.assertEqual(data["dataset"]["posts"], 40)
+        self.assertEqual(
+            set(data["scenarios"]),
+            {
+                "home",
+                "home_member",
+                "home_hot",
+                "post_detail",
+                "post_detail_member",
+                "vote_post",
+                "ajax_search",
+                "profile_page",
+            },
+        )
+        for row in data["scenarios"].values():
+            self.assertEqual(set(row["statuses"]), {"200"})
+            self.assertLessEqual(row["p50_ms"], row["p99_ms"])
+
+
+@override_settings(
+    STORAGES=TEST_STORAGES,
+    INSTRUMENTATION_SAMPLE_RATE=1,
+    METRICS_TOKEN="secret",
+)
+class InstrumentationTests(TestCase):
+    """Sampled requests report timings per view; N+1 patterns stand out."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="pw")
+        cls.post = Post.objects.create(
+            author=cls.author, title="Timed", content="x"
+        )
+
+    def setUp(self):
+        clear_caches()
+        instrumentation.REGISTRY.reset()
+
+    def test_server_timing_and_metrics(self):
+        url = reverse("post_detail", args=[self.post.id])
+        first = self.client.get(url)["Server-Timing"]
+        self.assertRegex(first, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn("tpl;dur=", first)
+        self.assertIn('cache-pages;desc="0 hit, 1 miss"', first)
+
+        second = self.client.get(url)["Server-Timing"]
+        self.assertIn('db;dur=0.0;desc="0 queries"', second)
+        self.assertIn('cache-pages;desc="1 hit, 0 miss"', second)
+
+        metrics_url = reverse("metrics")
+        self.assertEqual(self.client.get(metrics_url).status_code, 403)
+        body = self.client.get(
+            metrics_url, HTTP_AUTHORIZATION="Bearer secret"
+        ).content.decode()
+        self.assertIn(
+            'crow_request_duration_seconds_count{view="post_detail"} 2', body
+        )
+        self.assertIn(
+            'crow_cache_requests_total{cache="pages",result="hit"} 1', body
+        )
+
+    async def test_async_requests_count_queries(self):
+        response = await self.async_client.get(
+            reverse("post_detail", args=[self.post.id])
+        )
+        self.assertRegex(
+            response["Server-Timing"], r'db;dur=[\d.]+;desc="[1-9]\d* queries"'
+        )
+
+    def test_repeated_queries_detected(self):
+        sample = instrumentation.Sample()
+        with connection.execute_wrapper(sample.execute):
+            for post in Post.objects.all():
+                for _ in range(3):
+                    list(User.objects.filter(pk=post.author_id))
+        self.assertEqual(sample.queries, 4)
+        self.assertEqual(list(sample.repeated_queries().values()), [3])
+
+    @override_settings(INSTRUMENTATION_SAMPLE_RATE=0)
+    def test_disabled_costs_nothing(self):
+        response = self.client.get(reverse("home"))
+        self.assertNotIn("Server-Timing", response)
+
+
+@override_settings(
+    STORAGES=TEST_STORAGES,
+    MEDIA_BACKEND="posts.storage.LocalBackend",
+    MEDIA_UPLOAD_WORKERS=0,
+    MEDIA_UPLOAD_RETRY_DELAY=0,
+)
+class UploadPipelineTests(TestCase):
+    """create_post stages media; a worker uploads it and flips its state."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="pw")
+
+    def setUp(self):
+        clear_caches()
+        staging = tempfile.TemporaryDirectory()
+        self.addCleanup(staging.cleanup)
+        override = override_settings(MEDIA_STAGING_DIR=staging.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client.force_login(self.author)
+
+    def create(self):
+        png = io.BytesIO()
+        storage.Image.new("RGB", (1000, 500)).save(png, format="PNG")
+        image = SimpleUploadedFile(
+            "cat.png", png.getvalue(), content_type="image/png"
+        )
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(
+                reverse("create_post"),
+                {"title": "Pic", "content": "x", "images": [image]},
+            )
+        media = PostMedia.objects.get()
+        self.assertEqual(media.status, PostMedia.PENDING)
+        self.assertTrue(os.path.exists(media.staged_path))
+
+        # Pending media doesn't render; the card says it's processing
+        page = self.client.get(reverse("home")).content.decode()
+        self.assertIn("1 upload processing", page)
+        return media, callbacks
+
+    def test_upload_marks_ready(self):
+        media, callbacks = self.create()
+        for callback in callbacks:
+            callback()
+
+        media.refresh_from_db()
+        self.assertEqual(media.status, PostMedia.READY)
+        self.assertEqual(media.file.resource_type, "image")
+        self.assertEqual(media.staged_path, "")
+        self.assertEqual(list(media.post.ready_media()), [media])
+        page = self.client.get(reverse("home")).content.decode()
+        self.assertNotIn("processing", page)
+
+        # Renditions no wider than the original, with its box reserved
+        self.assertEqual((media.width, media.height), (1000, 500))
+        self.assertEqual(media.mime_type, "image/png")
+        self.assertGreater(media.file_size, 0)
+        self.assertEqual(
+            media.srcset(),
+            f"{media.thumb_url()} 320w, {media.card_url()} 720w, "
+            f"{media.url()} 1000w",
+        )
+        self.assertRegex(media.thumb_url(), r"cat\w*-320w\.png$")
+        self.assertIn('srcset="{}"'.format(media.srcset()), page)
+        self.assertIn('width="1000" height="500"', page)
+
+    def test_retries_then_fails(self):
+        media, callbacks = self.create()
+        with mock.patch.object(
+            storage.LocalBackend, "upload", side_effect=OSError("down")
+        ) as upload, self.assertLogs("posts.uploads", "WARNING"):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(upload.call_count, 3)
+
+        media.refresh_from_db()
+        self.assertEqual(media.status, PostMedia.FAILED)
+        self.assertTrue(os.path.exists(media.staged_path))
+
+        # The staged file is kept for a retry
+        call_command(
+            "process_uploads",
+            retry_failed=True,
+            older_than=-1,
+            stdout=StringIO(),
+        )
+        media.refresh_from_db()
+        self.assertEqual(media.status, PostMedia.READY)
+
+    def test_interrupted_claim_is_requeued(self):
+        media, callbacks = self.create()
+        PostMedia.objects.filter(pk=media.pk).update(
+            status=PostMedia.PROCESSING, claimed_at=timezone.now()
+        )
+        for callback in callbacks:
+            callback()  # claimed elsewhere: left alone
+        media.refresh_from_db()
+        self.assertEqual(media.status, PostMedia.PROCESSING)
+        page = self.client.get(reverse("home")).content.decode()
+        self.assertIn("1 upload processing", page)
+
+        call_command("process_uploads", older_than=-1, stdout=StringIO())
+        media.refresh_from_db()
+        self.assertEqual(media.status, PostMedia.READY)
+
+    def test_media_deleted_during_upload(self):
+        media, callbacks = self.create()
+        upload = storage.LocalBackend.upload
+
+        def upload_then_delete(backend, path, name):
+            resource = upload(backend, path, name)
+            PostMedia.objects.filter(pk=media.pk).delete()
+            return resource
+
+        with mock.patch.object(
+            storage.LocalBackend, "upload", upload_then_delete
+        ), mock.patch.object(storage.LocalBackend, "delete") as delete:
+            for callback in callbacks:
+                callback()
+        self.assertFalse(PostMedia.objects.exists())
+        self.assertEqual(delete.call_count, 1)  # no orphaned file
+
+    def test_backfill_and_cover_prefetch(self):
+        post = Post.objects.create(author=self.author, title="Old", content="")
+        PostMedia.objects.create(
+            post=post, file="video/upload/v1/clip.mp4", position=1
+        )
+        cover = PostMedia.objects.create(
+            post=post, file="image/upload/v1/cat.png", position=0
+        )
+        call_command("backfill_media", stdout=StringIO())
+        cover.refresh_from_db()
+        self.assertEqual(cover.resource_type, "image")
+        self.assertEqual(cover.mime_type, "image/png")
+
+        with self.assertNumQueries(2):  # posts, then one cover per post
+            posts = list(feed_queryset(media="cover"))
+            self.assertEqual(posts[0].cover_media(), cover)
+
+
+@override_settings(
+    STORAGES=TEST_STORAGES, PROFILE_PAGE_SIZE=2, VOTE_FLUSH_INTERVAL=0
+)
+class UserStatsTests(TestCase):
+    """UserStats follow posts, comments and votes without recounting."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="pw")
+        cls.voter = User.objects.create_user("voter", password="pw")
+
+    def setUp(self):
+        clear_caches()
+        clear_vote_buffer()
+
+    def stats(self):
+        return UserStats.objects.values_list(
+            "post_count", "comment_count", "karma"
+        ).get(user=self.author)
+
+    def test_incremental_counters(self):
+        first, second = (
+            Post.objects.create(author=self.author, title=t, content="x")
+            for t in ("One", "Two")
+        )
+        Comment.objects.create(post=first, author=self.author, content="c")
+        first.apply_vote(self.voter, 1)
+        votebuffer.record_vote(self.voter.pk, second.pk, -1)
+        votebuffer.record_vote(self.author.pk, second.pk, -1)
+        votebuffer.flush()
+        self.assertEqual(self.stats(), (2, 1, -1))
+
+        second.delete()
+        self.assertEqual(self.stats(), (1, 1, 1))
+
+        out = StringIO()
+        call_command("rebuild_user_stats", check=True, stdout=out)
+        self.assertIn("0 out of sync", out.getvalue())
+
+    def test_profile_grid_pages(self):
+        for i in range(3):
+            Post.objects.create(author=self.author, title=f"P{i}", content="")
+        url = reverse("profile_page", args=[self.author.username])
+
+        response = self.client.get(url)
+        self.assertContains(response, "<strong>3</strong> posts", html=True)
+        self.assertEqual(len(response.context["posts"]), 2)
+        cursor = response.context["next_cursor"]
+        self.assertIsNotNone(cursor)
+
+        response = self.client.get(url, {"cursor": cursor})
+        self.assertEqual(
+            [post.title for post in response.context["posts"]], ["P0"]
+        )
+        self.assertIsNone(response.context["next_cursor"])
+
+
+@override_settings(LIVE_UPDATES=True)
+class LiveUpdatesTests(TestCase):
+    """Changes reach event streams as one message per post per tick."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="pw")
+        cls.voters = [
+            User.objects.create_user(f"voter{i}", password="pw")
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        live._changed.clear()
+        ticker = mock.patch.object(live, "_start_ticker")
+        ticker.start()
+        self.addCleanup(ticker.stop)
+
+    def test_tick_coalesces_changes(self):
+        post = Post.objects.create(author=self.author, title="Hot")
+        with self.captureOnCommitCallbacks(execute=True):
+            for voter in self.voters:
+                post.apply_vote(voter, 1)
+            comment = Comment.objects.create(
+                post=post, author=self.author, content="Live!"
+            )
+
+        published = []
+        with mock.patch.object(
+            live.LocalBroker,
+            "publish",
+            lambda broker, post_id, message: published.append(message),
+        ):
+            self.assertEqual(live.tick(), 1)
+            self.assertEqual(live.tick(), 0)
+
+        [message] = published
+        self.assertEqual(message["score"], 3)
+        self.assertEqual(message["comment_count"], 1)
+        [pushed] = message["comments"]
+        self.assertEqual((pushed["id"], pushed["parent"]), (comment.pk, None))
+        self.assertIn("Live!", pushed["html"])
+
+    async def test_stream_delivers_published_messages(self):
+        events = live.stream([1])
+        self.assertEqual(await anext(events), "retry: 5000\n\n")
+        pending = asyncio.ensure_future(anext(events))
+        await asyncio.sleep(0)  # let the stream subscribe
+        live.get_broker().publish(1, {"post": 1})
+        self.assertEqual(await pending, 'data: {"post": 1}\n\n')
+        await events.aclose()
+
+
+@override_settings(STORAGES=TEST_STORAGES, TIMELINE_FANOUT_LIMIT=1)
+class TimelineTests(TestCase):
+    """Timelines: small sources pushed on write, big ones pulled on read."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user("reader", password="pw")
+        cls.author = User.objects.create_user("author", password="pw")
+        cls.star = User.objects.create_user("star", password="pw")
+        cls.fan = User.objects.create_user("fan", password="pw")
+        cls.news = Category.objects.create(name="News")
+
+    def setUp(self):
+        clear_caches()
+
+    def publish(self, author, title, category=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(
+                author=author, title=title, content="x", category=category
+            )
+
+    def entries(self, user):
+        return set(
+            TimelineEntry.objects.filter(user=user).values_list(
+                "post__title", flat=True
+            )
+        )
+
+    def test_fan_out_on_write_and_read(self):
+        old = self.publish(self.author, "Before follow")
+        self.assertTrue(timeline.follow(self.reader, user=self.author))
+        self.assertFalse(timeline.follow(self.reader, user=self.author))
+        timeline.follow(self.reader, user=self.star)
+        timeline.follow(self.fan, user=self.star)  # star: 2 > limit
+        timeline.follow(self.reader, category=self.news)
+        self.assertEqual(
+            UserStats.objects.get(user=self.star).follower_count, 2
+        )
+
+        own = self.publish(self.reader, "Mine")
+        pushed = self.publish(self.author, "Pushed")
+        pulled = self.publish(self.star, "Pulled")
+        by_category = self.publish(self.fan, "In News", self.news)
+        self.publish(self.fan, "Unfollowed")
+
+        self.assertEqual(
+            self.entries(self.reader),
+            {"Before follow", "Mine", "Pushed", "In News"},
+        )
+
+        posts, cursor = timeline.paginate_timeline(self.reader, page_size=3)
+        self.assertEqual(posts, [by_category, pulled, pushed])
+        posts, cursor = timeline.paginate_timeline(
+            self.reader, cursor, page_size=3
+        )
+        self.assertEqual(posts, [own, old])
+        self.assertIsNone(cursor)
+
+        self.assertTrue(timeline.unfollow(self.reader, user=self.author))
+        self.assertEqual(self.entries(self.reader), {"Mine", "In News"})
+
+        call_command("rebuild_timelines", stdout=StringIO())
+        self.assertEqual(self.entries(self.reader), {"Mine", "In News"})
+
+    def test_pulled_posts_kept_when_back_within_limit(self):
+        timeline.follow(self.reader, user=self.star)
+        timeline.follow(self.fan, user=self.star)
+        self.publish(self.star, "Pulled")
+        self.assertEqual(self.entries(self.reader), set())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            timeline.unfollow(self.fan, user=self.star)
+        self.assertEqual(self.entries(self.reader), {"Pulled"})
+
+    def test_author_without_stats_row(self):
+        timeline.follow(self.reader, user=self.author)
+        UserStats.objects.filter(user=self.author).delete()
+        self.publish(self.author, "Pushed")
+        self.assertEqual(self.entries(self.reader), {"Pushed"})
+
+        call_command("rebuild_timelines", stdout=StringIO())
+        self.assertEqual(self.entries(self.reader), {"Pushed"})
+
+    def test_following_tab(self):
+        timeline.follow(self.reader, user=self.author)
+        self.publish(self.author, "Followed")
+        self.publish(self.fan, "Not followed")
+
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse("home"), {"sort": "following"})
+        self.assertEqual(
+            [post.title for post in response.context["posts"]],
+            ["Followed"],
+        )
+
+        self.client.post(reverse("follow_user", args=["author"]))
+        self.assertFalse(
+            Follow.objects.filter(follower=self.reader).exists()
+        )
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class CategoryDirectoryTests(TestCase):
+    """Categories are resolved and searched from the in-process copy."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author", password="pw")
+        cls.tech = Category.objects.create(name="Tech")
+        cls.tennis = Category.objects.create(name="tennis")
+        Category.objects.create(name="Food")
+
+    def setUp(self):
+        clear_caches()
+
+    def test_search_resolve_and_counts(self):
+        directory = categories.get_directory()
+        self.assertEqual(directory.search("TE", 6), ["Tech", "tennis"])
+        self.assertEqual(directory.search("te", 1), ["Tech"])
+        self.assertEqual(directory.search("x", 6), [])
+
+        with self.assertNumQueries(1):  # one lookup by name
+            self.assertEqual(categories.resolve("Tech"), self.tech.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(
+                author=self.author, title="P", content="x", category=self.tech
+            )
+        self.assertEqual(categories.get_directory().counts[self.tech.pk], 1)
+
+        # Rebuilt from the stored counters, which bulk deletes move too
+        categories.invalidate()
+        with self.captureOnCommitCallbacks(execute=True):
+            maintenance.delete_posts([post.pk])
+        self.tech.refresh_from_db()
+        self.assertEqual(self.tech.post_count, 0)
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                categories.get_directory().counts[self.tech.pk], 0
+            )
+
+        new_id = categories.resolve("Travel")
+        self.assertEqual(Category.objects.get(pk=new_id).name, "Travel")
+        self.assertEqual(categories.get_directory().ids["Travel"], new_id)
+
+    def test_resolve_after_change_in_another_process(self):
+        categories.get_directory()
+        # update() sends no signal, like a rename in another worker
+        Category.objects.filter(pk=self.tech.pk).update(name="Technology")
+
+        tech_id = categories.resolve("Tech")
+        self.assertNotEqual(tech_id, self.tech.pk)
+        self.assertEqual(Category.objects.get(pk=tech_id).name, "Tech")
+        self.assertEqual(categories.get_directory().ids["Tech"], tech_id)
+
+    def test_category_feed(self):
+        for i in range(3):
+            Post.objects.create(
+                author=self.author,
+                title=f"Tech {i}",
+                content="x",
+                category=self.tech,
+            )
+        Post.objects.create(
+            author=self.author, title="Other", content="x", category=None
+        )
+
+        with override_settings(FEED_PAGE_SIZE=2):
+            response = self.client.get(
+                reverse("category_feed", args=[self.tech.pk])
+            )
+            self.assertEqual(
+                [post.title for post in response.context["posts"]],
+                ["Tech 2", "Tech 1"],
+            )
+            self.assertEqual(response.context["category_posts"], 3)
+
+            data = self.client.get(
+                reverse("feed_page"),
+                {
+                    "category": self.tech.pk,
+                    "cursor": response.context["next_cursor"],
+                },
+            ).json()
+        self.assertIn("Tech 0", data["html"])
+        self.assertNotIn("Other", data["html"])
+        self.assertIsNone(data["next_cursor"])
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class AdminChangelistTests(TestCase):
+    """Changelist queries don't grow with the rows shown."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", password="pw")
+        cls.news = Category.objects.create(name="News")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_posts(self, n):
+        for _ in range(n):
+            i = User.objects.count()
+            author = User.objects.create_user(f"user{i}")
+            post = Post.objects.create(
+                author=author, title=f"P{i}", content="x", category=self.news
+            )
+            Vote.objects.create(user=author, post=post, value=1)
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_query_count_is_constant(self):
+        for name in ("post", "vote", "category"):
+            url = reverse(f"admin:posts_{name}_changelist")
+            self.add_posts(2)
+            few = self.queries(url)
+            self.add_posts(5)
+            self.assertEqual(self.queries(url), few, name)
+
+    def test_author_filter(self):
+        self.add_posts(2)
+        author = User.objects.get(username="user1")
+        response = self.client.get(
+            reverse("admin:posts_post_changelist"), {"author": author.pk}
+        )
+        self.assertEqual(
+            [post.author for post in response.context["cl"].result_list],
+            [author],
+        )
+
+
+@override_settings(VOTE_FLUSH_INTERVAL=0)
+class MaintenanceCommandTests(TestCase):
+    """Streaming purge / archive keep counters and the index in step."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        cls.reader = User.objects.create_user("reader")
+        cls.old = []
+        for i in range(3):
+            post = Post.objects.create(
+                author=cls.author, title=f"Old{i}", content="archived"
+            )
+            parent = Comment.objects.create(
+                post=post, author=cls.reader, content="c"
+            )
+            Comment.objects.create(
+                post=post, author=cls.author, parent=parent, content="r"
+            )
+            post.apply_vote(cls.reader, 1)
+            cls.old.append(post.pk)
+        Post.objects.filter(pk__in=cls.old).update(
+            created_at=timezone.now() - timedelta(days=60)
+        )
+        cls.new = Post.objects.create(
+            author=cls.author, title="New", content="kept"
+        )
+
+    def setUp(self):
+        clear_caches()
+        state_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(state_dir.cleanup)
+        self.dir = state_dir.name
+        patcher = override_settings(MAINTENANCE_STATE_DIR=self.dir)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+    def assertStatsInSync(self):
+        out = StringIO()
+        call_command("rebuild_user_stats", check=True, stdout=out)
+        self.assertIn("0 out of sync", out.getvalue())
+
+    def test_archive_and_delete(self):
+        output = os.path.join(self.dir, "archive.jsonl.gz")
+        call_command(
+            "archive_posts",
+            older_than=30,
+            output=output,
+            delete=True,
+            chunk_size=2,
+            stdout=StringIO(),
+        )
+
+        with gzip.open(output, "rt") as fh:
+            records = [json.loads(line) for line in fh]
+        self.assertEqual([r["id"] for r in records], self.old)
+        self.assertEqual(records[0]["author"], "author")
+        self.assertEqual(records[0]["score"], 1)
+        self.assertEqual(
+            [c["depth"] for c in records[0]["comments"]], [0, 1]
+        )
+
+        self.assertEqual(list(Post.objects.all()), [self.new])
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Vote.objects.exists())
+        self.assertEqual(get_search_backend().search("archived", 0, 10), [])
+        self.assertStatsInSync()
+
+    def test_archive_keeps_existing_output(self):
+        output = os.path.join(self.dir, "archive.jsonl.gz")
+        with open(output, "wb") as fh:
+            fh.write(b"earlier run")
+        with self.assertRaisesMessage(CommandError, "--overwrite"):
+            call_command(
+                "archive_posts",
+                older_than=30,
+                output=output,
+                stdout=StringIO(),
+            )
+        with open(output, "rb") as fh:
+            self.assertEqual(fh.read(), b"earlier run")
+
+        call_command(
+            "archive_posts",
+            older_than=30,
+            output=output,
+            overwrite=True,
+            stdout=StringIO(),
+        )
+        with gzip.open(output, "rt") as fh:
+            self.assertEqual(len(fh.readlines()), 3)
+
+    @override_settings(
+        STORAGES=TEST_STORAGES, MEDIA_BACKEND="posts.storage.LocalBackend"
+    )
+    def test_purge_deletes_stored_media(self):
+        path = os.path.join(self.dir, "notes.txt")
+        with open(path, "w") as fh:
+            fh.write("x")
+        backend = storage.get_media_backend()
+        resource = backend.upload(path, "notes.txt")
+        PostMedia.objects.create(post_id=self.old[0], file=resource)
+        stored = backend.stored_name(resource)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("purge_posts", older_than=30, stdout=StringIO())
+        self.assertFalse(PostMedia.objects.exists())
+        self.assertFalse(default_storage.exists(stored))
+
+    @override_settings(
+        STORAGES=TEST_STORAGES, MEDIA_BACKEND="posts.storage.LocalBackend"
+    )
+    def test_clear_media_keeps_files_unless_asked(self):
+        path = os.path.join(self.dir, "notes.txt")
+        with open(path, "w") as fh:
+            fh.write("x")
+        backend = storage.get_media_backend()
+
+        def clear(**options):
+            resource = backend.upload(path, "notes.txt")
+            PostMedia.objects.create(post_id=self.old[0], file=resource)
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command("clear_media", stdout=StringIO(), **options)
+            self.assertFalse(PostMedia.objects.exists())
+            return default_storage.exists(backend.stored_name(resource))
+
+        self.assertTrue(clear())
+        self.assertFalse(clear(delete_files=True))
+
+    def test_purge_resumes_after_interruption(self):
+        delete_posts = maintenance.delete_posts
+        calls = []
+
+        def crash_second_chunk(pks):
+            calls.append(pks)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return delete_posts(pks)
+
+        with mock.patch.object(
+            maintenance, "delete_posts", crash_second_chunk
+        ):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command(
+                    "purge_posts",
+                    author="author",
+                    older_than=30,
+                    chunk_size=1,
+                    stdout=StringIO(),
+                )
+        self.assertEqual(Post.objects.count(), 3)
+
+        out = StringIO()
+        call_command(
+            "purge_posts",
+            author="author",
+            older_than=30,
+            chunk_size=1,
+            resume=True,
+            stdout=out,
+        )
+        self.assertIn(f"Resuming after post {self.old[0]}", out.getvalue())
+        self.assertEqual(list(Post.objects.all()), [self.new])
+        self.assertEqual(os.listdir(self.dir), [])
+        self.assertStatsInSync()
+
+
+@override_settings(
+    STORAGES=TEST_STORAGES,
+    VOTE_FLUSH_INTERVAL=0,
+    ARCHIVE_AFTER_DAYS=30,
+    ARCHIVE_INACTIVE_DAYS=7,
+)
+class ColdArchiveTests(TestCase):
+    """Cold posts leave the hot tables but stay readable and restorable."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        cls.reader = User.objects.create_user("reader")
+        cls.news = Category.objects.create(name="News")
+        cls.cold, cls.active = (
+            Post.objects.create(
+                author=cls.author, title=title, content="x", category=cls.news
+            )
+            for title in ("Cold", "Active")
+        )
+        for post in (cls.cold, cls.active):
+            parent = Comment.objects.create(
+                post=post, author=cls.reader, content="old comment"
+            )
+            Comment.objects.create(
+                post=post, author=cls.author, parent=parent, content="reply"
+            )
+            post.apply_vote(cls.reader, 1)
+        Post.objects.update(
+            created_at=timezone.now() - timedelta(days=60),
+            last_vote_at=timezone.now() - timedelta(days=40),
+        )
+        Comment.objects.update(created_at=timezone.now() - timedelta(days=40))
+        Comment.objects.create(
+            post=cls.active, author=cls.reader, content="recent"
+        )
+
+    def setUp(self):
+        clear_caches()
+
+    def test_archive_read_through_and_restore(self):
+        with tempfile.TemporaryDirectory() as state_dir:
+            with self.settings(MAINTENANCE_STATE_DIR=state_dir):
+                call_command("archive_cold_posts", stdout=StringIO())
+
+        self.assertFalse(Post.objects.filter(pk=self.cold.pk).exists())
+        self.assertTrue(Post.objects.filter(pk=self.active.pk).exists())
+        self.assertEqual(Comment.objects.filter(post=self.cold.pk).count(), 0)
+
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse("post_detail", args=[self.cold.pk]))
+        self.assertContains(response, "This post is archived")
+        self.assertContains(response, "old comment")
+        self.assertContains(response, "reply-card")
+        self.assertNotContains(response, "vote-btn")
+        self.assertNotContains(response, "reply-toggle")
+        self.assertEqual(
+            self.client.get(reverse("post_detail", args=[999])).status_code,
+            404,
+        )
+
+        Follow.objects.create(follower=self.reader, user=self.author)
+        call_command("restore_posts", self.cold.pk, stdout=StringIO())
+        post = Post.objects.get(pk=self.cold.pk)
+        self.assertEqual(
+            (post.score, post.comment_count, post.category_id),
+            (1, 2, self.news.pk),
+        )
+        self.assertEqual(post.user_vote(self.reader), 1)
+        self.assertEqual(
+            [c.depth for c in Comment.objects.filter(post=post)], [0, 1]
+        )
+        self.assertIn(post.pk, get_search_backend().search("cold", 0, 10))
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertFalse(ArchivedPost.objects.exists())
+
+        out = StringIO()
+        call_command("rebuild_user_stats", check=True, stdout=out)
+        self.assertIn("0 out of sync", out.getvalue())
+
+    def test_post_active_since_picked_is_not_archived(self):
+        Comment.objects.create(post=self.cold, author=self.reader, content="!")
+        self.assertEqual(archive.archive([self.cold.pk]), 0)
+        self.assertTrue(Post.objects.filter(pk=self.cold.pk).exists())
+        self.assertFalse(ArchivedPost.objects.exists())
+
+    def test_recent_vote_keeps_post_hot(self):
+        self.cold.apply_vote(self.author, 1)
+        self.assertEqual(archive.archive([self.cold.pk]), 0)
+        self.assertTrue(Post.objects.filter(pk=self.cold.pk).exists())
+
+    @override_settings(COMMENT_PAGE_SIZE=1, COMMENT_TREE_MAX_REPLIES=1)
+    def test_archived_thread_is_paged(self):
+        first = Comment.objects.get(post=self.cold, depth=0)
+        for text in ("second reply", "later comment"):
+            Comment.objects.create(
+                post=self.cold,
+                author=self.reader,
+                content=text,
+                parent=first if text == "second reply" else None,
+            )
+        Comment.objects.filter(post=self.cold).update(
+            created_at=timezone.now() - timedelta(days=40)
+        )
+        self.assertEqual(archive.archive([self.cold.pk]), 1)
+
+        url = reverse("post_detail", args=[self.cold.pk])
+        response = self.client.get(url)
+        self.assertContains(response, "old comment")
+        self.assertNotContains(response, "later comment")
+        self.assertContains(response, "Load 1 more")
+        self.assertNotContains(response, "data-url")
+
+        response = self.client.get(
+            url, {"cursor": response.context["next_cursor"]}
+        )
+        self.assertContains(response, "later comment")
+        self.assertNotContains(response, "old comment")
+
+        # The thread page pages the replies the same way
+        thread = {"thread": first.pk}
+        response = self.client.get(url, thread)
+        self.assertContains(response, "Back to all comments")
+        self.assertNotContains(response, "second reply")
+        response = self.client.get(
+            url, {**thread, "cursor": response.context["next_cursor"]}
+        )
+        self.assertContains(response, "second reply")
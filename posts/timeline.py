@@ -0,0 +1,243 @@
+"""
+Per-user home timelines (home ?sort=following): the user's own posts
+plus those of the users and categories they follow, newest first.
+
+Fan-out on write: a new post adds one TimelineEntry per follower of
+its author and of its category, so reading a page is one range scan of
+the follower's timeline_user_idx.
+
+Fan-out on read: authors and categories with more than
+TIMELINE_FANOUT_LIMIT followers are skipped on write (one post would
+write that many rows). Their followers' pages merge in their recent
+posts at read time, through the post_author_feed_idx /
+post_category_feed_idx indexes. When such a source drops back to the
+limit, materialize() writes its recent posts into its followers'
+timelines (posts.signals).
+
+`manage.py rebuild_timelines` rebuilds timelines from the follows (e.g.
+after bulk imports, which send no signals) and trims them to
+TIMELINE_MAX_LENGTH entries.
+"""
+
+from itertools import islice
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from .feed import decode_cursor, encode_cursor, feed_queryset
+from .models import Category, Follow, Post, TimelineEntry, UserStats
+
+
+def fans_out(follower_count: int) -> bool:
+    """Whether a source with this many followers is fanned out on write."""
+    return follower_count <= settings.TIMELINE_FANOUT_LIMIT
+
+
+# -----------------------------
+# Fan-out on Write
+# -----------------------------
+def fan_out(post) -> int:
+    """Add `post` to its readers' timelines. Returns rows written."""
+    readers = {post.author_id}
+
+    # No UserStats row yet (until rebuild_user_stats): count it as 0
+    author_followers = (
+        UserStats.objects.filter(user_id=post.author_id)
+        .values_list("follower_count", flat=True)
+        .first()
+    )
+    if fans_out(author_followers or 0):
+        readers.update(
+            Follow.objects.filter(user_id=post.author_id).values_list(
+                "follower_id", flat=True
+            )
+        )
+
+    if post.category_id:
+        category_followers = (
+            Category.objects.filter(pk=post.category_id)
+            .values_list("follower_count", flat=True)
+            .first()
+        )
+        if fans_out(category_followers or 0):
+            readers.update(
+                Follow.objects.filter(
+                    category_id=post.category_id
+                ).values_list("follower_id", flat=True)
+            )
+
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(
+                user_id=user_id, post_id=post.pk, created_at=post.created_at
+            )
+            for user_id in readers
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    return len(readers)
+
+
+def materialize(*, user_id=None, category_id=None) -> int:
+    """
+    Copy a source's recent posts into its followers' timelines, once
+    it is back within TIMELINE_FANOUT_LIMIT: its posts were read at
+    read time until now, and pulled_sources() stops merging them in.
+    Returns rows written.
+    """
+    if user_id is not None:
+        follows = Follow.objects.filter(user_id=user_id)
+        posts = Post.objects.filter(author_id=user_id)
+    else:
+        follows = Follow.objects.filter(category_id=category_id)
+        posts = Post.objects.filter(category_id=category_id)
+    recent = list(
+        posts.order_by("-created_at", "-id").values_list(
+            "pk", "created_at"
+        )[: settings.TIMELINE_BACKFILL]
+    )
+    entries = (
+        TimelineEntry(user_id=follower_id, post_id=pk, created_at=created)
+        for follower_id in follows.values_list(
+            "follower_id", flat=True
+        ).iterator()
+        for pk, created in recent
+    )
+    written = 0
+    while batch := list(islice(entries, 1000)):
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+        written += len(batch)
+    return written
+
+
+# -----------------------------
+# Following
+# -----------------------------
+def follow(follower, *, user=None, category=None) -> bool:
+    """
+    Follow a user or a category and copy its recent posts into the
+    follower's timeline. Returns False if already followed.
+    """
+    try:
+        with transaction.atomic():
+            Follow.objects.create(
+                follower=follower, user=user, category=category
+            )
+    except IntegrityError:
+        return False
+
+    if user is not None:
+        source = UserStats.objects.filter(user=user)
+        posts = Post.objects.filter(author=user)
+    else:
+        source = Category.objects.filter(pk=category.pk)
+        posts = Post.objects.filter(category=category)
+
+    followers = source.values_list("follower_count", flat=True).first()
+    if fans_out(followers or 0):
+        recent = posts.order_by("-created_at", "-id").values_list(
+            "pk", "created_at"
+        )[: settings.TIMELINE_BACKFILL]
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(user=follower, post_id=pk, created_at=created)
+                for pk, created in recent
+            ],
+            ignore_conflicts=True,
+        )
+    return True
+
+
+def unfollow(follower, *, user=None, category=None) -> bool:
+    """
+    Stop following; drop the posts nothing else puts in the follower's
+    timeline. Returns False if not followed.
+    """
+    deleted, _ = Follow.objects.filter(
+        follower=follower, user=user, category=category
+    ).delete()
+    if not deleted:
+        return False
+
+    entries = TimelineEntry.objects.filter(user=follower)
+    if user is not None:
+        entries = entries.filter(post__author=user).exclude(
+            post__category__followers__follower=follower
+        )
+    else:
+        entries = entries.filter(post__category=category).exclude(
+            Q(post__author=follower)
+            | Q(post__author__followers__follower=follower)
+        )
+    entries.delete()
+    return True
+
+
+# -----------------------------
+# Reading
+# -----------------------------
+def pulled_sources(user):
+    """
+    Q for the posts of `user`'s followed sources that are too big to
+    fan out (read at read time instead), or None.
+    """
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    user_ids, category_ids = [], []
+    for user_id, category_id in Follow.objects.filter(
+        Q(user__stats__follower_count__gt=limit)
+        | Q(category__follower_count__gt=limit),
+        follower=user,
+    ).values_list("user_id", "category_id"):
+        if user_id:
+            user_ids.append(user_id)
+        else:
+            category_ids.append(category_id)
+
+    if not user_ids and not category_ids:
+        return None
+    return Q(author__in=user_ids) | Q(category__in=category_ids)
+
+
+def paginate_timeline(user, cursor=None, page_size=None):
+    """
+    Return (posts, next_cursor) for one page of `user`'s timeline,
+    newest first; cursors are feed cursors (posts.feed). Raises
+    InvalidCursor on a bad cursor.
+    """
+    page_size = page_size or settings.FEED_PAGE_SIZE
+
+    entries = TimelineEntry.objects.filter(user=user)
+    if cursor:
+        value, pk = decode_cursor(cursor)
+        entries = entries.filter(
+            Q(created_at__lt=value) | Q(created_at=value, post_id__lt=pk)
+        )
+    rows = set(
+        entries.order_by("-created_at", "-post_id").values_list(
+            "created_at", "post_id"
+        )[: page_size + 1]
+    )
+
+    pulled = pulled_sources(user)
+    if pulled is not None:
+        posts = Post.objects.filter(pulled)
+        if cursor:
+            posts = posts.filter(
+                Q(created_at__lt=value) | Q(created_at=value, id__lt=pk)
+            )
+        rows.update(
+            posts.order_by("-created_at", "-id").values_list(
+                "created_at", "id"
+            )[: page_size + 1]
+        )
+
+    page = sorted(rows, reverse=True)[: page_size + 1]
+    found = feed_queryset(user).in_bulk([pk for _, pk in page])
+    posts = [found[pk] for _, pk in page if pk in found]
+
+    if len(page) <= page_size:
+        return posts, None
+    posts = posts[:page_size]
+    return posts, encode_cursor(posts[-1])
@@ -0,0 +1,155 @@
+import hashlib
+import math
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+from .instrumentation import record_cache
+
+GENERATION_KEY = "typeahead:gen"
+
+
+def get_cache():
+    return caches[settings.TYPEAHEAD_CACHE]
+
+
+# -----------------------------
+# Query Result Cache
+# -----------------------------
+# Keyed on the exact normalized query: each keystroke's prefix is its
+# own entry, so a popular prefix is computed once per TTL.
+def normalize(query: str) -> str:
+    """Cache key form of a typeahead query: lowercased, single-spaced."""
+    return " ".join(query.lower().split())
+
+
+def invalidate() -> None:
+    """
+    Drop every cached typeahead result by bumping the key generation.
+    Old entries are never read again and age out of the LRU.
+    """
+    cache = get_cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, timeout=None)
+
+
+def _results_key(kind: str, query: str, generation) -> str:
+    digest = hashlib.md5(normalize(query).encode()).hexdigest()
+    return f"typeahead:{generation}:{kind}:{digest}"
+
+
+def cached_results(kind: str, query: str, compute):
+    """
+    Return compute() for (kind, query), cached for
+    settings.TYPEAHEAD_CACHE_TTL seconds under the current generation.
+    """
+    cache = get_cache()
+    generation = cache.get_or_set(GENERATION_KEY, 1, timeout=None)
+    key = _results_key(kind, query, generation)
+
+    results = cache.get(key)
+    record_cache("typeahead", results is not None)
+    if results is None:
+        results = compute()
+        cache.set(key, results, timeout=settings.TYPEAHEAD_CACHE_TTL)
+    return results
+
+
+async def acached_results(kind: str, query: str, compute):
+    """cached_results() for async views: `compute` is a coroutine function."""
+    cache = get_cache()
+    generation = await cache.aget_or_set(GENERATION_KEY, 1, timeout=None)
+    key = _results_key(kind, query, generation)
+
+    results = await cache.aget(key)
+    record_cache("typeahead", results is not None)
+    if results is None:
+        results = await compute()
+        await cache.aset(key, results, timeout=settings.TYPEAHEAD_CACHE_TTL)
+    return results
+
+
+# -----------------------------
+# Per-Client Token Bucket
+# -----------------------------
+def client_ip(request) -> str:
+    """
+    The client's address. Behind TRUSTED_PROXY_COUNT proxies it is the
+    X-Forwarded-For entry the outermost one appended; entries before it
+    come from the client and can be forged.
+    """
+    hops = settings.TRUSTED_PROXY_COUNT
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "")
+    if hops and forwarded:
+        addresses = [a.strip() for a in forwarded.split(",")]
+        return addresses[-min(hops, len(addresses))]
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def client_id(request, user=None) -> str:
+    user = user or request.user
+    if user.is_authenticated:
+        return f"user:{user.pk}"
+    return f"ip:{client_ip(request)}"
+
+
+def take_token(ident: str, now=None) -> float:
+    """
+    Spend one token from `ident`'s bucket.
+    Returns 0 when allowed, else seconds until a token is available.
+    """
+    capacity, rate = settings.TYPEAHEAD_THROTTLE
+    now = time.time() if now is None else now
+    cache = get_cache()
+    key = f"typeahead:bucket:{ident}"
+
+    tokens, stamp = cache.get(key, (capacity, now))
+    tokens = min(capacity, tokens + (now - stamp) * rate)
+
+    if tokens < 1:
+        cache.set(key, (tokens, now), timeout=int(capacity / rate) + 1)
+        return (1 - tokens) / rate
+
+    cache.set(key, (tokens - 1, now), timeout=int(capacity / rate) + 1)
+    return 0
+
+
+def _too_many_requests(wait: float) -> JsonResponse:
+    response = JsonResponse(
+        {"results": [], "error": "Too many requests"}, status=429
+    )
+    response["Retry-After"] = str(math.ceil(wait))
+    return response
+
+
+def throttle(view):
+    """
+    Answer 429 with Retry-After once a client drains its bucket.
+    Wraps sync and async views alike.
+    """
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            ident = client_id(request, await request.auser())
+            wait = await sync_to_async(take_token)(ident)
+            if wait:
+                return _too_many_requests(wait)
+            return await view(request, *args, **kwargs)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        wait = take_token(client_id(request))
+        if wait:
+            return _too_many_requests(wait)
+        return view(request, *args, **kwargs)
+
+    return wrapper
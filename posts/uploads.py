@@ -0,0 +1,197 @@
+"""
+Background media uploads.
+
+create_post streams each uploaded file to settings.MEDIA_STAGING_DIR
+and creates its PostMedia row as PENDING; once the transaction commits
+a thread pool uploads the files in parallel, with retries, and marks
+each row READY or FAILED. Templates only show READY media.
+
+A worker claims a row by moving it from PENDING to PROCESSING in one
+conditional UPDATE, then uploads with no transaction or lock held.
+
+Uploads are I/O bound, so threads (not processes) are enough. Staged
+files outlive the pool: `manage.py process_uploads` finishes uploads a
+restart interrupted and retries failed ones.
+"""
+
+import logging
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import PostMedia
+from .storage import get_media_backend
+
+logger = logging.getLogger(__name__)
+
+
+# -----------------------------
+# Staging
+# -----------------------------
+def stage(uploaded) -> str:
+    """Move / stream an UploadedFile into the staging dir; return its path."""
+    staging = Path(settings.MEDIA_STAGING_DIR)
+    staging.mkdir(parents=True, exist_ok=True)
+    path = staging / f"{uuid.uuid4().hex}-{Path(uploaded.name).name}"
+
+    if hasattr(uploaded, "temporary_file_path"):
+        # Large uploads already sit in a temp file: just move it.
+        shutil.move(uploaded.temporary_file_path(), path)
+    else:
+        with open(path, "wb") as fh:
+            for chunk in uploaded.chunks():
+                fh.write(chunk)
+    return str(path)
+
+
+def queue_uploads(post, files) -> list:
+    """
+    Stage `files` as PENDING media of `post` and upload them once the
+    current transaction commits. Returns the new PostMedia rows.
+    """
+    media = PostMedia.objects.bulk_create(
+        PostMedia(
+            post=post,
+            status=PostMedia.PENDING,
+            staged_path=stage(uploaded),
+            original_name=Path(uploaded.name).name[:255],
+            position=position,
+        )
+        for position, uploaded in enumerate(files)
+    )
+    ids = [item.pk for item in media]
+    if ids:
+        transaction.on_commit(lambda: submit(ids))
+    return media
+
+
+# -----------------------------
+# Worker Pool
+# -----------------------------
+_executor = None
+
+
+def submit(media_ids) -> None:
+    """Upload in the pool, or inline when MEDIA_UPLOAD_WORKERS is 0."""
+    global _executor
+
+    if not settings.MEDIA_UPLOAD_WORKERS:
+        for media_id in media_ids:
+            process(media_id)
+        return
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.MEDIA_UPLOAD_WORKERS,
+            thread_name_prefix="media-upload",
+        )
+    for media_id in media_ids:
+        _executor.submit(_run, media_id)
+
+
+def _run(media_id) -> None:
+    try:
+        process(media_id)
+    except Exception:
+        logger.exception("Upload of PostMedia %s crashed", media_id)
+    finally:
+        close_old_connections()
+
+
+def process(media_id) -> str:
+    """
+    Upload one PENDING media with retries; return its final status
+    (READY or FAILED), or "" if it was no longer pending or was
+    deleted during the upload.
+    """
+    # Committed at once: `process_uploads` requeues claims a crashed
+    # worker left behind.
+    claimed = PostMedia.objects.filter(
+        pk=media_id, status=PostMedia.PENDING
+    ).update(status=PostMedia.PROCESSING, claimed_at=timezone.now())
+    if not claimed:
+        return ""  # deleted, or handled by another worker
+    media = PostMedia.objects.filter(pk=media_id).first()
+    if media is None:
+        return ""  # deleted meanwhile
+
+    _upload(media)
+
+    staged_path = media.staged_path
+    if media.status == PostMedia.READY or not os.path.exists(staged_path):
+        media.staged_path = ""
+    if not _save(media):
+        return ""
+    if not media.staged_path and os.path.exists(staged_path):
+        os.remove(staged_path)
+    return media.status
+
+
+def _upload(media) -> None:
+    """Upload `media`'s staged file; set its file, metadata and status."""
+    delay = settings.MEDIA_UPLOAD_RETRY_DELAY
+    for attempt in range(1, settings.MEDIA_UPLOAD_ATTEMPTS + 1):
+        try:
+            media.file = get_media_backend().upload(
+                media.staged_path, media.original_name
+            )
+            media.set_metadata(media.file.metadata or {})
+            media.status = PostMedia.READY
+            break
+        except FileNotFoundError:
+            logger.error("Staged file of PostMedia %s is gone", media.pk)
+            media.status = PostMedia.FAILED
+            break
+        except Exception:
+            logger.warning(
+                "Upload of PostMedia %s failed (attempt %d)",
+                media.pk,
+                attempt,
+                exc_info=True,
+            )
+            media.status = PostMedia.FAILED
+            if attempt < settings.MEDIA_UPLOAD_ATTEMPTS:
+                time.sleep(delay)
+                delay *= 2
+
+
+def _save(media) -> bool:
+    """
+    Save the upload's outcome if the claim still holds; otherwise
+    (deleted or requeued meanwhile) drop the uploaded file and return
+    False. Failed uploads keep their staged file for `process_uploads
+    --retry-failed`.
+    """
+    with transaction.atomic():
+        held = (
+            PostMedia.objects.select_for_update()
+            .filter(pk=media.pk, status=PostMedia.PROCESSING)
+            .exists()
+        )
+        if held:
+            # save() (not update()) so the card / page cache signals fire
+            media.save(
+                update_fields=[
+                    "file",
+                    "status",
+                    "staged_path",
+                    *PostMedia.METADATA_FIELDS,
+                ]
+            )
+            return True
+
+    if media.status == PostMedia.READY:
+        try:
+            get_media_backend().delete(media.file)
+        except Exception:
+            logger.warning(
+                "Could not delete media file %s", media.file, exc_info=True
+            )
+    return False
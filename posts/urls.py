@@ -6,6 +6,7 @@ urlpatterns = [
 
     # ---------- HOME ----------
     path("", views.home, name="home"),
+    path("feed/page/", views.feed_page, name="feed_page"),
 
     # ---------- AUTH ----------
     path(
@@ -18,6 +19,11 @@ urlpatterns = [
     path("logout/", auth_views.LogoutView.as_view(), name="logout"),
     path("register/", views.register_user, name="register"),
     path("profile/<str:username>/", views.profile_page, name="profile_page"),
+    path(
+        "profile/<str:username>/follow/",
+        views.follow_user,
+        name="follow_user",
+    ),
 
     # ---------- SEARCH ----------
     path("search/ajax/", views.ajax_search, name="ajax_search"),
@@ -31,6 +37,8 @@ urlpatterns = [
     # ---------- VOTING (FINAL, SINGLE SOURCE OF TRUTH) ----------
     path("ajax/vote/<int:post_id>/", views.vote_post, name="vote_post"),
 
+    path("events/", views.post_events, name="post_events"),
+
     # ---------- COMMENTS ----------
     path("comment/<int:post_id>/", views.add_comment, name="add_comment"),
     path(
@@ -44,6 +52,16 @@ urlpatterns = [
         name="edit_comment",
     ),
     path("reply/<int:comment_id>/", views.reply_comment, name="reply_comment"),
+    path(
+        "post/<int:post_id>/comments/",
+        views.comments_page,
+        name="comments_page",
+    ),
+    path(
+        "comment/<int:comment_id>/replies/",
+        views.replies_page,
+        name="replies_page",
+    ),
 
     # ---------- CATEGORY ----------
     path(
@@ -51,4 +69,18 @@ urlpatterns = [
         views.category_search,
         name="category_search",
     ),
+
+    path(
+        "category/<int:category_id>/",
+        views.category_feed,
+        name="category_feed",
+    ),
+    path(
+        "category/<int:category_id>/follow/",
+        views.follow_category,
+        name="follow_category",
+    ),
+
+    # ---------- METRICS ----------
+    path("metrics/", views.metrics, name="metrics"),
 ]
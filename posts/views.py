@@ -1,22 +1,61 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
-from django.db.models import Q
-from django.http import JsonResponse, HttpResponseForbidden
-from django.shortcuts import get_object_or_404, redirect, render
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseForbidden,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.shortcuts import (
+    aget_object_or_404,
+    get_object_or_404,
+    redirect,
+    render,
+)
+from django.template.loader import render_to_string
 from django.utils import timezone
+from django.utils.http import url_has_allowed_host_and_scheme
 
+import hmac
 import json
 
+from . import (
+    archive,
+    categories,
+    instrumentation,
+    live,
+    ranking,
+    timeline,
+    typeahead,
+    uploads,
+    votebuffer,
+)
+from .pagecache import add_cache_tags, cache_anonymous_page
+from .comments import acomment_page, comment_page
+from .feed import FEED_SORTS, InvalidCursor, feed_queryset, paginate_feed
 from .forms import PostForm
-from .models import Category, Comment, Post, PostMedia, Vote
+from .models import (
+    ArchivedPost,
+    Category,
+    Comment,
+    Follow,
+    Post,
+    UserStats,
+    Vote,
+)
+from .search import apaginate_search, paginate_search
 
 
 # ==================================================
 # HOME PAGE
 # ==================================================
+@cache_anonymous_page
 def home(request):
     form = PostForm()
 
@@ -33,26 +72,33 @@ def home(request):
 
             category_name = request.POST.get("category", "").strip()
             if category_name:
-                category, _ = Category.objects.get_or_create(
-                    name=category_name)
-                post.category = category
+                post.category_id = categories.resolve(category_name)
 
             post.save()
             messages.success(
                 request, "Your post has been shared successfully!")
             return redirect("home")
 
-    # ----- SEARCH -----
-    query = request.GET.get("q", "").strip()
+    # ----- SEARCH + FIRST PAGE (or ?cursor= without JS) -----
+    query, sort, window = _feed_params(request)
+    try:
+        posts, next_cursor = _home_page(
+            request, query, sort, window, request.GET.get("cursor")
+        )
+    except InvalidCursor:
+        posts, next_cursor = _home_page(request, query, sort, window)
+
+    # ----- PAGE CACHE TAGS: posts shown; first pages / search results
+    # also change whenever a post is added or removed, ranked pages
+    # whenever ranks are recomputed -----
+    add_cache_tags(request, *(f"post:{post.id}" for post in posts))
     if query:
-        posts = Post.objects.filter(
-            title__icontains=query).order_by("-created_at")
+        add_cache_tags(request, "search")
     else:
-        posts = Post.objects.all().order_by("-created_at")
-
-    # ----- USER VOTE STATE FOR UI -----
-    for post in posts:
-        post.user_vote_value = post.user_vote(request.user)
+        if not request.GET.get("cursor"):
+            add_cache_tags(request, "feed:head")
+        if sort != "new":
+            add_cache_tags(request, "feed:ranked")
 
     return render(
         request,
@@ -60,10 +106,135 @@ def home(request):
         {
             "form": form,
             "posts": posts,
+            "next_cursor": next_cursor,
+            "query": query,
+            "sort": sort,
+            "window": window,
+            "sorts": _feed_sorts(request),
+            "windows": ranking.TOP_WINDOWS,
+            "live_updates": settings.LIVE_UPDATES,
+        },
+    )
+
+
+def _feed_sorts(request):
+    """?sort= values offered: the FEED_SORTS, plus the timeline."""
+    if request.user.is_authenticated:
+        return [*FEED_SORTS, "following"]
+    return list(FEED_SORTS)
+
+
+def _feed_params(request):
+    """(query, sort, top window) from the GET parameters, defaulted."""
+    query = request.GET.get("q", "").strip()
+    sort = request.GET.get("sort", "new")
+    if sort not in _feed_sorts(request):
+        sort = "new"
+    window = request.GET.get("t", "day")
+    if window not in ranking.TOP_WINDOWS:
+        window = "day"
+    return query, sort, window
+
+
+def _home_page(request, query, sort="new", window="day", cursor=None):
+    """
+    One page of the home feed: by ?sort= (newest first by default,
+    ?t= window for top, the user's timeline for following), or by
+    relevance for ?q=.
+    """
+    if sort == "following" and not query:
+        return timeline.paginate_timeline(request.user, cursor)
+
+    # ----- AUTHOR / MEDIA / COUNTS / USER VOTE IN FIXED QUERIES -----
+    posts = feed_queryset(request.user)
+    if query:
+        return paginate_search(posts, query, cursor)
+
+    if sort == "top" and ranking.TOP_WINDOWS[window]:
+        since = timezone.now() - ranking.TOP_WINDOWS[window]
+        posts = posts.filter(created_at__gte=since)
+    return paginate_feed(posts, cursor, sort=sort)
+
+
+# ==================================================
+# CATEGORY FEED
+# ==================================================
+@cache_anonymous_page
+def category_feed(request, category_id):
+    category = get_object_or_404(Category, id=category_id)
+    try:
+        posts, next_cursor = _category_page(
+            request, category.id, request.GET.get("cursor")
+        )
+    except InvalidCursor:
+        posts, next_cursor = _category_page(request, category.id)
+
+    add_cache_tags(request, *(f"post:{post.id}" for post in posts))
+    if not request.GET.get("cursor"):
+        add_cache_tags(request, "feed:head")
+
+    follows_category = (
+        request.user.is_authenticated
+        and Follow.objects.filter(
+            follower=request.user, category=category
+        ).exists()
+    )
+
+    return render(
+        request,
+        "posts/home.html",
+        {
+            "category": category,
+            "category_posts": (
+                categories.get_directory().counts.get(category.id, 0)
+            ),
+            "follows_category": follows_category,
+            "posts": posts,
+            "next_cursor": next_cursor,
+            "live_updates": settings.LIVE_UPDATES,
         },
     )
 
 
+def _category_page(request, category_id, cursor=None):
+    """
+    One page of a category's posts, newest first: a range scan of
+    post_category_feed_idx (category, created_at, id).
+    """
+    posts = feed_queryset(
+        request.user, Post.objects.filter(category_id=category_id)
+    )
+    return paginate_feed(posts, cursor)
+
+
+# ==================================================
+# HOME FEED NEXT PAGE (AJAX – INFINITE SCROLL)
+# ==================================================
+def feed_page(request):
+    """
+    Return the next page of home feed cards (or of a category feed,
+    ?category=<id>) as an HTML fragment.
+    """
+    query, sort, window = _feed_params(request)
+    category_id = request.GET.get("category", "")
+    try:
+        if category_id.isdigit():
+            posts, next_cursor = _category_page(
+                request, int(category_id), request.GET.get("cursor")
+            )
+        else:
+            posts, next_cursor = _home_page(
+                request, query, sort, window, request.GET.get("cursor")
+            )
+    except InvalidCursor:
+        return JsonResponse({"error": "Invalid cursor"}, status=400)
+
+    html = render_to_string(
+        "posts/post_cards.html", {"posts": posts}, request=request
+    )
+    return JsonResponse({"html": html, "next_cursor": next_cursor})
+
+
 # ==================================================
 # CREATE POST PAGE
 # ==================================================
@@ -78,27 +249,31 @@ def create_post(request):
             messages.error(request, "Title and content are required.")
             return redirect("create_post")
 
-        category = None
+        category_id = None
         if category_name:
-            category, _ = Category.objects.get_or_create(name=category_name)
+            category_id = categories.resolve(category_name)
 
         post = Post.objects.create(
             title=title,
             content=content,
             author=request.user,
-            category=category,
+            category_id=category_id,
         )
 
-        for img in request.FILES.getlist("images"):
-            PostMedia.objects.create(post=post, file=img)
-
-        if request.FILES.get("video"):
-            PostMedia.objects.create(post=post, file=request.FILES["video"])
-
-        for src in request.FILES.getlist("sources"):
-            PostMedia.objects.create(post=post, file=src)
+        # Staged locally, uploaded by posts.uploads after this request
+        files = [
+            *request.FILES.getlist("images"),
+            *request.FILES.getlist("video")[:1],
+            *request.FILES.getlist("sources"),
+        ]
+        uploads.queue_uploads(post, files)
 
-        messages.success(request, "Post created successfully!")
+        if files:
+            messages.success(
+                request, "Post created! Media will appear once uploaded."
+            )
+        else:
+            messages.success(request, "Post created successfully!")
         return redirect("home")
 
     return render(request, "posts/create_post.html")
@@ -107,17 +282,171 @@ def create_post(request):
 # ==================================================
 # POST DETAIL
 # ==================================================
-def post_detail(request, post_id):
+@cache_anonymous_page
+async def post_detail(request, post_id):
+    user = await request.auser()
+    add_cache_tags(request, f"post:{post_id}")
+    try:
+        post = await feed_queryset(user).aget(id=post_id)
+    except Post.DoesNotExist:
+        return await _archived_post_detail(request, post_id)
+
+    # ?thread=<comment id> continues a thread cut off by depth/limits;
+    # ?cursor= pages without JavaScript (post_detail.js uses fragments)
+    thread = None
+    thread_id = request.GET.get("thread", "")
+    if thread_id.isdigit():
+        thread = await aget_object_or_404(
+            Comment.objects.select_related("author"),
+            id=thread_id,
+            post=post,
+        )
+
+    try:
+        comments, next_cursor = await acomment_page(
+            post, parent=thread, cursor=request.GET.get("cursor")
+        )
+    except InvalidCursor:
+        comments, next_cursor = await acomment_page(post, parent=thread)
+
+    if thread:
+        thread.children, thread.more_replies = comments, 0
+        if next_cursor:
+            thread.more_replies = await thread.replies.filter(
+                path__gt=next_cursor
+            ).acount()
+        comments = [thread]
+
+    follows_category = (
+        user.is_authenticated
+        and post.category_id is not None
+        and await Follow.objects.filter(
+            follower=user, category_id=post.category_id
+        ).aexists()
+    )
+
+    # Templates read request.user and the session: sync APIs
+    return await sync_to_async(render)(
+        request,
+        "posts/post_detail.html",
+        {
+            "post": post,
+            "comments": comments,
+            "thread": thread,
+            "next_cursor": next_cursor,
+            "live_updates": settings.LIVE_UPDATES,
+            "follows_category": follows_category,
+        },
+    )
+
+
+async def _archived_post_detail(request, post_id):
+    """post_detail of an archived post (posts.archive), read-only."""
+    archived = await ArchivedPost.objects.select_related("author").filter(
+        pk=post_id
+    ).afirst()
+    if archived is None:
+        raise Http404("No post matches the given query.")
+    post, comments = await sync_to_async(archive.load)(archived)
+
+    # Paged like the live thread (?thread=, ?cursor=), from memory
+    thread = None
+    thread_id = request.GET.get("thread", "")
+    if thread_id.isdigit():
+        thread = next((c for c in comments if c.pk == int(thread_id)), None)
+        if thread is None:
+            raise Http404("No comment matches the given query.")
+
+    try:
+        page, next_cursor = archive.comment_page(
+            comments, parent=thread, cursor=request.GET.get("cursor")
+        )
+    except InvalidCursor:
+        page, next_cursor = archive.comment_page(comments, parent=thread)
+
+    if thread:
+        thread.children, thread.more_replies = page, 0
+        if next_cursor:
+            thread.more_replies = sum(
+                1
+                for c in comments
+                if c.parent_id == thread.pk and c.path > next_cursor
+            )
+        page = [thread]
+
+    return await sync_to_async(render)(
+        request,
+        "posts/post_detail.html",
+        {
+            "post": post,
+            "comments": page,
+            "thread": thread,
+            "next_cursor": next_cursor,
+            "archived": True,
+        },
+    )
+
+
+# ==================================================
+# LIVE UPDATES (SERVER-SENT EVENTS)
+# ==================================================
+async def post_events(request):
+    """Stream score / comment updates for ?post=<id> (repeatable)."""
+    if not settings.LIVE_UPDATES:
+        raise Http404("Live updates are off.")
+
+    post_ids = {
+        int(value)
+        for value in request.GET.getlist("post")[: settings.LIVE_MAX_POSTS]
+        if value.isdigit()
+    }
+    if not post_ids:
+        return JsonResponse({"error": "No posts"}, status=400)
+
+    response = StreamingHttpResponse(
+        live.stream(post_ids), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # don't buffer behind nginx
+    return response
+
+
+# ==================================================
+# MORE COMMENTS / REPLIES (AJAX FRAGMENTS)
+# ==================================================
+def comments_page(request, post_id):
+    """Next page of top-level comments (with sub-threads) as HTML."""
     post = get_object_or_404(Post, id=post_id)
-    post.user_vote_value = post.user_vote(request.user)
-    return render(request, "posts/post_detail.html", {"post": post})
+    return _comment_fragment(request, post, None, "comment")
+
+
+def replies_page(request, comment_id):
+    """Next page of direct replies to one comment as HTML."""
+    parent = get_object_or_404(Comment, id=comment_id)
+    return _comment_fragment(request, parent.post, parent, "reply")
+
+
+def _comment_fragment(request, post, parent, kind):
+    try:
+        comments, next_cursor = comment_page(
+            post, parent=parent, cursor=request.GET.get("cursor")
+        )
+    except InvalidCursor:
+        return JsonResponse({"error": "Invalid cursor"}, status=400)
+
+    html = render_to_string(
+        "posts/comment_nodes.html",
+        {"comments": comments, "kind": kind},
+        request=request,
+    )
+    return JsonResponse({"html": html, "next_cursor": next_cursor})
 
 
 # ==================================================
 # VOTING (AJAX – SINGLE SOURCE OF TRUTH)
 # ==================================================
 @login_required
-def vote_post(request, post_id):
+async def vote_post(request, post_id):
     """Handle Reddit-style voting: toggle / switch vote and return
     updated score."""
     if request.method != "POST":
@@ -126,8 +455,6 @@ def vote_post(request, post_id):
             status=405
         )
 
-    post = get_object_or_404(Post, id=post_id)
-
     try:
         data = json.loads(request.body.decode("utf-8"))
     except json.JSONDecodeError:
@@ -143,26 +470,27 @@ def vote_post(request, post_id):
             status=400
         )
 
-    value = 1 if action == "upvote" else -1
+    value = Vote.UPVOTE if action == "upvote" else Vote.DOWNVOTE
+    user = await request.auser()
 
-    vote, created = Vote.objects.get_or_create(
-        user=request.user,
-        post=post,
-        defaults={"value": value},
-    )
-
-    if not created:
-        if vote.value == value:
-            vote.delete()  # same vote again => remove
-        else:
-            vote.value = value  # switch vote
-            vote.save()
+    if settings.VOTE_WRITE_BEHIND:
+        # Buffered: the score is optimistic until the next flush
+        try:
+            user_vote, score = await sync_to_async(votebuffer.record_vote)(
+                user.pk, post_id, value
+            )
+        except Post.DoesNotExist:
+            raise Http404("No Post matches the given query.")
+    else:
+        post = await aget_object_or_404(Post, id=post_id)
+        user_vote = await sync_to_async(post.apply_vote)(user, value)
+        score = post.score
 
     return JsonResponse(
         {
             "success": True,
-            "score": post.get_score(),
-            "user_vote": post.user_vote(request.user),  # 1, -1, 0
+            "score": score,
+            "user_vote": user_vote,  # 1, -1, 0
         }
     )
 
@@ -189,6 +517,8 @@ def add_comment(request, post_id):
 @login_required
 def reply_comment(request, comment_id):
     parent = get_object_or_404(Comment, id=comment_id)
+    if parent.depth >= Comment.MAX_DEPTH:
+        parent = parent.parent  # keep paths within Comment.path length
     if request.method == "POST":
         content = request.POST.get("content", "").strip()
         if content:
@@ -275,20 +605,31 @@ def register_user(request):
 # ==================================================
 # SEARCH (AJAX)
 # ==================================================
-def ajax_search(request):
+@typeahead.throttle
+async def ajax_search(request):
     q = request.GET.get("q", "").strip()
     if not q:
         return JsonResponse({"results": []})
 
-    posts = Post.objects.filter(
-        Q(title__icontains=q) | Q(author__username__icontains=q)
-    ).select_related("author")
+    results = await typeahead.acached_results(
+        "posts", q, lambda: _post_search_results(q)
+    )
+    return JsonResponse({"results": results})
+
+
+async def _post_search_results(q):
+    posts, _ = await apaginate_search(
+        feed_queryset(media="cover"),
+        q,
+        page_size=settings.SEARCH_TYPEAHEAD_LIMIT,
+    )
 
     results = []
     for post in posts:
         thumb = None
-        if post.media.exists() and post.media.first().is_image():
-            thumb = post.media.first().file.url
+        cover = post.cover_media()  # prefetched
+        if cover and cover.is_image():
+            thumb = cover.thumb_url()
 
         results.append(
             {
@@ -298,30 +639,122 @@ def ajax_search(request):
                 "thumb": thumb,
             }
         )
-
-    return JsonResponse({"results": results})
+    return results
 
 
 # ==================================================
 # PROFILE
 # ==================================================
+@cache_anonymous_page
 def profile_page(request, username):
-    profile_user = get_object_or_404(User, username=username)
-    posts = Post.objects.filter(author=profile_user).order_by("-created_at")
+    profile_user = get_object_or_404(
+        User.objects.select_related("stats"), username=username
+    )
+    try:
+        stats = profile_user.stats
+    except UserStats.DoesNotExist:  # until `manage.py rebuild_user_stats`
+        stats = UserStats(user=profile_user)
+
+    # One grid page (?cursor= for older posts), covers in one query
+    posts = feed_queryset(
+        request.user,
+        Post.objects.filter(author=profile_user),
+        media="cover",
+    )
+    try:
+        posts, next_cursor = paginate_feed(
+            posts,
+            cursor=request.GET.get("cursor"),
+            page_size=settings.PROFILE_PAGE_SIZE,
+        )
+    except InvalidCursor:
+        posts, next_cursor = paginate_feed(
+            posts, page_size=settings.PROFILE_PAGE_SIZE
+        )
+
+    add_cache_tags(request, f"profile:{profile_user.pk}")
+    add_cache_tags(request, *(f"post:{post.id}" for post in posts))
+
+    is_following = (
+        request.user.is_authenticated
+        and Follow.objects.filter(
+            follower=request.user, user=profile_user
+        ).exists()
+    )
+
     return render(
         request,
         "posts/profile.html",
-        {"profile_user": profile_user, "posts": posts},
+        {
+            "profile_user": profile_user,
+            "stats": stats,
+            "posts": posts,
+            "next_cursor": next_cursor,
+            "is_following": is_following,
+        },
     )
 
 
+# ==================================================
+# FOLLOW / UNFOLLOW (TOGGLE)
+# ==================================================
+@login_required
+def follow_user(request, username):
+    target = get_object_or_404(User, username=username)
+    if request.method == "POST" and target != request.user:
+        if not timeline.follow(request.user, user=target):
+            timeline.unfollow(request.user, user=target)
+    return redirect("profile_page", username=username)
+
+
+@login_required
+def follow_category(request, category_id):
+    category = get_object_or_404(Category, id=category_id)
+    if request.method == "POST":
+        if not timeline.follow(request.user, category=category):
+            timeline.unfollow(request.user, category=category)
+
+    next_url = request.POST.get("next", "")
+    if url_has_allowed_host_and_scheme(
+        next_url, allowed_hosts={request.get_host()}
+    ):
+        return redirect(next_url)
+    return redirect("home")
+
+
 # ==================================================
 # CATEGORY SEARCH
 # ==================================================
-def category_search(request):
+@typeahead.throttle
+async def category_search(request):
+    """Category names starting with ?q=, from the in-process directory."""
     q = request.GET.get("q", "").strip()
     if not q:
         return JsonResponse({"results": []})
 
-    categories = Category.objects.filter(name__icontains=q)[:6]
-    return JsonResponse({"results": [c.name for c in categories]})
+    directory = categories.current()
+    if directory is None:
+        directory = await sync_to_async(categories.get_directory)()
+    results = directory.search(q, settings.CATEGORY_SEARCH_LIMIT)
+    return JsonResponse({"results": results})
+
+
+# ==================================================
+# METRICS (PROMETHEUS)
+# ==================================================
+def metrics(request):
+    """This worker's request metrics in the Prometheus text format."""
+    token = settings.METRICS_TOKEN
+    authorized = request.user.is_staff or (
+        token
+        and hmac.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {token}"
+        )
+    )
+    if not authorized:
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        instrumentation.REGISTRY.render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,254 @@
+"""
+Write-behind buffer for votes.
+
+vote_post records each click here and answers immediately; a background
+thread writes the buffer to the database every VOTE_FLUSH_INTERVAL
+seconds (sooner once VOTE_FLUSH_BATCH pairs are waiting).
+
+Durability and ordering:
+- A buffered vote lives only in this process's memory until its flush
+  commits. A crash loses at most one flush interval of votes; a clean
+  shutdown flushes at exit. A failed flush keeps its votes buffered.
+- Clicks by one user on one post apply in arrival order within a
+  process (toggle / switch as in Post.apply_vote). Only the final state
+  of each (user, post) pair is written, so toggles cancel out.
+- Each flush reads the stored votes inside its transaction and moves
+  the post counters by the difference, so counters always match the
+  Vote rows. Across processes, or against a direct apply_vote, the
+  last committed write wins.
+- The returned score is optimistic: the stored score plus this
+  process's unflushed votes (kept as a running per-post total, so a
+  click costs the same however full the buffer is). Pages show the
+  vote once it is flushed.
+- Pairs whose post or user was deleted before the flush are dropped.
+"""
+
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, transaction
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import live
+from .models import Post, UserStats, Vote
+from .pagecache import invalidate_tags
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()  # guards the dicts and counter below
+_flush_lock = threading.Lock()  # one flush at a time
+_wake = threading.Event()
+_flusher = None
+
+# (user_id, post_id) -> (stored vote, wanted vote)
+_pending = {}
+_in_flight = {}
+# post_id -> score change buffered in _pending and _in_flight
+_deltas = defaultdict(int)
+_flushes = 0
+
+
+# -----------------------------
+# Recording Clicks
+# -----------------------------
+def record_vote(user_id: int, post_id: int, value: int) -> tuple:
+    """
+    Buffer one click and return (user's resulting vote, optimistic
+    score). Raises Post.DoesNotExist for an unknown post.
+    """
+    _start_flusher()
+
+    while True:
+        flushes = _flushes
+        row = (
+            Post.objects.filter(pk=post_id)
+            .annotate(
+                stored=Coalesce(
+                    Subquery(
+                        Vote.objects.filter(
+                            post=OuterRef("pk"), user_id=user_id
+                        ).values("value")[:1]
+                    ),
+                    Value(0),
+                )
+            )
+            .values_list("score", "stored")
+            .first()
+        )
+        if row is None:
+            raise Post.DoesNotExist(post_id)
+        score, stored = row
+
+        with _lock:
+            if flushes != _flushes:
+                continue  # a flush committed meanwhile: re-read
+
+            key = (user_id, post_id)
+            if key in _pending:
+                stored, current = _pending[key]
+            elif key in _in_flight:
+                stored = current = _in_flight[key][1]
+            else:
+                current = stored
+
+            wanted = 0 if current == value else value
+            _pending[key] = (stored, wanted)
+            _deltas[post_id] += wanted - current
+            score += _deltas[post_id]
+            waiting = len(_pending)
+            break
+
+    if waiting >= settings.VOTE_FLUSH_BATCH:
+        _wake.set()
+    return wanted, score
+
+
+# -----------------------------
+# Flushing
+# -----------------------------
+def flush() -> int:
+    """Write every buffered vote. Returns the number of rows changed."""
+    global _pending, _in_flight, _flushes
+
+    with _flush_lock:
+        with _lock:
+            batch, _pending = _pending, {}
+            _in_flight = batch
+
+        try:
+            changed = _apply(
+                {key: wanted for key, (_, wanted) in batch.items()}
+            )
+        except Exception:
+            with _lock:
+                # Keep the votes; newer clicks on a pair keep their
+                # wanted state but must be compared to what is stored.
+                # The buffered total per post is unchanged.
+                for key, (stored, wanted) in batch.items():
+                    if key in _pending:
+                        wanted = _pending[key][1]
+                    _pending[key] = (stored, wanted)
+            raise
+        else:
+            with _lock:
+                # Stored now; newer clicks were counted from the
+                # batch's wanted state, so their share stays.
+                for (_, post_id), (stored, wanted) in batch.items():
+                    _deltas[post_id] -= wanted - stored
+                    if not _deltas[post_id]:
+                        del _deltas[post_id]
+        finally:
+            with _lock:
+                _in_flight = {}
+                _flushes += 1
+
+    return changed
+
+
+def _apply(wanted: dict) -> int:
+    if not wanted:
+        return 0
+
+    user_ids = {user_id for user_id, _ in wanted}
+    post_ids = {post_id for _, post_id in wanted}
+    upserts, deletes = [], []
+    counters = defaultdict(lambda: [0, 0, 0])  # score, upvotes, downvotes
+
+    with transaction.atomic():
+        stored = {
+            (vote.user_id, vote.post_id): vote
+            for vote in Vote.objects.select_for_update().filter(
+                user_id__in=user_ids, post_id__in=post_ids
+            )
+        }
+        authors = dict(  # post id -> author id, for existing posts
+            Post.objects.filter(pk__in=post_ids).values_list("pk", "author")
+        )
+        users = set(
+            get_user_model()
+            .objects.filter(pk__in=user_ids)
+            .values_list("pk", flat=True)
+        )
+
+        for (user_id, post_id), new in wanted.items():
+            vote = stored.get((user_id, post_id))
+            old = vote.value if vote else 0
+            if new == old or post_id not in authors or user_id not in users:
+                continue  # no-op, or the post or voter was deleted
+
+            if new:
+                upserts.append(
+                    Vote(user_id=user_id, post_id=post_id, value=new)
+                )
+            else:
+                deletes.append(vote.pk)
+
+            delta = counters[post_id]
+            delta[0] += new - old
+            delta[1] += (new == Vote.UPVOTE) - (old == Vote.UPVOTE)
+            delta[2] += (new == Vote.DOWNVOTE) - (old == Vote.DOWNVOTE)
+
+        Vote.objects.bulk_create(
+            upserts,
+            update_conflicts=True,
+            unique_fields=["user", "post"],
+            update_fields=["value"],
+        )
+        Vote.objects.filter(pk__in=deletes).delete()
+
+        now = timezone.now()
+        for post_id, (score, up, down) in counters.items():
+            Post.objects.filter(pk=post_id).update(
+                score=F("score") + score,
+                upvotes=F("upvotes") + up,
+                downvotes=F("downvotes") + down,
+                rank_dirty=True,
+                last_vote_at=now,
+            )
+
+        karma = defaultdict(int)
+        for post_id, (score, _, _) in counters.items():
+            karma[authors[post_id]] += score
+        for author_id, delta in karma.items():
+            UserStats.adjust(author_id, karma=delta)
+
+    # bulk_create sends no signals: expire pages and push scores here.
+    if counters:
+        invalidate_tags(*(f"post:{post_id}" for post_id in counters))
+        live.post_changed(*counters)
+    return len(upserts) + len(deletes)
+
+
+# -----------------------------
+# Background Flusher
+# -----------------------------
+def _start_flusher() -> None:
+    global _flusher
+
+    if _flusher is not None or not settings.VOTE_FLUSH_INTERVAL:
+        return
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(
+                target=_run, name="vote-flusher", daemon=True
+            )
+            _flusher.start()
+            atexit.register(flush)
+
+
+def _run() -> None:
+    while True:
+        _wake.wait(settings.VOTE_FLUSH_INTERVAL)
+        _wake.clear()
+        try:
+            flush()
+        except Exception:
+            logger.exception("Vote flush failed; votes stay buffered")
+        finally:
+            close_old_connections()